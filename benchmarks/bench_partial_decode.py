@@ -0,0 +1,86 @@
+#!/usr/bin/python3
+"""
+Compare the time it takes to decode an FDM packet when only a few fields are
+selected (``fields=``) against decoding the whole packet. Both the bare codec and
+the connection's decode step (which includes the radian correction) are measured,
+the latter also reads the selected fields so that the lazy codec is comparable.
+
+Usage: ``python3 benchmarks/bench_partial_decode.py [--version 25] [--packets 20000]``
+"""
+import argparse
+import os
+import sys
+from typing import List, Optional
+
+# Run from a checkout without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flightgear_python.fg_if import FDMConnection  # noqa: E402
+from flightgear_python.fg_codec import StructCodec  # noqa: E402
+
+# Same timing (median of the repeats) as the suite, so the numbers are comparable
+from bench_suite import time_per_op_us  # noqa: E402
+
+# What a typical position/attitude callback reads
+FIELDS = ['lat_rad', 'lon_rad', 'alt_m', 'phi_rad', 'theta_rad', 'psi_rad']
+
+
+def make_packet(version: int) -> bytes:
+    # Big endian version, everything else zero
+    net_struct = FDMConnection.fg_supported_structs[version]
+    return version.to_bytes(4, 'big') + bytes(net_struct.sizeof() - 4)
+
+
+def run_connection(version: int, codec: str, fields: Optional[List[str]], num_packets: int) -> float:
+    fdm_c = FDMConnection(version, codec=codec, fields=fields)
+    packet = make_packet(version)
+    fdm_c.fg_rx_buffer[: len(packet)] = packet
+    rx_msg = memoryview(fdm_c.fg_rx_buffer)[: len(packet)]
+
+    def decode_and_read():
+        fdm_data = fdm_c._fg_decode(rx_msg)
+        for field in FIELDS:
+            fdm_data[field]
+
+    return time_per_op_us(decode_and_read, num_packets)
+
+
+def print_result(name: str, us_per_packet: float, baseline: float):
+    print(f'{name:>30}: {us_per_packet:>8.2f} us/packet ({baseline / us_per_packet:.1f}x)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--version', type=int, default=25, choices=FDMConnection.fg_supported_structs.keys())
+    parser.add_argument('--packets', type=int, default=20000, help='Number of packets per measurement')
+    args = parser.parse_args()
+
+    net_struct = FDMConnection.fg_supported_structs[args.version]
+    packet = make_packet(args.version)
+    full_codec = StructCodec(net_struct)
+    partial_codec = StructCodec(net_struct, fields=FIELDS)
+    print(f'Codec only, FDM v{args.version} ({net_struct.sizeof()} bytes), {len(FIELDS)} fields selected:')
+    baseline = time_per_op_us(lambda: net_struct.parse(packet), args.packets // 10)
+    print_result('construct, all fields', baseline, baseline)
+    print_result('compiled, all fields', time_per_op_us(lambda: full_codec.parse(packet), args.packets), baseline)
+    print_result(
+        'compiled, selected fields', time_per_op_us(lambda: partial_codec.parse(packet), args.packets), baseline
+    )
+
+    print('Connection decode (including radian correction), reading the selected fields:')
+    baseline = run_connection(args.version, 'construct', None, args.packets // 10)
+    print_result('construct, all fields', baseline, baseline)
+    for codec, fields in [('compiled', None), ('compiled', FIELDS), ('lazy', None), ('numpy', None)]:
+        if codec == 'lazy':
+            name = 'lazy, decoded when read'
+        else:
+            name = f'{codec}, {"all" if fields is None else "selected"} fields'
+        try:
+            us_per_packet = run_connection(args.version, codec, fields, args.packets)
+        except ImportError:
+            continue  # numpy not installed
+        print_result(name, us_per_packet, baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+"""
+Compare receive throughput (packets/sec) of the per-packet RX loop against the
+batched receive modes. Bursts of FDM packets are queued up on the RX socket over
+loopback, and only the time spent by the RX loop draining them is measured (so
+the sender doesn't compete for the CPU).
+
+Usage: ``python3 benchmarks/bench_rx_batch.py [--codec compiled] [--bursts 200]``
+"""
+import argparse
+import os
+import socket
+import sys
+import time
+
+# Run from a checkout without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flightgear_python.fg_if import FDMConnection  # noqa: E402
+from flightgear_python.fdm_v24 import fdm_struct  # noqa: E402
+from flightgear_python.general_util import DatagramBatchReceiver  # noqa: E402
+
+BURST_SIZE = 64  # Small enough to fit in the default socket receive buffer
+
+
+def run_mode(mode: str, codec: str, num_bursts: int) -> float:
+    num_packets = 0
+
+    def rx_cb(fdm_data, event_pipe):
+        nonlocal num_packets
+        num_packets += 1
+
+    def rx_batch_cb(fdm_batch, event_pipe):
+        nonlocal num_packets
+        num_packets += len(fdm_batch)
+
+    fdm_c = FDMConnection(24, codec=codec)
+    if mode == 'per-packet':
+        fdm_c.connect_rx('127.0.0.1', 0, rx_cb)
+    elif mode == 'batched, per-packet callback':
+        fdm_c.connect_rx('127.0.0.1', 0, rx_cb, max_batch=BURST_SIZE)
+    elif mode == 'batched (recv_into loop)':
+        fdm_c.connect_rx_batch('127.0.0.1', 0, rx_batch_cb, max_batch=BURST_SIZE)
+        fdm_c.fg_rx_batch_receiver.use_recvmmsg = False
+    elif mode == 'batched (recvmmsg)':
+        fdm_c.connect_rx_batch('127.0.0.1', 0, rx_batch_cb, max_batch=BURST_SIZE)
+        if not fdm_c.fg_rx_batch_receiver.uses_recvmmsg:
+            return float('nan')
+    else:
+        raise ValueError(f'Unknown mode {mode}')
+
+    packet = fdm_struct.build(dict(fdm_struct.parse(bytes([0, 0, 0, 24]) + bytes(fdm_struct.sizeof() - 4))))
+    rx_addr = fdm_c.fg_rx_sock.getsockname()
+    tx_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    elapsed_s = 0.0
+    for _ in range(num_bursts):
+        for _ in range(BURST_SIZE):
+            tx_sock.sendto(packet, rx_addr)
+        target_packets = num_packets + BURST_SIZE
+        start_s = time.perf_counter()
+        while num_packets < target_packets:
+            fdm_c._fg_packet_roundtrip()
+        elapsed_s += time.perf_counter() - start_s
+
+    tx_sock.close()
+    fdm_c.fg_rx_sock.close()
+    return num_packets / elapsed_s
+
+
+def run_socket_only(mode: str, num_bursts: int) -> float:
+    rx_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    rx_sock.bind(('127.0.0.1', 0))
+    tx_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver = DatagramBatchReceiver(max_batch=BURST_SIZE, use_recvmmsg=mode == 'recvmmsg')
+    if mode == 'recvmmsg' and not receiver.uses_recvmmsg:
+        return float('nan')
+    rx_buffer = bytearray(1024)
+    packet = bytes(fdm_struct.sizeof())
+
+    num_packets = 0
+    elapsed_s = 0.0
+    for _ in range(num_bursts):
+        for _ in range(BURST_SIZE):
+            tx_sock.sendto(packet, rx_sock.getsockname())
+        start_s = time.perf_counter()
+        if mode == 'recvfrom_into':
+            for _ in range(BURST_SIZE):
+                rx_sock.recvfrom_into(rx_buffer)
+            num_packets += BURST_SIZE
+        else:
+            received = 0
+            while received < BURST_SIZE:
+                received += len(receiver.recv(rx_sock))
+            num_packets += received
+        elapsed_s += time.perf_counter() - start_s
+
+    tx_sock.close()
+    rx_sock.close()
+    return num_packets / elapsed_s
+
+
+def print_result(name: str, packets_per_s: float, baseline: float):
+    print(f'{name:>30}: {packets_per_s:>10.0f} packets/sec ({packets_per_s / baseline:.2f}x)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--codec', default='compiled', choices=FDMConnection.supported_codecs)
+    parser.add_argument('--bursts', type=int, default=200, help=f'Number of {BURST_SIZE} packet bursts per mode')
+    args = parser.parse_args()
+
+    print('Socket only (no decoding):')
+    baseline = None
+    for mode in ['recvfrom_into', 'recv_into loop', 'recvmmsg']:
+        packets_per_s = run_socket_only(mode, args.bursts)
+        baseline = baseline or packets_per_s
+        print_result(mode, packets_per_s, baseline)
+
+    print(f'Full RX loop, codec "{args.codec}":')
+    baseline = None
+    for mode in ['per-packet', 'batched, per-packet callback', 'batched (recv_into loop)', 'batched (recvmmsg)']:
+        packets_per_s = run_mode(mode, args.codec, args.bursts)
+        baseline = baseline or packets_per_s
+        print_result(mode, packets_per_s, baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/python3
+"""
+Benchmarks of the hot paths: parse/build of every struct version with every codec,
+the RX/TX loop over loopback UDP, ``EventPipe`` throughput and the telnet/HTTP
+property connections (against the local servers from ``mock_props_servers.py``).
+
+Every result is the median of several repeats. Results can be saved as a baseline
+and later runs compared against it, the exit code is non-zero if anything got slower
+than its tolerance (see ``TOLERANCES``, or ``--threshold`` for all of them) times the
+baseline. ``--quick`` runs are too noisy for that, they are compared but never fail.
+Baselines are only comparable on the same machine, save your own before making
+changes, i.e.:
+
+    python3 benchmarks/bench_suite.py --save my_baseline.json
+    (make changes)
+    python3 benchmarks/bench_suite.py --compare my_baseline.json
+
+``benchmarks/baseline.json`` is the reference baseline from the machine noted in it.
+
+Usage: ``python3 benchmarks/bench_suite.py [--filter codec.] [--quick] [--save FILE] [--compare FILE]``
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Run from a checkout without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flightgear_python.fg_if import (  # noqa: E402
+    FGConnection,
+    FDMConnection,
+    CtrlsConnection,
+    GuiConnection,
+    TelnetConnection,
+    HTTPConnection,
+)
+from flightgear_python.general_util import EventPipe, LatestValueEventPipe  # noqa: E402
+
+from mock_props_servers import MockPropsServer  # noqa: E402
+
+# Name, function doing one operation, number of operations per measurement
+benchmark_type = Tuple[str, Callable[[], object], int]
+
+# Slowdown (times the baseline) that counts as a regression, by name prefix (longest match wins).
+# Reruns of the same tree have been up to ~1.8x apart (even for the codecs), anything going through
+# sockets, pipes or threads wobbles more
+TOLERANCES: Dict[str, float] = {
+    '': 2.5,
+    'loop.': 3.0,
+    'event_pipe.': 3.0,
+    'props.': 3.0,
+}
+
+
+def tolerance(name: str) -> float:
+    prefix = max((prefix for prefix in TOLERANCES if name.startswith(prefix)), key=len)
+    return TOLERANCES[prefix]
+
+
+def time_per_op_us(fn: Callable[[], object], number: int, repeat: int = 7) -> float:
+    times_s = []
+    for _ in range(repeat):
+        start_s = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times_s.append(time.perf_counter() - start_s)
+    return statistics.median(times_s) / number * 1e6
+
+
+def make_packet(conn_class: type, version: int) -> bytes:
+    # Right version, everything else zero
+    net_struct = conn_class.fg_supported_structs[version]
+    return conn_class.fg_version_construct.build(version) + bytes(net_struct.sizeof() - 4)
+
+
+def all_structs() -> List[Tuple[str, type, int]]:
+    return [
+        (f'{conn_class.fg_stream_name.lower()}_v{version}', conn_class, version)
+        for conn_class in (FDMConnection, CtrlsConnection, GuiConnection)
+        for version in conn_class.fg_supported_structs
+    ]
+
+
+def available_codecs() -> List[str]:
+    codecs = ['construct', 'compiled', 'lazy']
+    try:
+        import numpy  # noqa: F401
+
+        codecs.append('numpy')
+    except ImportError:
+        pass
+    return codecs
+
+
+def codec_benchmarks() -> List[benchmark_type]:
+    benchmarks: List[benchmark_type] = []
+    for struct_name, conn_class, version in all_structs():
+        net_struct = conn_class.fg_supported_structs[version]
+        packet = make_packet(conn_class, version)
+        for codec in available_codecs():
+            if codec == 'construct':
+                parse, build, number = net_struct.parse, net_struct.build, 200
+            else:
+                # Same codec the connections use
+                conn = conn_class(version, codec=codec)
+                parse, build, number = conn.fg_net_codec.parse, conn.fg_net_codec.build, 2000
+            decoded = parse(bytearray(packet))
+            benchmarks.append((f'codec.{struct_name}.{codec}.parse', lambda p=parse, data=packet: p(data), number))
+            benchmarks.append((f'codec.{struct_name}.{codec}.build', lambda b=build, d=decoded: b(d), number))
+    return benchmarks
+
+
+def loop_benchmarks() -> List[benchmark_type]:
+    benchmarks: List[benchmark_type] = []
+    packet = make_packet(FDMConnection, 24)
+
+    def rx_cb(fdm_data, event_pipe):
+        fdm_data['alt_m'] = fdm_data['alt_m'] + 0.5
+        return fdm_data
+
+    for codec in available_codecs():
+        conn = FDMConnection(24, codec=codec)
+        conn.connect_rx('127.0.0.1', 0, rx_cb)
+        sink_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sink_sock.bind(('127.0.0.1', 0))
+        conn.connect_tx(*sink_sock.getsockname())
+        tx_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        rx_addr = conn.fg_rx_sock.getsockname()
+
+        def roundtrip(conn: FGConnection = conn, tx_sock=tx_sock, sink_sock=sink_sock, rx_addr=rx_addr):
+            tx_sock.sendto(packet, rx_addr)
+            conn._fg_packet_roundtrip()
+            sink_sock.recv(1024)
+
+        benchmarks.append((f'loop.fdm_v24.{codec}.roundtrip', roundtrip, 1000))
+    return benchmarks
+
+
+def event_pipe_benchmarks() -> List[benchmark_type]:
+    event_pipe = EventPipe()
+
+    def parent_to_child():
+        event_pipe.parent_send((1.0, 2.0))
+        event_pipe.child_recv()
+
+    def child_to_parent():
+        event_pipe.child_send((1.0, 2.0))
+        event_pipe.parent_recv()
+
+    latest_pipe = LatestValueEventPipe('dd', recv_poll_interval_s=0)
+
+    def latest_child_to_parent():
+        latest_pipe.child_send((1.0, 2.0))
+        latest_pipe.parent_recv()
+
+    return [
+        ('event_pipe.parent_to_child', parent_to_child, 2000),
+        ('event_pipe.child_to_parent', child_to_parent, 2000),
+        ('event_pipe.latest_value.child_to_parent', latest_child_to_parent, 2000),
+    ]
+
+
+def props_benchmarks(servers: Dict[str, MockPropsServer]) -> List[benchmark_type]:
+    telnet_conn = TelnetConnection(*servers['telnet'].addr)
+    telnet_conn.connect()
+    telnet_data_conn = TelnetConnection(*servers['telnet'].addr, data_mode=True)
+    telnet_data_conn.connect()
+    http_conn = HTTPConnection(*servers['http'].addr)
+    # Set on one connection, wait for the change to arrive on another
+    sub_conn = TelnetConnection(*servers['telnet'].addr)
+    sub_conn.connect()
+    changed = threading.Event()
+    sub_conn.subscribe(['/bench/int'], callback=lambda prop_str, value: changed.set())
+
+    def set_and_wait_for_change():
+        changed.clear()
+        telnet_conn.set_prop('/bench/int', 1)
+        changed.wait(1.0)
+
+    batch_paths = [f'/bench/dir{dir_idx}/prop{prop_idx}' for dir_idx in range(10) for prop_idx in range(20)]
+    benchmarks: List[benchmark_type] = [
+        # One get/set of 200 properties per operation
+        ('props.telnet.get_props_200', lambda: telnet_conn.get_props(batch_paths), 20),
+        ('props.telnet.set_props_200', lambda: telnet_conn.set_props({path: 1.5 for path in batch_paths}), 20),
+        ('props.telnet_data.get_props_200', lambda: telnet_data_conn.get_props(batch_paths), 20),
+        ('props.telnet.subscribe.set_to_change', set_and_wait_for_change, 200),
+    ]
+    for name, conn in [('telnet', telnet_conn), ('telnet_data', telnet_data_conn), ('http', http_conn)]:
+        benchmarks += [
+            (f'props.{name}.get', lambda c=conn: c.get_prop('/bench/double'), 200),
+            (f'props.{name}.set', lambda c=conn: c.set_prop('/bench/double', 2.5), 200),
+            (f'props.{name}.list', lambda c=conn: c.list_props('/bench/dir0'), 100),
+            (f'props.{name}.list_recursive', lambda c=conn: c.list_props('/bench', recurse_limit=None), 20),
+            (f'props.{name}.list_big', lambda c=conn: c.list_props('/big'), 10),
+        ]
+    return benchmarks
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: Optional[float]) -> List[str]:
+    regressions = []
+    for name, us_per_op in results.items():
+        baseline_us = baseline.get(name)
+        if baseline_us is None:
+            print(f'{name:<45} {us_per_op:>10.2f} us  (no baseline)')
+            continue
+        ratio = us_per_op / baseline_us
+        flag = ''
+        if ratio > (threshold or tolerance(name)):
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f'{name:<45} {us_per_op:>10.2f} us  {baseline_us:>10.2f} us  {ratio:>5.2f}x{flag}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filter', default='', help='Only run benchmarks whose name contains this')
+    parser.add_argument('--quick', action='store_true', help='10x fewer operations, less accurate')
+    parser.add_argument('--save', metavar='FILE', help='Save the results as a baseline')
+    parser.add_argument('--compare', metavar='FILE', help='Compare against a saved baseline')
+    parser.add_argument(
+        '--threshold', type=float, help='Slowdown that counts as a regression, instead of the per-benchmark TOLERANCES'
+    )
+    args = parser.parse_args()
+
+    with MockPropsServer('telnet') as telnet_server, MockPropsServer('http') as http_server:
+        benchmarks = (
+            codec_benchmarks()
+            + loop_benchmarks()
+            + event_pipe_benchmarks()
+            + props_benchmarks({'telnet': telnet_server, 'http': http_server})
+        )
+        results: Dict[str, float] = {}
+        for name, fn, number in benchmarks:
+            if args.filter not in name:
+                continue
+            if args.quick:
+                number = max(number // 10, 1)
+            fn()  # Warm up, i.e. connect
+            results[name] = time_per_op_us(fn, number)
+            if not args.compare:
+                print(f'{name:<45} {results[name]:>10.2f} us')
+
+    regressions: List[str] = []
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline['results'], args.threshold)
+    if args.save:
+        baseline_info: Dict[str, Optional[object]] = {
+            'machine': f'{platform.machine()} {platform.processor() or platform.platform()}',
+            'python': platform.python_version(),
+            'results': results,
+        }
+        with open(args.save, 'w') as baseline_file:
+            json.dump(baseline_info, baseline_file, indent=2)
+            baseline_file.write('\n')
+    if regressions:
+        print(f'{len(regressions)} regression(s): {", ".join(regressions)}')
+        if args.quick:
+            print('Not failing, --quick results are too noisy to compare against a baseline')
+        else:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
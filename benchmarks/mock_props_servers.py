@@ -0,0 +1,293 @@
+"""
+Local stand-ins for the FlightGear telnet and HTTP property servers, so that
+:class:`flightgear_python.fg_if.TelnetConnection` and :class:`flightgear_python.fg_if.HTTPConnection`
+can be benchmarked without a running FlightGear.
+
+Only the parts of the protocols the connections use are implemented.
+"""
+
+import json
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+
+class PropertyTree:
+    """
+    Flat property tree, absolute path to ``(value, type)``. Directories are implied by the paths
+
+    :param values: Initial properties
+    """
+
+    def __init__(self, values: Optional[Dict[str, Tuple[str, str]]] = None):
+        self.values: Dict[str, Tuple[str, str]] = dict(values or {})
+        self.lock = threading.Lock()
+
+    @classmethod
+    def generate(cls, num_dirs: int = 10, props_per_dir: int = 20, big_dir_props: int = 5000) -> 'PropertyTree':
+        """
+        Tree with ``/bench/dir<i>/prop<j>`` doubles, plus a few of every type in ``/bench``,
+        and one big directory ``/big`` (like ``/ai/models`` in a busy FG)
+        """
+        values = {
+            '/bench/int': ('42', 'int'),
+            '/bench/bool': ('true', 'bool'),
+            '/bench/string': ('hello world', 'string'),
+            '/bench/double': ('3.14159', 'double'),
+        }
+        for dir_idx in range(num_dirs):
+            for prop_idx in range(props_per_dir):
+                values[f'/bench/dir{dir_idx}/prop{prop_idx}'] = (f'{dir_idx}.{prop_idx}', 'double')
+        for prop_idx in range(big_dir_props):
+            values[f'/big/prop{prop_idx}'] = (f'{prop_idx * 1.5}', 'double')
+        return cls(values)
+
+    def get(self, path: str) -> Optional[Tuple[str, str]]:
+        with self.lock:
+            return self.values.get(path)
+
+    def set(self, path: str, value: str) -> Tuple[str, str]:
+        with self.lock:
+            _, type_str = self.values.get(path, ('', 'string'))
+            self.values[path] = (value, type_str)
+            return value, type_str
+
+    def children(self, path: str) -> Tuple[List[Tuple[str, str, str]], List[str]]:
+        """
+        :return: Properties (name, value, type) and directory names directly under ``path``
+        """
+        prefix = path.rstrip('/') + '/'
+        prefix_len = len(prefix)
+        props: List[Tuple[str, str, str]] = []
+        dirs: List[str] = []
+        with self.lock:
+            for prop_path, (value, type_str) in self.values.items():
+                if not prop_path.startswith(prefix):
+                    continue
+                name, sep, _ = prop_path[prefix_len:].partition('/')
+                if sep:
+                    if name not in dirs:
+                        dirs.append(name)
+                else:
+                    props.append((name, value, type_str))
+        return props, dirs
+
+    def is_dir(self, path: str) -> bool:
+        prefix = path.rstrip('/') + '/'
+        with self.lock:
+            return any(prop_path.startswith(prefix) for prop_path in self.values)
+
+
+class _TelnetHandler(socketserver.StreamRequestHandler):
+    server: '_TelnetServer'
+    disable_nagle_algorithm = True
+
+    def _reply(self, lines: List[str]):
+        reply = ''.join(f'{line}\r\n' for line in lines).encode()
+        if not self.data_mode:
+            reply += b'/> '
+        if reply:
+            with self.write_lock:
+                self.wfile.write(reply)
+
+    def notify(self, path: str, value: str):
+        # Called from the handler of whichever connection set the property
+        with self.write_lock:
+            self.wfile.write(f'{path}={value}\r\n'.encode())
+
+    def handle(self):
+        tree = self.server.tree
+        self.data_mode = False  # Data mode: no prompt, only values, `set` and `cd` are silent
+        self.write_lock = threading.Lock()
+        try:
+            self._handle_cmds(tree)
+        finally:
+            self.server.unsubscribe_all(self)
+
+    def _handle_cmds(self, tree: PropertyTree):
+        for raw_line in self.rfile:
+            cmd, _, args = raw_line.decode().strip().partition(' ')
+            if cmd == 'cd':
+                self._reply([])
+            elif cmd == 'data':
+                self.data_mode = True
+            elif cmd == 'prompt':
+                self.data_mode = False
+                self._reply([])
+            elif cmd == 'get':
+                value = tree.get(args)
+                if value is None and tree.is_dir(args):
+                    value = ('', 'none')  # Directories don't have a value
+                if self.data_mode:
+                    self._reply(['' if value is None else value[0]])
+                elif value is None:
+                    self._reply([f'-ERR get: \'{args}\' not found'])
+                else:
+                    self._reply([f'{args.rsplit("/", 1)[-1]} = \'{value[0]}\' ({value[1]})'])
+            elif cmd == 'set':
+                path, _, value_str = args.partition(' ')
+                value, type_str = tree.set(path, value_str)
+                self._reply([] if self.data_mode else [f'{path.rsplit("/", 1)[-1]} = \'{value}\' ({type_str})'])
+                self.server.notify(path, value)
+            elif cmd == 'subscribe':
+                self.server.subscribe(self, args)
+                self._reply([])
+            elif cmd == 'unsubscribe':
+                self.server.unsubscribe(self, args)
+                self._reply([])
+            elif cmd == 'ls':
+                props, dirs = tree.children(args)
+                lines = [f'{name}/' for name in dirs]
+                if self.data_mode:
+                    lines += [name for name, _, _ in props]
+                else:
+                    lines += [f'{name} = \'{value}\' ({type_str})' for name, value, type_str in props]
+                self._reply(lines)
+            elif cmd == 'quit':
+                return
+            else:
+                self._reply(['Valid commands are:', 'cd, data, get, ls, prompt, quit, set, subscribe, unsubscribe'])
+
+
+class _TelnetServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, tree: PropertyTree):
+        super().__init__(('127.0.0.1', 0), _TelnetHandler)
+        self.tree = tree
+        self.subscribers: Dict[str, List[_TelnetHandler]] = {}
+        self.subscribers_lock = threading.Lock()
+
+    def subscribe(self, handler: _TelnetHandler, path: str):
+        with self.subscribers_lock:
+            self.subscribers.setdefault(path, []).append(handler)
+
+    def unsubscribe(self, handler: _TelnetHandler, path: str):
+        with self.subscribers_lock:
+            if handler in self.subscribers.get(path, []):
+                self.subscribers[path].remove(handler)
+
+    def unsubscribe_all(self, handler: _TelnetHandler):
+        with self.subscribers_lock:
+            for handlers in self.subscribers.values():
+                if handler in handlers:
+                    handlers.remove(handler)
+
+    def notify(self, path: str, value: str):
+        # Like FG, subscribers of a directory get the changes of everything under it
+        with self.subscribers_lock:
+            handlers = [
+                handler
+                for sub_path, sub_handlers in self.subscribers.items()
+                if path == sub_path or path.startswith(sub_path.rstrip('/') + '/')
+                for handler in sub_handlers
+            ]
+        for handler in handlers:
+            handler.notify(path, value)
+
+
+class _HTTPHandler(BaseHTTPRequestHandler):
+    server: '_HTTPServer'
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like FlightGear
+    # Headers and body are written separately, don't let the client's delayed ACK hold up the body
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass  # Don't spam the benchmark output
+
+    def _node_json(self, path: str, depth: int = 1) -> Optional[dict]:
+        # Like FG, `depth` levels of children are included
+        tree = self.server.tree
+        name = path.rsplit('/', 1)[-1]
+        value = tree.get(path)
+        if value is not None:
+            return {'path': path, 'name': name, 'value': value[0], 'type': value[1], 'index': 0, 'nChildren': 0}
+        if path != '/' and not tree.is_dir(path):
+            return None
+        props, dirs = tree.children(path)
+        node = {'path': path, 'name': name, 'type': 'none', 'index': 0, 'nChildren': len(dirs) + len(props)}
+        if depth < 1:
+            return node
+        prefix = path.rstrip('/')
+        children = [self._node_json(f'{prefix}/{dir_name}', depth - 1) for dir_name in dirs]
+        children += [
+            {
+                'path': f'{prefix}/{prop_name}',
+                'name': prop_name,
+                'value': value,
+                'type': type_str,
+                'index': 0,
+                'nChildren': 0,
+            }
+            for prop_name, value, type_str in props
+        ]
+        node['children'] = children
+        return node
+
+    def _send_json(self, node: Optional[dict]):
+        if node is None:
+            self.send_response(404)
+            body = b''
+        else:
+            self.send_response(200)
+            body = json.dumps(node).encode()
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _path(self) -> str:
+        path = urlsplit(self.path).path
+        path = path.replace('/json', '', 1) or '/'
+        return path.rstrip('/') or '/'
+
+    def do_GET(self):
+        depth = parse_qs(urlsplit(self.path).query).get('d', ['1'])[0]
+        self._send_json(self._node_json(self._path(), max(int(depth), 1)))
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.tree.set(self._path(), body['value'])
+        self._send_json(self._node_json(self._path()))
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, tree: PropertyTree):
+        super().__init__(('127.0.0.1', 0), _HTTPHandler)
+        self.tree = tree
+
+
+class MockPropsServer:
+    """
+    Runs a telnet or HTTP property server in a background thread
+
+    :param kind: ``'telnet'`` or ``'http'``
+    :param tree: Properties to serve, defaults to :meth:`PropertyTree.generate()`
+    """
+
+    def __init__(self, kind: str, tree: Optional[PropertyTree] = None):
+        self.tree = tree or PropertyTree.generate()
+        if kind == 'telnet':
+            self.server = _TelnetServer(self.tree)
+        elif kind == 'http':
+            self.server = _HTTPServer(self.tree)
+        else:
+            raise ValueError(f'Unknown server kind "{kind}"')
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def addr(self) -> Tuple[str, int]:
+        return self.server.server_address[:2]
+
+    def __enter__(self) -> 'MockPropsServer':
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,275 @@
+"""
+asyncio interface to the FlightGear native protocol (FDM, Controls and GUI).
+Many connections can share one event loop, instead of one process each.
+"""
+
+import asyncio
+import inspect
+import socket
+from typing import Any, Awaitable, ByteString, Callable, Dict, Optional, Sequence, Tuple, Union
+
+from construct import Container, Struct
+
+from .fg_if import FGPacketHandler, FDMConnection, CtrlsConnection, GuiConnection
+from .fg_util import FGConnectionError
+
+async_rx_callback_type = Callable[[Container], Union[Optional[Container], Awaitable[Optional[Container]]]]
+"""
+RX callback function type for the asyncio connections. Can be a coroutine function
+or a regular function, signature should be:
+
+.. code-block:: python
+
+    async def rx_cb(fdm_data: Construct.Container) -> Optional[Construct.Container]:
+"""
+
+
+class _FGDatagramProtocol(asyncio.DatagramProtocol):
+    """
+    Hands the received datagrams over to the connection
+    sphinx-no-autodoc
+    """
+
+    def __init__(self, conn: 'AsyncFGConnection'):
+        self.conn = conn
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]):
+        self.conn._on_datagram(data)
+
+
+class AsyncFGConnection(FGPacketHandler):
+    """
+    Base class for asyncio FlightGear connections.
+
+    Decoded packets can either be pulled with ``async for`` over the connection, or
+    handled by a callback with :meth:`start()`, but not both at once.
+    sphinx-no-autodoc
+    :param rx_timeout_s: Optional timeout value in seconds when receiving data, ``None`` to wait forever
+    :param codec: Which packet codec to use, one of :attr:`supported_codecs`. With ``numpy`` every\
+    packet gets its own record (not a shared one like :class:`flightgear_python.fg_if.FGConnection`),\
+    so packets can be kept around
+    :param fields: Only decode these fields, see :class:`flightgear_python.fg_codec.StructCodec`
+    """
+
+    def __init__(
+        self, rx_timeout_s: Optional[float] = 2.0, codec: str = 'construct', fields: Optional[Sequence[str]] = None
+    ):
+        super().__init__(codec=codec, fields=fields)
+        self.rx_timeout_s = rx_timeout_s
+        self.rx_dropped_count = 0  #: Number of datagrams thrown away because the queue was full
+
+        self.fg_rx_sock: Optional[socket.socket] = None
+        self.fg_rx_cb: Optional[async_rx_callback_type] = None
+        self.rx_transport: Optional[asyncio.DatagramTransport] = None
+        self.rx_queue: Optional[asyncio.Queue] = None
+        self.rx_task: Optional[asyncio.Task] = None
+
+        # Fills in the fields that weren't decoded when sending, see `fields`
+        self.fg_last_rx_msg: Optional[ByteString] = None
+
+        self.fg_tx_addr: Optional[Tuple[str, int]] = None
+        self.tx_transport: Optional[asyncio.DatagramTransport] = None
+
+    async def connect_rx(
+        self, fg_host: str, fg_port: int, rx_cb: Optional[async_rx_callback_type] = None, max_queue: int = 64
+    ):
+        """
+        Connect to a UDP output of FlightGear
+
+        :param fg_host: IP address of FG (usually localhost)
+        :param fg_port: Port of the output socket (i.e. the ``5501`` from\
+        ``--native-fdm=socket,out,30,localhost,5501,udp``)
+        :param rx_cb: Callback function used by :meth:`start()`.\
+        Function signature should follow :attr:`async_rx_callback_type`
+        :param max_queue: Number of datagrams that are kept while waiting to be handled. When the\
+        queue is full the oldest datagram is thrown away (see :attr:`rx_dropped_count`), so that\
+        a slow consumer doesn't fall further and further behind
+        """
+        # Same socket options as the regular connections, asyncio doesn't allow SO_REUSEADDR for UDP
+        self.fg_rx_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.fg_rx_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        fg_rx_addr = (fg_host, fg_port)
+        try:
+            self.fg_rx_sock.bind(fg_rx_addr)
+        except Exception as e:
+            self.fg_rx_sock.close()
+            raise FGConnectionError(f'Could not bind to {fg_rx_addr}: {e}')
+        self.fg_rx_sock.setblocking(False)
+
+        self.fg_rx_cb = rx_cb
+        self.rx_queue = asyncio.Queue(maxsize=max_queue)
+        loop = asyncio.get_running_loop()
+        self.rx_transport, _ = await loop.create_datagram_endpoint(
+            lambda: _FGDatagramProtocol(self), sock=self.fg_rx_sock
+        )
+
+    async def connect_tx(self, fg_host: str, fg_port: int):
+        """
+        Connect to a UDP input of FlightGear
+
+        :param fg_host: IP address of FG (usually localhost)
+        :param fg_port: Port of the input socket (i.e. the ``5502`` from\
+        ``--native-fdm=socket,in,30,localhost,5502,udp``)
+        """
+        fg_tx_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        fg_tx_sock.setblocking(False)
+        self.fg_tx_addr = (fg_host, fg_port)
+        loop = asyncio.get_running_loop()
+        self.tx_transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, sock=fg_tx_sock)
+        self._fg_enable_change_tracking()
+
+    def _on_datagram(self, data: bytes):
+        if self.codec == 'numpy':
+            # The record has to be writable for the radian correction (and the callback)
+            data = bytearray(data)
+        if self.rx_queue.full():
+            self.rx_queue.get_nowait()
+            self.rx_dropped_count += 1
+        self.rx_queue.put_nowait(data)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Any:
+        if self.rx_transport is None:
+            raise StopAsyncIteration
+        try:
+            rx_msg = await asyncio.wait_for(self.rx_queue.get(), self.rx_timeout_s)
+        except asyncio.TimeoutError as e:
+            raise FGConnectionError(f'Timeout waiting for data, waited {self.rx_timeout_s} seconds') from e
+        if rx_msg is None:
+            raise StopAsyncIteration  # Connection was closed while waiting
+        self.fg_last_rx_msg = rx_msg
+        return self._fg_decode(rx_msg)
+
+    def send(self, s: Any):
+        """
+        Send a packet to FlightGear
+
+        :param s: Packet to send, i.e. one that was received and modified
+        """
+        if self.tx_transport is None:
+            raise FGConnectionError('TX not connected, call connect_tx() first')
+        self.tx_transport.sendto(self._fg_encode(s, self.fg_last_rx_msg), self.fg_tx_addr)
+
+    async def _rx_loop(self):
+        async for s in self:
+            # Call user method
+            s = self.fg_rx_cb(s)
+            if inspect.isawaitable(s):
+                s = await s
+            # Send data back to FG
+            if self.tx_transport is not None and s is not None:
+                self.send(s)
+
+    def start(self) -> asyncio.Task:
+        """
+        Start handling received packets with the callback from :meth:`connect_rx()`
+
+        :return: Task that runs the RX/TX loop, it finishes with :class:`flightgear_python.fg_util.FGConnectionError`\
+        if no data is received for ``rx_timeout_s``
+        """
+        if self.fg_rx_cb is None:
+            raise FGConnectionError('No RX callback given to connect_rx()')
+        self.rx_task = asyncio.ensure_future(self._rx_loop())
+        return self.rx_task
+
+    def stop(self):
+        """
+        Stop the RX/TX loop and close the sockets. Anyone iterating over the connection gets ``StopAsyncIteration``
+        """
+        if self.rx_task is not None:
+            self.rx_task.cancel()
+            self.rx_task = None
+        if self.rx_transport is not None:
+            self.rx_transport.close()
+            self.rx_transport = None
+            # Wake up anyone waiting for data
+            while not self.rx_queue.empty():
+                self.rx_queue.get_nowait()
+            self.rx_queue.put_nowait(None)
+        if self.tx_transport is not None:
+            self.tx_transport.close()
+            self.tx_transport = None
+
+
+class AsyncFDMConnection(AsyncFGConnection):
+    """
+    asyncio FlightGear Flight Dynamics Model Connection
+
+    :param fdm_version: Net FDM version (24, 25, or None for auto-detection)
+    :param rx_timeout_s: Optional timeout value in seconds when receiving data
+    :param codec: Which packet codec to use, one of :attr:`AsyncFGConnection.supported_codecs`
+    :param fields: Only decode these fields (i.e. ``['lat_rad', 'lon_rad', 'alt_m']``), which is much faster than\
+    decoding the whole packet. See :class:`flightgear_python.fg_codec.StructCodec`.\
+    Packets sent back are the received packet with these fields updated
+    """
+
+    fg_stream_name = FDMConnection.fg_stream_name
+    fg_supported_structs: Dict[int, Struct] = FDMConnection.fg_supported_structs
+    fg_version_construct = FDMConnection.fg_version_construct
+    fg_fix_radians = FDMConnection.fg_fix_radians
+
+    def __init__(
+        self,
+        fdm_version: Optional[int] = None,
+        rx_timeout_s: Optional[float] = 2.0,
+        codec: str = 'construct',
+        fields: Optional[Sequence[str]] = None,
+    ):
+        super().__init__(rx_timeout_s=rx_timeout_s, codec=codec, fields=fields)
+        self._select_net_struct(fdm_version)
+
+
+class AsyncCtrlsConnection(AsyncFGConnection):
+    """
+    asyncio FlightGear Controls Connection
+
+    :param ctrls_version: Net Ctrls version (27, or None for auto-detection)
+    :param rx_timeout_s: Optional timeout value in seconds when receiving data
+    :param codec: Which packet codec to use, one of :attr:`AsyncFGConnection.supported_codecs`
+    :param fields: Only decode these fields (i.e. ``['aileron', 'elevator', 'rudder']``), which is much faster than\
+    decoding the whole packet. See :class:`flightgear_python.fg_codec.StructCodec`.\
+    Packets sent back are the received packet with these fields updated
+    """
+
+    fg_stream_name = CtrlsConnection.fg_stream_name
+    fg_supported_structs: Dict[int, Struct] = CtrlsConnection.fg_supported_structs
+    fg_version_construct = CtrlsConnection.fg_version_construct
+
+    def __init__(
+        self,
+        ctrls_version: Optional[int] = None,
+        rx_timeout_s: Optional[float] = 2.0,
+        codec: str = 'construct',
+        fields: Optional[Sequence[str]] = None,
+    ):
+        super().__init__(rx_timeout_s=rx_timeout_s, codec=codec, fields=fields)
+        self._select_net_struct(ctrls_version)
+
+
+class AsyncGuiConnection(AsyncFGConnection):
+    """
+    asyncio FlightGear GUI Connection
+
+    :param gui_version: Net GUI version (8, or None for auto-detection)
+    :param rx_timeout_s: Optional timeout value in seconds when receiving data
+    :param codec: Which packet codec to use, one of :attr:`AsyncFGConnection.supported_codecs`
+    :param fields: Only decode these fields (i.e. ``['lat_rad', 'lon_rad', 'psi_rad']``), which is much faster than\
+    decoding the whole packet. See :class:`flightgear_python.fg_codec.StructCodec`.\
+    Packets sent back are the received packet with these fields updated
+    """
+
+    fg_stream_name = GuiConnection.fg_stream_name
+    fg_supported_structs: Dict[int, Struct] = GuiConnection.fg_supported_structs
+    fg_version_construct = GuiConnection.fg_version_construct
+
+    def __init__(
+        self,
+        gui_version: Optional[int] = None,
+        rx_timeout_s: Optional[float] = 2.0,
+        codec: str = 'construct',
+        fields: Optional[Sequence[str]] = None,
+    ):
+        super().__init__(rx_timeout_s=rx_timeout_s, codec=codec, fields=fields)
+        self._select_net_struct(gui_version)
@@ -0,0 +1,722 @@
+"""
+Precompiled packet codecs for the FlightGear network structs
+"""
+
+import copy
+import struct
+from collections.abc import MutableMapping
+from typing import Any, ByteString, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from construct import (
+    Array,
+    Bytes,
+    Const,
+    ConstError,
+    Construct,
+    Container,
+    Enum,
+    EnumInteger,
+    FormatField,
+    FormatFieldError,
+    ListContainer,
+    MappingError,
+    RangeError,
+    Renamed,
+    StreamError,
+    Struct,
+)
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, it's only needed for NumpyStructCodec
+    np = None
+
+FIELD_VALUE = 'value'  #: Plain number (or array of numbers)
+FIELD_CONST = 'const'  #: Constant number, i.e. the struct version
+FIELD_ENUM = 'enum'  #: Number (or array of numbers) mapped to names
+FIELD_BYTES = 'bytes'  #: Raw bytes, i.e. padding
+FIELD_OPAQUE = 'opaque'  #: Anything else, delegated back to construct (i.e. ``BitStruct``)
+
+
+class CodecField(NamedTuple):
+    """
+    Location and decoding information for a single field of a network struct
+    sphinx-no-autodoc
+    """
+
+    name: str
+    offset: int  # Byte offset from the start of the packet
+    size: int  # Size in bytes
+    fmt: str  # ``struct`` format of the field, without the byte order
+    count: Optional[int]  # Number of elements for arrays, ``None`` for scalars
+    kind: str  # One of the ``FIELD_*`` constants
+    subcon: Construct  # Construct of a single element (or of the whole field for opaque fields)
+
+
+def _format_field_code(format_field: FormatField) -> Tuple[str, str]:
+    # `fmtstr` is something like '>d', split it into byte order and type code
+    return format_field.fmtstr[0], format_field.fmtstr[1:]
+
+
+def describe_struct(net_struct: Struct) -> Tuple[str, List[CodecField]]:
+    """
+    Flatten a network struct into its byte order and a list of fields with their offsets
+    sphinx-no-autodoc
+
+    :param net_struct: One of the FlightGear network structs, i.e. :attr:`flightgear_python.fdm_v24.fdm_struct`
+    :return: ``struct`` byte order character and the list of fields
+    """
+    byte_order: Optional[str] = None
+    fields: List[CodecField] = []
+    offset = 0
+    for renamed in net_struct.subcons:
+        if not isinstance(renamed, Renamed):
+            raise ValueError(f'Unnamed struct member {renamed} can not be described')
+        name = renamed.name
+        subcon = renamed.subcon
+
+        count: Optional[int] = None
+        element = subcon
+        if isinstance(subcon, Array) and isinstance(subcon.count, int):
+            count = subcon.count
+            element = subcon.subcon
+
+        field_order: Optional[str] = None
+        if isinstance(element, Const) and isinstance(element.subcon, FormatField) and count is None:
+            kind = FIELD_CONST
+            field_order, code = _format_field_code(element.subcon)
+        elif isinstance(element, Enum) and isinstance(element.subcon, FormatField):
+            kind = FIELD_ENUM
+            field_order, code = _format_field_code(element.subcon)
+        elif isinstance(element, FormatField):
+            kind = FIELD_VALUE
+            field_order, code = _format_field_code(element)
+        elif isinstance(element, Bytes) and isinstance(element.length, int) and count is None:
+            kind = FIELD_BYTES
+            code = f'{element.length}s'
+        else:
+            # Not something we know how to unpack in bulk, let construct deal with it
+            kind = FIELD_OPAQUE
+            count = None
+            element = subcon
+            code = f'{subcon.sizeof()}s'
+
+        if field_order is not None:
+            if byte_order is None:
+                byte_order = field_order
+            elif byte_order != field_order:
+                raise ValueError(f'Mixed byte order in struct, field {name} is "{field_order}" not "{byte_order}"')
+
+        fmt = code if count is None else f'{count}{code}'
+        size = struct.calcsize(f'<{fmt}')
+        fields.append(CodecField(name, offset, size, fmt, count, kind, element))
+        offset += size
+
+    if byte_order is None:
+        raise ValueError('Could not determine the byte order of the struct')
+    return byte_order, fields
+
+
+class TrackedContainer(Container):
+    """
+    ``Container`` that keeps track of which fields were modified since it was decoded, so that
+    :meth:`StructCodec.build()` only has to encode those. Arrays are :class:`TrackedListContainer`\
+    so that changing a single element is noticed too. Copies are plain ``Container`` objects.
+    sphinx-no-autodoc
+    """
+
+    __slots__ = ['__recursion_lock__', 'source', 'modified_fields', 'opaque_copies']
+
+    def __init__(self, *args, **kwargs):
+        self.source: Optional[ByteString] = None  # Buffer the packet was decoded from
+        self.modified_fields: Set[str] = set()
+        # How the opaque fields (i.e. a BitStruct) were decoded, since they can be modified in-place
+        self.opaque_copies: Optional[Dict[str, Any]] = None
+        super().__init__(*args, **kwargs)
+
+    def __setitem__(self, key: str, value: Any):
+        self.modified_fields.add(key)
+        Container.__setitem__(self, key, value)
+
+    def __delitem__(self, key: str):
+        self.modified_fields.add(key)
+        Container.__delitem__(self, key)
+
+    def __reduce__(self):
+        return Container, (), Container.__getstate__(self)
+
+
+class _TrackedContainerFill(TrackedContainer):
+    """
+    Same layout as :class:`TrackedContainer`, but filling it in doesn't count as modifications
+    (and is as fast as for a ``Container``). Turned into a :class:`TrackedContainer` once decoded
+    sphinx-no-autodoc
+    """
+
+    __slots__ = ()
+    # The slots are set once it's a TrackedContainer
+    __init__ = Container.__init__
+    # Both, since they share a slot. Otherwise every assignment goes through a Python-level lookup
+    __setitem__ = Container.__setitem__
+    __delitem__ = Container.__delitem__
+
+
+class TrackedListContainer(ListContainer):
+    """
+    ``ListContainer`` that marks its field as modified in the :class:`TrackedContainer` it belongs to
+    sphinx-no-autodoc
+    """
+
+    # The owner's set rather than the owner, so that there's no reference cycle for the garbage collector
+    __slots__ = ['modified_fields', 'name']
+
+    def __reduce__(self):
+        return ListContainer, (list(self),)
+
+
+def _marks_modified(method_name: str):
+    list_method = getattr(ListContainer, method_name)
+
+    def method(self, *args, **kwargs):
+        modified_fields = getattr(self, 'modified_fields', None)
+        if modified_fields is not None:
+            modified_fields.add(self.name)
+        return list_method(self, *args, **kwargs)
+
+    method.__name__ = method_name
+    return method
+
+
+for _method_name in (
+    '__setitem__',
+    '__delitem__',
+    '__iadd__',
+    '__imul__',
+    'append',
+    'clear',
+    'extend',
+    'insert',
+    'pop',
+    'remove',
+    'reverse',
+    'sort',
+):
+    setattr(TrackedListContainer, _method_name, _marks_modified(_method_name))
+
+
+class StructCodec:
+    """
+    Packet codec that behaves like ``Struct.parse()``/``Struct.build()`` of a
+    FlightGear network struct, but does all the (un)packing with a single
+    precompiled :class:`struct.Struct` instead of walking the construct tree
+    for every packet.
+
+    :param net_struct: One of the FlightGear network structs, i.e. :attr:`flightgear_python.fdm_v24.fdm_struct`
+    :param fields: Only decode these fields (plus the version), everything else is skipped\
+    without being unpacked. ``None`` for all of them. Building a packet then needs the\
+    original packet to fill in the rest, see :meth:`build()`
+    :param track_changes: Decode to :class:`TrackedContainer` instead of ``Container``, so that\
+    :meth:`build()` only has to encode the fields that were modified. The container keeps a reference\
+    to the decoded buffer, and decoding costs a bit more
+    """
+
+    def __init__(self, net_struct: Struct, fields: Optional[Sequence[str]] = None, track_changes: bool = False):
+        self.net_struct = net_struct
+        self.track_changes = track_changes
+        self.byte_order, self.fields = describe_struct(net_struct)
+        self.field_dict: Dict[str, CodecField] = {field.name: field for field in self.fields}
+        self.selected_names: Optional[Tuple[str, ...]] = None if fields is None else tuple(fields)
+        self.selected_fields = self._select_fields()
+
+        # Skipped bytes are padding ('x') in the format, so they cost nothing to unpack.
+        # The total size stays the same so that short packets are still caught.
+        format_parts: List[str] = []
+        offset = 0
+        for field in self.selected_fields:
+            if field.offset > offset:
+                format_parts.append(f'{field.offset - offset}x')
+            format_parts.append(field.fmt)
+            offset = field.offset + field.size
+        packet_size = self.fields[-1].offset + self.fields[-1].size
+        if packet_size > offset:
+            format_parts.append(f'{packet_size - offset}x')
+        self.struct_format = self.byte_order + ''.join(format_parts)
+        self._struct = struct.Struct(self.struct_format)
+
+        # Position of every field in the tuple returned by `unpack()`
+        self._plan: List[Tuple[CodecField, int, int]] = []
+        value_idx = 0
+        for field in self.selected_fields:
+            value_end_idx = value_idx + (1 if field.count is None else field.count)
+            self._plan.append((field, value_idx, value_end_idx))
+            value_idx = value_end_idx
+        # Used to patch fields into an existing packet
+        self._field_structs: Dict[str, struct.Struct] = {
+            field.name: struct.Struct(self.byte_order + field.fmt) for field in self.fields
+        }
+        # Changes inside of these aren't tracked, they're compared to how they were decoded instead
+        self._opaque_names = tuple(field.name for field in self.selected_fields if field.kind == FIELD_OPAQUE)
+        # Past this many modified fields a full build is faster than patching
+        self._max_patch_fields = len(self.fields) // 2
+
+    def _select_fields(self) -> List[CodecField]:
+        if self.selected_names is None:
+            return self.fields
+        unknown_names = [name for name in self.selected_names if name not in self.field_dict]
+        if unknown_names:
+            raise ValueError(f'Unknown fields {unknown_names}, must be in {list(self.field_dict.keys())}')
+        # Constant fields are always checked, that's what catches a wrong version
+        return [field for field in self.fields if field.name in self.selected_names or field.kind == FIELD_CONST]
+
+    @property
+    def is_partial(self) -> bool:
+        """
+        If only some of the fields are decoded
+        """
+        return len(self.selected_fields) != len(self.fields)
+
+    def __reduce__(self):
+        # struct.Struct can't be pickled, but it's cheap to recreate from the construct definition
+        if self.track_changes:
+            return self.__class__, (self.net_struct, self.selected_names, True)
+        if self.selected_names is None:
+            return self.__class__, (self.net_struct,)
+        return self.__class__, (self.net_struct, self.selected_names)
+
+    def sizeof(self) -> int:
+        """
+        :return: Size of a packet in bytes
+        """
+        return self._struct.size
+
+    def parse(self, data: Any) -> Container:
+        """
+        Decode a packet, same as ``Struct.parse()``
+
+        :param data: Any bytes-like object, at least :meth:`sizeof()` long
+        :return: Decoded packet
+        """
+        try:
+            values = self._struct.unpack_from(data)
+        except struct.error as e:
+            raise StreamError(f'Could not unpack {len(data)} bytes, expected {self._struct.size}: {e}') from e
+
+        track_changes = self.track_changes
+        if track_changes:
+            obj = _TrackedContainerFill()
+            modified_fields: Set[str] = set()
+            list_cls = TrackedListContainer
+        else:
+            obj = Container()
+            list_cls = ListContainer
+        for field, idx, end_idx in self._plan:
+            kind = field.kind
+            if field.count is None:
+                value = values[idx]
+                if kind == FIELD_ENUM:
+                    value = self._decode_enum(field.subcon, value)
+                elif kind == FIELD_CONST:
+                    if value != field.subcon.value:
+                        raise ConstError(f'parsing expected {field.subcon.value!r} but parsed {value!r}')
+                elif kind == FIELD_OPAQUE:
+                    value = field.subcon.parse(value)
+            else:
+                if kind == FIELD_ENUM:
+                    value = list_cls(self._decode_enum(field.subcon, v) for v in values[idx:end_idx])
+                else:
+                    value = list_cls(values[idx:end_idx])
+                if track_changes:
+                    value.modified_fields = modified_fields
+                    value.name = field.name
+            obj[field.name] = value
+
+        if track_changes:
+            # Container.__setattr__ would store these as fields
+            object.__setattr__(obj, '__class__', TrackedContainer)
+            object.__setattr__(obj, 'source', data)
+            object.__setattr__(obj, 'modified_fields', modified_fields)
+            opaque_copies = {name: copy.copy(obj[name]) for name in self._opaque_names} if self._opaque_names else None
+            object.__setattr__(obj, 'opaque_copies', opaque_copies)
+        return obj
+
+    def build(self, obj: Dict[str, Any], base: Optional[ByteString] = None) -> bytes:
+        """
+        Encode a packet, same as ``Struct.build()``
+
+        :param obj: Decoded packet, usually what was returned from :meth:`parse()`
+        :param base: The packet ``obj`` was decoded from. If given, and ``obj`` is a :class:`TrackedContainer`\
+        (see ``track_changes``), only the fields that were modified since are encoded and written\
+        over a copy of ``base``. Required when only some fields are decoded
+        :return: Encoded packet
+        """
+        if base is not None and isinstance(obj, TrackedContainer) and obj.source is base:
+            modified_names = self._modified_names(obj)
+            if self.is_partial or len(modified_names) <= self._max_patch_fields:
+                return self._patch(obj, base, modified_names)
+        elif base is not None and self.is_partial:
+            return self._patch(obj, base, self.selected_names)
+        elif self.is_partial:
+            raise ValueError('Only some fields are decoded, the original packet is needed to build a packet')
+
+        # Same as _field_args(), but inlined since this is the hot path
+        args: List[Any] = []
+        for field in self.fields:
+            kind = field.kind
+            if kind == FIELD_CONST:
+                value = obj.get(field.name, None)
+                if value not in (None, field.subcon.value):
+                    raise ConstError(f'building expected None or {field.subcon.value!r} but got {value!r}')
+                args.append(field.subcon.value)
+                continue
+
+            value = obj[field.name]
+            if field.count is not None:
+                if len(value) != field.count:
+                    raise RangeError(f'expected {field.count} elements for {field.name}, found {len(value)}')
+                if kind == FIELD_ENUM:
+                    args.extend(self._encode_enum(field.subcon, v) for v in value)
+                else:
+                    args.extend(value)
+            elif kind == FIELD_VALUE:
+                args.append(value)
+            elif kind == FIELD_ENUM:
+                args.append(self._encode_enum(field.subcon, value))
+            elif kind == FIELD_BYTES:
+                if len(value) != field.size:
+                    raise StreamError(f'bytes object of wrong length, expected {field.size}, found {len(value)}')
+                args.append(bytes(value))
+            else:
+                args.append(field.subcon.build(value))
+
+        try:
+            return self._struct.pack(*args)
+        except struct.error as e:
+            raise FormatFieldError(f'Could not pack {self.net_struct}: {e}') from e
+
+    def _modified_names(self, obj: TrackedContainer) -> Set[str]:
+        """
+        Fields of ``obj`` that were modified since it was decoded
+        """
+        modified_names = obj.modified_fields
+        if obj.opaque_copies:
+            modified_names = set(modified_names)
+            for name, original in obj.opaque_copies.items():
+                if obj.get(name) != original:
+                    modified_names.add(name)
+        return modified_names
+
+    def _patch(self, obj: Dict[str, Any], base: ByteString, names: Iterable[str]) -> bytes:
+        """
+        Write the given fields of ``obj`` over a copy of ``base``
+        """
+        if len(base) < self.sizeof():
+            raise StreamError(f'Could not patch {len(base)} bytes, expected {self.sizeof()}')
+        packet = bytearray(base[: self.sizeof()])
+        field_dict = self.field_dict
+        field_structs = self._field_structs
+        for name in names:
+            field = field_dict.get(name)
+            if field is None:
+                continue  # Not part of the struct, construct ignores these too
+            try:
+                if field.kind == FIELD_VALUE and field.count is None:
+                    field_structs[name].pack_into(packet, field.offset, obj[name])
+                else:
+                    field_structs[name].pack_into(packet, field.offset, *self._field_args(field, obj))
+            except struct.error as e:
+                raise FormatFieldError(f'Could not pack {name}: {e}') from e
+        return bytes(packet)
+
+    def _field_args(self, field: CodecField, obj: Dict[str, Any]) -> List[Any]:
+        """
+        Values to pack for a field
+        """
+        kind = field.kind
+        if kind == FIELD_CONST:
+            value = obj.get(field.name, None)
+            if value not in (None, field.subcon.value):
+                raise ConstError(f'building expected None or {field.subcon.value!r} but got {value!r}')
+            return [field.subcon.value]
+
+        value = obj[field.name]
+        if field.count is not None:
+            if len(value) != field.count:
+                raise RangeError(f'expected {field.count} elements for {field.name}, found {len(value)}')
+            if kind == FIELD_ENUM:
+                return [self._encode_enum(field.subcon, v) for v in value]
+            return list(value)
+        elif kind == FIELD_VALUE:
+            return [value]
+        elif kind == FIELD_ENUM:
+            return [self._encode_enum(field.subcon, value)]
+        elif kind == FIELD_BYTES:
+            if len(value) != field.size:
+                raise StreamError(f'bytes object of wrong length, expected {field.size}, found {len(value)}')
+            return [bytes(value)]
+        else:
+            return [field.subcon.build(value)]
+
+    @staticmethod
+    def _decode_enum(enum: Enum, value: int) -> Any:
+        try:
+            return enum.decmapping[value]
+        except KeyError:
+            return EnumInteger(value)
+
+    @staticmethod
+    def _encode_enum(enum: Enum, value: Any) -> int:
+        if isinstance(value, int):
+            return value
+        try:
+            return enum.encmapping[value]
+        except KeyError:
+            raise MappingError(f'building failed, no mapping for {value!r}') from None
+
+
+class LazyContainer(MutableMapping):
+    """
+    Packet that only decodes a field when it's read, see :class:`LazyStructCodec`.
+    Fields can be read and written like a ``Container`` (``packet.alt_m``, ``packet['phi_rad']``),
+    copies (i.e. pickling it) are plain ``Container`` objects with every field decoded.
+    sphinx-no-autodoc
+    """
+
+    __slots__ = ['_codec', '_data', '_values', '_modified']
+
+    def __init__(self, codec: 'LazyStructCodec', data: bytes):
+        object.__setattr__(self, '_codec', codec)
+        object.__setattr__(self, '_data', data)  # The packet, owned by this container
+        object.__setattr__(self, '_values', {})  # Fields that were read or written so far
+        object.__setattr__(self, '_modified', set())
+
+    def __getitem__(self, name: str) -> Any:
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+        value = self._codec.decode_field(self._data, name)
+        self._values[name] = value
+        return value
+
+    def __setitem__(self, name: str, value: Any):
+        if name not in self._codec.field_dict:
+            raise KeyError(f'{name} is not a field of {self._codec.net_struct}')
+        self._values[name] = value
+        self._modified.add(name)
+
+    def __delitem__(self, name: str):
+        raise TypeError('Fields of a packet can not be deleted')
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name: str, value: Any):
+        try:
+            self[name] = value
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __contains__(self, name: Any) -> bool:
+        return name in self._codec.field_dict  # Without decoding it
+
+    def __iter__(self):
+        return iter(self._codec.field_dict)
+
+    def __len__(self) -> int:
+        return len(self._codec.field_dict)
+
+    def to_container(self) -> Container:
+        """
+        :return: Every field decoded, same as ``StructCodec.parse()``
+        """
+        return Container(self.items())
+
+    def __reduce__(self):
+        return Container, (), None, None, iter(self.items())
+
+    def __repr__(self) -> str:
+        return repr(self.to_container())
+
+    def __str__(self) -> str:
+        return str(self.to_container())
+
+
+class LazyStructCodec(StructCodec):
+    """
+    Packet codec that doesn't decode anything up front: :meth:`parse()` returns a
+    :class:`LazyContainer` that decodes (and caches) each field the first time it's read.
+    Worth it when a callback only looks at a few fields, without having to list them like
+    with ``StructCodec(fields=...)``.
+
+    :param net_struct: One of the FlightGear network structs, i.e. :attr:`flightgear_python.fdm_v24.fdm_struct`
+    :param corrections: Functions that are applied to some fields when they're decoded, i.e.\
+    :func:`flightgear_python.fg_util.fix_fg_radian`. Corrected fields are always encoded, whether they\
+    were read or not, same as if the correction had been applied to every packet up front
+    """
+
+    def __init__(self, net_struct: Struct, corrections: Optional[Dict[str, Callable[[Any], Any]]] = None):
+        super().__init__(net_struct)
+        self.corrections: Dict[str, Callable[[Any], Any]] = dict(corrections or {})
+        unknown_names = [name for name in self.corrections if name not in self.field_dict]
+        if unknown_names:
+            raise ValueError(f'Unknown fields {unknown_names}, must be in {list(self.field_dict.keys())}')
+        self._const_fields = [field for field in self.fields if field.kind == FIELD_CONST]
+
+    def __reduce__(self):
+        return self.__class__, (self.net_struct, self.corrections)
+
+    def parse(self, data: Any) -> LazyContainer:
+        """
+        Check a packet and wrap it, only the constant fields (i.e. version) are decoded
+
+        :param data: Any bytes-like object, at least :meth:`sizeof()` long. It's copied, so\
+        the container stays valid when ``data`` is reused for the next packet
+        :return: Packet whose fields are decoded when they're read
+        """
+        if len(data) < self.sizeof():
+            raise StreamError(f'Could not unpack {len(data)} bytes, expected {self.sizeof()}')
+        packet = bytes(data[: self.sizeof()])
+        for field in self._const_fields:
+            (value,) = self._field_structs[field.name].unpack_from(packet, field.offset)
+            if value != field.subcon.value:
+                raise ConstError(f'parsing expected {field.subcon.value!r} but parsed {value!r}')
+        return LazyContainer(self, packet)
+
+    def decode_field(self, data: ByteString, name: str) -> Any:
+        """
+        Decode a single field of a packet, including its correction
+
+        :param data: Packet, at least :meth:`sizeof()` long
+        :param name: Field name
+        :return: Decoded value, same as in the ``Container`` from :meth:`StructCodec.parse()`
+        """
+        field = self.field_dict[name]
+        values = self._field_structs[name].unpack_from(data, field.offset)
+        kind = field.kind
+        if field.count is not None:
+            if kind == FIELD_ENUM:
+                value: Any = ListContainer(self._decode_enum(field.subcon, v) for v in values)
+            else:
+                value = ListContainer(values)
+        elif kind == FIELD_ENUM:
+            value = self._decode_enum(field.subcon, values[0])
+        elif kind == FIELD_OPAQUE:
+            value = field.subcon.parse(values[0])
+        else:
+            value = values[0]
+        correction = self.corrections.get(name)
+        if correction is not None:
+            value = correction(value)
+        return value
+
+    def build(self, obj: Any, base: Optional[ByteString] = None) -> bytes:
+        """
+        Encode a packet
+
+        :param obj: :class:`LazyContainer` from :meth:`parse()`, only the fields that were written,\
+        corrected, or could have been modified in-place (arrays) are encoded. Or anything that\
+        :meth:`StructCodec.build()` accepts
+        :param base: Not used, a :class:`LazyContainer` has its own packet
+        :return: Encoded packet
+        """
+        if not isinstance(obj, LazyContainer) or obj._codec is not self:
+            return super().build(obj)
+        values = obj._values
+        names = set(obj._modified)
+        names.update(self.corrections)
+        names.update(name for name, value in values.items() if isinstance(value, (list, dict)))
+        return self._patch(obj, obj._data, names)
+
+
+# `struct` type codes to numpy type codes (without the byte order)
+_numpy_type_codes = {
+    'd': 'f8',
+    'f': 'f4',
+    'L': 'u4',
+    'I': 'u4',
+    'l': 'i4',
+    'i': 'i4',
+}
+
+
+class NumpyStructCodec(StructCodec):
+    """
+    Packet codec that exposes a packet as a NumPy structured record (:class:`numpy.record`)
+    which is a zero-copy view over the packet buffer. Array fields (i.e. ``rpm``) are
+    ``ndarray`` views, enums are their integer values and padding is raw ``void`` data.
+
+    If the buffer is writable (i.e. a ``bytearray``) then so is the record, and writes go
+    straight into the buffer.
+
+    :param net_struct: One of the FlightGear network structs, i.e. :attr:`flightgear_python.fdm_v24.fdm_struct`
+    """
+
+    def __init__(self, net_struct: Struct):
+        if np is None:
+            raise ImportError('NumpyStructCodec requires numpy, install it with `pip3 install numpy`')
+        super().__init__(net_struct)
+        self.dtype = self._make_dtype()
+        # Constant fields are checked on the raw bytes, that way no numpy scalars are created
+        self._const_bytes: List[Tuple[CodecField, bytes]] = [
+            (field, struct.pack(self.byte_order + field.fmt, field.subcon.value))
+            for field in self.fields
+            if field.kind == FIELD_CONST
+        ]
+
+    def _make_dtype(self) -> 'np.dtype':
+        names: List[str] = []
+        formats: List[Any] = []
+        offsets: List[int] = []
+        for field in self.fields:
+            type_code = _numpy_type_codes.get(field.fmt[-1])
+            if field.kind in (FIELD_BYTES, FIELD_OPAQUE) or type_code is None:
+                field_format: Any = f'V{field.size}'
+            elif field.count is None:
+                field_format = self.byte_order + type_code
+            else:
+                field_format = (self.byte_order + type_code, (field.count,))
+            names.append(field.name)
+            formats.append(field_format)
+            offsets.append(field.offset)
+        return np.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': self.sizeof()})
+
+    def parse(self, data: Any) -> 'np.record':
+        """
+        Create a record view of a packet, no data is copied
+
+        :param data: Any buffer-protocol object, at least :meth:`sizeof()` long
+        :return: Record view over ``data``
+        """
+        self.check(data)
+        return np.frombuffer(data, dtype=self.dtype, count=1).view(np.recarray)[0]
+
+    def check(self, data: Any):
+        """
+        Check that a packet is long enough and has the right constant fields (i.e. version),
+        without creating a record
+
+        :param data: Any buffer-protocol object
+        """
+        if len(data) < self.dtype.itemsize:
+            raise StreamError(f'Could not view {len(data)} bytes, expected {self.dtype.itemsize}')
+        for field, const_bytes in self._const_bytes:
+            field_start = field.offset
+            field_end = field_start + field.size
+            if data[field_start:field_end] != const_bytes:
+                (value,) = struct.unpack_from(self.byte_order + field.fmt, data, field.offset)
+                raise ConstError(f'parsing expected {field.subcon.value!r} but parsed {value!r}')
+
+    def build(self, obj: Any, base: Optional[ByteString] = None) -> bytes:
+        """
+        Encode a packet
+
+        :param obj: Record from :meth:`parse()`, or anything that :meth:`StructCodec.build()` accepts
+        :param base: Not used, all fields are always available
+        :return: Encoded packet
+        """
+        if isinstance(obj, np.void):
+            return obj.tobytes()
+        return super().build(obj)
@@ -0,0 +1,273 @@
+"""
+Servicing many FlightGear connections from a few worker processes
+"""
+
+import os
+import selectors
+import threading
+import time
+import traceback
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import multiprocess as mp
+
+from .fg_if import FGConnection
+from .fg_util import FGConnectionError
+
+# Indices into the per-worker counters
+_WORKER_LOOPS = 0
+_WORKER_BUSY_NS = 1
+_WORKER_ELAPSED_NS = 2
+_LAST_ERROR_SIZE = 256  # Bytes kept of the description of a connection's last error
+
+
+class HubConnectionStats(NamedTuple):
+    """
+    Statistics of a single connection of a :class:`FGConnectionHub`
+    """
+
+    rx_addr: Tuple[str, int]  # Address the connection receives on
+    worker: int  # Index of the worker that services the connection
+    packets: int  # Datagrams handled since the hub was started
+    errors: int  # Datagrams that could not be decoded, or whose callback raised an exception
+    last_error: str  # Type, message and location of the latest of those errors, empty if there weren't any
+    rate_hz: float  # Datagrams per second since the previous call to :meth:`FGConnectionHub.stats()`
+
+
+class HubWorkerStats(NamedTuple):
+    """
+    Statistics of a single worker of a :class:`FGConnectionHub`
+    """
+
+    worker: int  # Index of the worker
+    num_connections: int  # Number of connections serviced by the worker
+    loops: int  # Number of times the worker woke up to handle data
+    utilisation: float  # Fraction of time spent handling data instead of waiting, since the previous stats
+
+
+class HubStats(NamedTuple):
+    """
+    Statistics of a :class:`FGConnectionHub`, see :meth:`FGConnectionHub.stats()`
+    """
+
+    connections: List[HubConnectionStats]
+    workers: List[HubWorkerStats]
+
+
+def _describe_error(e: BaseException) -> bytes:
+    description = f'{type(e).__name__}: {e}'
+    frames = traceback.extract_tb(e.__traceback__)
+    if frames:
+        description += f' ({os.path.basename(frames[-1].filename)}:{frames[-1].lineno})'
+    description_end = _LAST_ERROR_SIZE - 1  # Room for the terminating null
+    return description.encode(errors='replace')[:description_end]
+
+
+def _hub_worker_loop(
+    connections: List[Tuple[int, FGConnection]],
+    stop_event: Any,
+    ready_event: Any,
+    packet_counts: Any,
+    error_counts: Any,
+    last_errors: List[Any],
+    worker_counters: Any,
+    poll_interval_s: float,
+):
+    selector = selectors.DefaultSelector()
+    for conn_idx, conn in connections:
+        selector.register(conn.fg_rx_sock, selectors.EVENT_READ, (conn_idx, conn))
+    ready_event.set()  # Signal to parent that worker is running
+
+    start_ns = time.perf_counter_ns()
+    busy_ns = 0
+    while not stop_event.is_set():
+        events = selector.select(poll_interval_s)
+        if not events:
+            worker_counters[_WORKER_ELAPSED_NS] = time.perf_counter_ns() - start_ns
+            continue
+
+        handle_start_ns = time.perf_counter_ns()
+        for key, _ in events:
+            conn_idx, conn = key.data
+            try:
+                packet_counts[conn_idx] += conn._fg_packet_roundtrip()
+            except Exception as e:
+                # One misconfigured sender (wrong version: FGCommunicationError, truncated or garbage
+                # datagrams: ConstructError) or failing callback shouldn't take down the rest of the
+                # connections on this worker. Keep what happened, the worker may be in another process
+                last_errors[conn_idx].value = _describe_error(e)
+                error_counts[conn_idx] += 1
+        handle_end_ns = time.perf_counter_ns()
+
+        busy_ns += handle_end_ns - handle_start_ns
+        worker_counters[_WORKER_LOOPS] += 1
+        worker_counters[_WORKER_BUSY_NS] = busy_ns
+        worker_counters[_WORKER_ELAPSED_NS] = handle_end_ns - start_ns
+    selector.close()
+
+
+class FGConnectionHub:
+    """
+    Runs the RX/TX loops of many connections (i.e. one per simulated aircraft) from one
+    ``selectors`` loop per worker, instead of one process per connection like
+    :meth:`flightgear_python.fg_if.FGConnection.start()` does. Callbacks, structs, codecs
+    and ``EventPipe`` s all work the same.
+
+    The connections don't time out when they're serviced by a hub, an aircraft that goes
+    quiet just shows up with a rate of 0 in :meth:`stats()`.
+
+    :param num_workers: Number of workers, connections are sharded over them by RX port\
+    (``port % num_workers``)
+    :param poll_interval_s: How often idle workers check if they should stop
+    """
+
+    def __init__(self, num_workers: int = 1, poll_interval_s: float = 0.1):
+        if num_workers < 1:
+            raise ValueError(f'Need at least 1 worker, not {num_workers}')
+        self.num_workers = num_workers
+        self.poll_interval_s = poll_interval_s
+        self.connections: List[FGConnection] = []
+
+        self.stop_event = mp.Event()
+        self.workers: List[Any] = []
+        self.packet_counts: Optional[Any] = None
+        self.error_counts: Optional[Any] = None
+        self.last_errors: List[Any] = []
+        self.worker_counters: List[Any] = []
+
+        # State at the previous `stats()` call, to calculate rates
+        self._last_stats_ns = 0
+        self._last_packet_counts: List[int] = []
+        self._last_worker_counters: List[List[int]] = []
+
+    def add_connection(self, conn: FGConnection):
+        """
+        Add a connection to be serviced by the hub
+
+        :param conn: Connection that ``connect_rx()`` (or ``connect_rx_batch()``), and optionally\
+        ``connect_tx()``, was already called on. Don't call ``start()`` on it
+        """
+        if self.workers:
+            raise FGConnectionError('Can not add connections while the hub is running')
+        if conn.fg_rx_sock is None:
+            raise FGConnectionError('RX not connected, call connect_rx() before adding the connection')
+        self.connections.append(conn)
+
+    def worker_of(self, conn_idx: int) -> int:
+        """
+        :param conn_idx: Index of the connection, in the order they were added
+        :return: Index of the worker that services the connection
+        """
+        return self.connections[conn_idx].fg_rx_sock.getsockname()[1] % self.num_workers
+
+    def start(self, executor: str = 'process'):
+        """
+        Start the workers
+
+        :param executor: How to run the workers, one of :attr:`flightgear_python.fg_if.FGConnection.supported_executors`
+        """
+        if executor not in FGConnection.supported_executors:
+            raise ValueError(f'Unknown executor "{executor}", must be one of {FGConnection.supported_executors}')
+        if self.workers:
+            raise FGConnectionError('Hub is already running')
+
+        num_connections = len(self.connections)
+        self.packet_counts = mp.Array('Q', num_connections, lock=False)
+        self.error_counts = mp.Array('Q', num_connections, lock=False)
+        # Locked, so that a description is never read while it is half written
+        self.last_errors = [mp.Array('c', _LAST_ERROR_SIZE) for _ in range(num_connections)]
+        self.worker_counters = [mp.Array('Q', 3, lock=False) for _ in range(self.num_workers)]
+        self.stop_event.clear()
+
+        shards: List[List[Tuple[int, FGConnection]]] = [[] for _ in range(self.num_workers)]
+        for conn_idx, conn in enumerate(self.connections):
+            shards[self.worker_of(conn_idx)].append((conn_idx, conn))
+
+        ready_events = []
+        for worker_idx, shard in enumerate(shards):
+            ready_event = mp.Event()
+            worker_args = (
+                shard,
+                self.stop_event,
+                ready_event,
+                self.packet_counts,
+                self.error_counts,
+                self.last_errors,
+                self.worker_counters[worker_idx],
+                self.poll_interval_s,
+            )
+            if executor == 'thread':
+                worker = threading.Thread(target=_hub_worker_loop, args=worker_args)
+            else:
+                worker = mp.Process(target=_hub_worker_loop, args=worker_args)
+            worker.daemon = True  # workers should exit when parent exits
+            worker.start()
+            self.workers.append(worker)
+            ready_events.append(ready_event)
+        for ready_event in ready_events:
+            ready_event.wait()  # Wait for workers to actually run
+
+        self._last_stats_ns = time.perf_counter_ns()
+        self._last_packet_counts = [0] * num_connections
+        self._last_worker_counters = [[0, 0, 0] for _ in range(self.num_workers)]
+
+    def stop(self):
+        """
+        Stop the workers
+        """
+        self.stop_event.set()
+        for worker in self.workers:
+            worker.join(timeout=self.poll_interval_s * 10)
+            if isinstance(worker, mp.Process) and worker.is_alive():
+                worker.terminate()  # i.e. stuck in a callback
+        self.workers = []
+
+    def stats(self) -> HubStats:
+        """
+        Get the packet counts and rates of every connection, and the utilisation of every worker.
+        A worker that is close to fully utilised can't keep up, add more workers.
+
+        :return: Statistics, rates and utilisation are since the previous call (or since :meth:`start()`)
+        """
+        if self.packet_counts is None:
+            raise FGConnectionError('Hub was never started')
+        now_ns = time.perf_counter_ns()
+        elapsed_s = max(now_ns - self._last_stats_ns, 1) / 1e9
+        self._last_stats_ns = now_ns
+
+        connection_stats: List[HubConnectionStats] = []
+        num_connections_per_worker: Dict[int, int] = {}
+        for conn_idx, conn in enumerate(self.connections):
+            worker_idx = self.worker_of(conn_idx)
+            num_connections_per_worker[worker_idx] = num_connections_per_worker.get(worker_idx, 0) + 1
+            packets = self.packet_counts[conn_idx]
+            rate_hz = (packets - self._last_packet_counts[conn_idx]) / elapsed_s
+            self._last_packet_counts[conn_idx] = packets
+            connection_stats.append(
+                HubConnectionStats(
+                    rx_addr=conn.fg_rx_sock.getsockname(),
+                    worker=worker_idx,
+                    packets=packets,
+                    errors=self.error_counts[conn_idx],
+                    last_error=self.last_errors[conn_idx].value.decode(errors='replace'),
+                    rate_hz=rate_hz,
+                )
+            )
+
+        worker_stats: List[HubWorkerStats] = []
+        for worker_idx, counters in enumerate(self.worker_counters):
+            counters = list(counters)
+            last_counters = self._last_worker_counters[worker_idx]
+            # Both times come from the worker's clock, so they are consistent with each other
+            busy_ns = counters[_WORKER_BUSY_NS] - last_counters[_WORKER_BUSY_NS]
+            worker_elapsed_ns = counters[_WORKER_ELAPSED_NS] - last_counters[_WORKER_ELAPSED_NS]
+            self._last_worker_counters[worker_idx] = counters
+            worker_stats.append(
+                HubWorkerStats(
+                    worker=worker_idx,
+                    num_connections=num_connections_per_worker.get(worker_idx, 0),
+                    loops=counters[_WORKER_LOOPS],
+                    utilisation=busy_ns / worker_elapsed_ns if worker_elapsed_ns > 0 else 0.0,
+                )
+            )
+        return HubStats(connections=connection_stats, workers=worker_stats)
@@ -3,18 +3,23 @@ Main FlightGear interface module
 """
 
 import copy
+import os
+import select
 import socket
 import sys
 import re
-from typing import Any, ByteString, Callable, Dict, Optional, Tuple, Union, List, NamedTuple
+import threading
+from typing import Any, ByteString, Callable, Dict, Iterator, Optional, Sequence, Tuple, Union, List, NamedTuple
 
 import multiprocess as mp
 import requests
 
 from construct import ConstError, Struct, Container, Construct, Int32ub, Int32ul
 
-from .general_util import EventPipe, strip_end, deprecate_rename_wrapper
-from .fg_util import FGConnectionError, FGCommunicationError, fix_fg_radian_parsing
+from .general_util import EventPipe, DatagramBatchReceiver, LoopStats, StageTimer, strip_end, deprecate_rename_wrapper
+from .fg_util import FGConnectionError, FGCommunicationError, fg_radian_fields, fix_fg_radian, fix_fg_radian_parsing
+from .fg_codec import StructCodec, NumpyStructCodec, LazyStructCodec
+from .fg_record import PacketRecorder
 from .fdm_v24 import fdm_struct as fdm_struct_v24
 from .fdm_v25 import fdm_struct as fdm_struct_v25
 from .ctrls_v27 import ctrls_struct as ctrls_struct_v27
@@ -29,31 +34,227 @@ RX callback function type, signature should be:
     def rx_cb(fdm_data: Construct.Container, event_pipe: EventPipe) -> Optional[Construct.Container]:
 """
 
+prop_change_callback_type = Callable[[str, Any], None]
+"""
+Property change callback function type (see :meth:`TelnetConnection.subscribe()`), signature should be:
+
+.. code-block:: python
+
+    def prop_cb(prop_str: str, value: Any):
+"""
+
+rx_batch_callback_type = Callable[[List[Container], EventPipe], Optional[Container]]
+"""
+RX batch callback function type, the packets are ordered oldest first. Signature should be:
 
-class FGConnection:
+.. code-block:: python
+
+    def rx_batch_cb(fdm_batch: List[Construct.Container], event_pipe: EventPipe) -> Optional[Construct.Container]:
+"""
+
+
+class FGPacketHandler:
     """
-    Base class for FlightGear connections
+    Version detection, decoding and encoding of the FlightGear native protocol packets.
+    Shared by the regular connections and the asyncio ones in :mod:`flightgear_python.fg_aio`
     sphinx-no-autodoc
-    :param rx_timeout_s: Optional timeout value in seconds when receiving data
+    :param codec: Which packet codec to use, one of :attr:`supported_codecs`
+    :param fields: Only decode these fields, see :class:`flightgear_python.fg_codec.StructCodec`
     """
 
     # These are filled from the child class
     fg_net_struct: Optional[Struct] = None
     fg_auto_partial_parse: Optional['PartialParseSwitchStruct'] = None
+    fg_stream_name = ''
+    fg_supported_structs: Dict[int, Struct] = {}
+    fg_version_construct: Optional[Construct] = None
+    fg_fix_radians = False
+
+    #: Packet codecs that can be selected with the ``codec`` parameter:
+    #:
+    #: * ``construct``: Parse/build directly with the construct ``Struct`` (default)
+    #: * ``compiled``: Precompiled :class:`flightgear_python.fg_codec.StructCodec`, much less CPU per packet
+    #: * ``numpy``: :class:`flightgear_python.fg_codec.NumpyStructCodec`, the callback gets a ``numpy.record``\
+    #:   that is a view over the receive buffer. The record is reused and overwritten by the next packet, copy\
+    #:   it if it needs to be kept around. Nothing is allocated per packet for decoding or encoding. Requires ``numpy``
+    #: * ``lazy``: :class:`flightgear_python.fg_codec.LazyStructCodec`, fields are only decoded when the callback reads\
+    #:   them (and only the fields it writes are encoded). Fastest when only a few fields are used
+    supported_codecs = ('construct', 'compiled', 'numpy', 'lazy')
+
+    def __init__(self, codec: str = 'construct', fields: Optional[Sequence[str]] = None):
+        if codec not in self.supported_codecs:
+            raise ValueError(f'Unknown codec "{codec}", must be one of {self.supported_codecs}')
+        if fields is not None and codec in ('numpy', 'lazy'):
+            raise ValueError(f'The {codec} codec never decodes anything up front, selecting fields is not needed')
+        self.codec = codec
+        self.fg_fields: Optional[Tuple[str, ...]] = None if fields is None else tuple(fields)
+        self.fg_radian_fields = tuple(
+            field for field in fg_radian_fields if self.fg_fields is None or field in self.fg_fields
+        )
+        self.fg_net_codec: Optional[StructCodec] = None
+        # Once something is sent back, decoded packets remember where they came from so that
+        # only the fields the callback modified have to be encoded, see StructCodec.build()
+        self.fg_track_changes = False
+        # Preallocated receive buffer, reused for every packet
+        self.fg_rx_buffer = bytearray(1024)
+        # Only used by the numpy codec, record view over `fg_rx_buffer`
+        self.fg_rx_record: Optional[Any] = None
+
+    def _select_net_struct(self, version: Optional[int]):
+        """
+        Pick the struct for a protocol version from :attr:`fg_supported_structs`,
+        or detect it from the first packet if ``version`` is ``None``
+        """
+        if version is None:
+            self.fg_auto_partial_parse = PartialParseSwitchStruct(
+                partial_parse_construct=self.fg_version_construct,
+                replacement_full_structs=self.fg_supported_structs,
+            )
+        else:
+            self.fg_net_struct = self.fg_supported_structs.get(version)
+            if self.fg_net_struct is None:
+                raise NotImplementedError(
+                    f'Manually specified {self.fg_stream_name} version {version} not supported yet'
+                )
+            self._resolve_net_codec()
+
+        if self.fg_fields is not None:
+            # Catch typos here instead of when the first packet arrives
+            candidate_structs = [self.fg_net_struct] if version is not None else self.fg_supported_structs.values()
+            for net_struct in candidate_structs:
+                struct_names = [subcon.name for subcon in net_struct.subcons]
+                unknown_names = [name for name in self.fg_fields if name not in struct_names]
+                if unknown_names:
+                    raise ValueError(f'Unknown {self.fg_stream_name} fields {unknown_names}')
+
+    def _resolve_net_codec(self):
+        """
+        Create the codec for :attr:`fg_net_struct`, must be called whenever the struct changes
+        """
+        if self.fg_fields is not None:
+            # construct can't skip fields, so the compiled codec is used for both
+            self.fg_net_codec = StructCodec(
+                self.fg_net_struct, fields=self.fg_fields, track_changes=self.fg_track_changes
+            )
+        elif self.codec == 'compiled':
+            self.fg_net_codec = StructCodec(self.fg_net_struct, track_changes=self.fg_track_changes)
+        elif self.codec == 'numpy':
+            self.fg_net_codec = NumpyStructCodec(self.fg_net_struct)
+        elif self.codec == 'lazy':
+            # The radian correction is applied when a field is read
+            corrections = {field: fix_fg_radian for field in self.fg_radian_fields} if self.fg_fix_radians else None
+            self.fg_net_codec = LazyStructCodec(self.fg_net_struct, corrections=corrections)
+        else:
+            self.fg_net_codec = None
+        self.fg_rx_record = None
+
+    def _fg_enable_change_tracking(self):
+        """
+        Called when connecting TX
+        """
+        self.fg_track_changes = True
+        if self.fg_net_struct is not None:
+            self._resolve_net_codec()
+
+    def _fg_decode(self, rx_msg: ByteString) -> Any:
+        # Auto-version logic
+        if self.fg_auto_partial_parse and self.fg_net_struct is None:
+            # We lazily create the actual struct that will be used for parsing
+            self.fg_net_struct = self.fg_auto_partial_parse.resolve(rx_msg)
+            self._resolve_net_codec()
+
+        try:
+            if isinstance(self.fg_net_codec, NumpyStructCodec) and getattr(rx_msg, 'obj', None) is self.fg_rx_buffer:
+                # The record is a view over the receive buffer, so it only has to be created once
+                self.fg_net_codec.check(rx_msg)
+                if self.fg_rx_record is None:
+                    self.fg_rx_record = self.fg_net_codec.parse(self.fg_rx_buffer)
+                s = self.fg_rx_record
+            elif self.fg_net_codec is not None:
+                s = self.fg_net_codec.parse(rx_msg)
+            else:
+                s = self.fg_net_struct.parse(rx_msg)
+        except ConstError as e:
+            raise FGCommunicationError(f'Could not decode FG stream. Did you set the right version?\n{e}') from e
+
+        if self.fg_fix_radians and self.codec != 'lazy':
+            # Fix FG's radian parsing error :(
+            s = fix_fg_radian_parsing(s, self.fg_radian_fields)
+        return s
+
+    def _fg_encode(self, s: Any, rx_msg: Optional[ByteString]) -> ByteString:
+        if s is self.fg_rx_record and s is not None:
+            # Changes were made in-place to the receive buffer, send it right back
+            return rx_msg[: self.fg_net_codec.sizeof()]
+        elif self.fg_net_codec is not None:
+            # Only the modified fields are written over the received packet (and the fields that weren't decoded)
+            return self.fg_net_codec.build(s, base=rx_msg)
+        else:
+            return self.fg_net_struct.build(dict(**s))
+
+
+class FGConnection(FGPacketHandler):
+    """
+    Base class for FlightGear connections
+    sphinx-no-autodoc
+    :param rx_timeout_s: Optional timeout value in seconds when receiving data
+    :param codec: Which packet codec to use, one of :attr:`supported_codecs`
+    :param fields: Only decode these fields, see :class:`flightgear_python.fg_codec.StructCodec`
+    """
+
+    #: Ways to run the RX/TX loop, selected with :meth:`start()`:
+    #:
+    #: * ``process``: In a separate process (default). Fully isolated, but costs startup time and memory
+    #: * ``thread``: In a thread of the current process. The loop spends most of its time waiting\
+    #:   on the socket (which releases the GIL), so this is good for lightweight connections
+    #:
+    #: The loop can also be driven manually, without calling :meth:`start()`, see :meth:`step()`
+    supported_executors = ('process', 'thread')
+
+    #: Stages of the RX/TX loop that are timed by :meth:`enable_stage_timing()`:
+    #:
+    #: * ``recv``: Waiting for and receiving the datagram(s)
+    #: * ``parse``: Raw hooks (see :meth:`add_rx_raw_hook()`), decoding and the radian correction
+    #: * ``callback``: The RX callback
+    #: * ``send``: Encoding and sending the reply
+    loop_stage_names = ('recv', 'parse', 'callback', 'send')
+
+    def __init__(self, rx_timeout_s: float = 2.0, codec: str = 'construct', fields: Optional[Sequence[str]] = None):
+        super().__init__(codec=codec, fields=fields)
 
-    def __init__(self, rx_timeout_s: float = 2.0):
         self.event_pipe = EventPipe(duplex=True)
 
         self.fg_rx_sock: Optional[socket.socket] = None
         self.fg_rx_cb: Optional[rx_callback_type] = None
+        self.fg_rx_batch_cb: Optional[rx_batch_callback_type] = None
+        self.fg_rx_batch_receiver: Optional[DatagramBatchReceiver] = None
+        self.fg_rx_raw_hooks: List[Callable[[ByteString], Any]] = []
 
         self.fg_tx_sock: Optional[socket.socket] = None
         self.fg_tx_addr: Optional[Tuple[str, int]] = None
 
         self.rx_proc: Optional[mp.Process] = None
+        self.rx_thread: Optional[threading.Thread] = None
+        self.rx_stop_event = mp.Event()
+        # Separate from the event pipe, so that it only ever carries the callback's data
+        self.rx_ready_event = mp.Event()
         self.rx_timeout_s = rx_timeout_s
+        self.rx_latest_only = False
+        # Shared with the RX process, only written by it
+        self.rx_dropped = mp.Value('Q', 0, lock=False)
+        self.rx_stage_timer: Optional[StageTimer] = None
 
-    def connect_rx(self, fg_host: str, fg_port: int, rx_cb: rx_callback_type) -> EventPipe:
+    @property
+    def rx_dropped_count(self) -> int:
+        """
+        Number of datagrams that were thrown away because a newer one was already waiting.
+        Only counts up when connected with ``latest_only=True``, see :meth:`connect_rx()`
+        """
+        return self.rx_dropped.value
+
+    def connect_rx(
+        self, fg_host: str, fg_port: int, rx_cb: rx_callback_type, latest_only: bool = False, max_batch: int = 1
+    ) -> EventPipe:
         """
         Connect to a UDP output of FlightGear
 
@@ -62,9 +263,52 @@ class FGConnection:
         ``--native-fdm=socket,out,30,localhost,5501,udp``)
         :param rx_cb: Callback function, called whenever we receive data from FG.\
         Function signature should follow :attr:`rx_callback_type`
+        :param latest_only: If the callback is slower than FG, skip any datagrams that\
+        queued up in the meantime and only handle the newest one. This keeps the latency\
+        bounded, the number of skipped datagrams is available from :attr:`rx_dropped_count`
+        :param max_batch: Receive up to this many queued datagrams with one syscall (see\
+        :class:`flightgear_python.general_util.DatagramBatchReceiver`). The callback is\
+        still called once per datagram
+        :return: ``EventPipe`` so that data can be passed from the parent process\
+        to the callback process
+        """
+        self._bind_rx(fg_host, fg_port, latest_only, max_batch, batched=max_batch > 1)
+        self.fg_rx_cb = rx_cb
+        self.fg_rx_batch_cb = None
+
+        return self.event_pipe
+
+    def connect_rx_batch(
+        self,
+        fg_host: str,
+        fg_port: int,
+        rx_batch_cb: rx_batch_callback_type,
+        max_batch: int = 64,
+        latest_only: bool = False,
+    ) -> EventPipe:
+        """
+        Connect to a UDP output of FlightGear, and handle all the datagrams that are
+        waiting at once. Useful for high-rate streams (i.e. JSBSim at hundreds of Hz)
+        where one syscall and one callback per datagram is too much overhead.
+
+        :param fg_host: IP address of FG (usually localhost)
+        :param fg_port: Port of the output socket (i.e. the ``5501`` from\
+        ``--native-fdm=socket,out,30,localhost,5501,udp``)
+        :param rx_batch_cb: Callback function, called with every batch of data we receive from FG.\
+        Function signature should follow :attr:`rx_batch_callback_type`. The returned data (if any)\
+        is sent back to FG once per batch
+        :param max_batch: Maximum number of datagrams in a batch
+        :param latest_only: Same as in :meth:`connect_rx()`, the batch only ever contains the newest datagram
         :return: ``EventPipe`` so that data can be passed from the parent process\
         to the callback process
         """
+        self._bind_rx(fg_host, fg_port, latest_only, max_batch, batched=True)
+        self.fg_rx_cb = None
+        self.fg_rx_batch_cb = rx_batch_cb
+
+        return self.event_pipe
+
+    def _bind_rx(self, fg_host: str, fg_port: int, latest_only: bool, max_batch: int, batched: bool):
         # TODO: Support TCP server so that we only need 1 port
         self.fg_rx_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.fg_rx_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
@@ -73,11 +317,71 @@ class FGConnection:
             self.fg_rx_sock.bind(fg_rx_addr)
         except Exception as e:
             raise FGConnectionError(f'Could not bind to {fg_rx_addr}: {e}')
-        self.fg_rx_sock.settimeout(self.rx_timeout_s)
-        # See note in _fg_packet_roundtrip()::recvfrom()
-        self.fg_rx_cb = rx_cb
+        if latest_only or batched:
+            # We wait for data ourselves, so that the socket can be drained without blocking
+            self.fg_rx_sock.setblocking(False)
+        else:
+            self.fg_rx_sock.settimeout(self.rx_timeout_s)
+            # See note in _fg_recv()::recvfrom_into()
+        self.rx_latest_only = latest_only
+        if batched:
+            self.fg_rx_batch_receiver = DatagramBatchReceiver(max_batch=max_batch, max_size=len(self.fg_rx_buffer))
+        else:
+            self.fg_rx_batch_receiver = None
 
-        return self.event_pipe
+    def add_rx_raw_hook(self, hook: Callable[[ByteString], Any]):
+        """
+        Add a function that is called with every raw datagram that is handled, before it's
+        decoded and passed to the callback. Runs in the RX process, i.e. to feed a
+        :class:`flightgear_python.general_util.DatagramRingBuffer`. Must be added before :meth:`start()`
+
+        :param hook: Function taking the datagram. The datagram is only valid during the call
+        """
+        self.fg_rx_raw_hooks.append(hook)
+
+    def record_rx(
+        self, path: Union[str, os.PathLike], index_interval: int = 256, flush_every: int = 1
+    ) -> PacketRecorder:
+        """
+        Record every datagram that is received to a file, see :class:`flightgear_python.fg_record.PacketRecorder`.
+        Must be called before :meth:`start()`
+
+        :param path: File to record to, an existing recording of the same stream is appended to (i.e. when the\
+        connection is stopped and started again)
+        :param index_interval: Same as for :class:`flightgear_python.fg_record.PacketRecorder`
+        :param flush_every: Same as for :class:`flightgear_python.fg_record.PacketRecorder`
+        :return: The recorder. When the loop runs in a separate process the recorder's counters\
+        aren't updated in this process
+        """
+        recorder = PacketRecorder(
+            path,
+            stream_name=self.fg_stream_name,
+            version_construct=self.fg_version_construct,
+            index_interval=index_interval,
+            flush_every=flush_every,
+        )
+        self.add_rx_raw_hook(recorder.write)
+        return recorder
+
+    def enable_stage_timing(self, budget_s: Optional[float] = None):
+        """
+        Time every stage of the RX/TX loop (see :attr:`loop_stage_names`), to find out where the time goes.
+        Adds a few microseconds per datagram. Must be called before :meth:`start()`
+
+        :param budget_s: Count iterations where handling the data (everything but ``recv``) takes\
+        longer than this as overruns, i.e. ``1 / 60`` when FG sends at 60Hz
+        """
+        self.rx_stage_timer = StageTimer(self.loop_stage_names, budget_s=budget_s)
+
+    def stage_timing(self) -> LoopStats:
+        """
+        Get the timing of the RX/TX loop, without interrupting it. Works from the parent process
+
+        :return: Histograms of every stage, the loop rate and the number of overruns since the loop started
+        """
+        if self.rx_stage_timer is None:
+            raise FGConnectionError('Stage timing is not enabled, call enable_stage_timing() first')
+        return self.rx_stage_timer.snapshot()
 
     def connect_tx(self, fg_host: str, fg_port: int):
         """
@@ -89,12 +393,17 @@ class FGConnection:
         """
         self.fg_tx_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.fg_tx_addr = (fg_host, fg_port)
+        self._fg_enable_change_tracking()
+
+    def _fg_recv(self) -> Optional[memoryview]:
+        if self.rx_latest_only:
+            return self._fg_recv_latest()
 
-    def _fg_packet_roundtrip(self):
-        # Receive up to 1KB of data from FG
+        # Receive up to 1KB of data from FG, straight into our own buffer so that
+        # nothing is allocated for the datagram itself.
         # blocking is fine here since we're in a separate process
         try:
-            rx_msg, _ = self.fg_rx_sock.recvfrom(1024)
+            rx_len, _ = self.fg_rx_sock.recvfrom_into(self.fg_rx_buffer)
         except socket.timeout as e:
             raise FGConnectionError(f'Timeout waiting for data, waited {self.rx_timeout_s} seconds') from e
         except BlockingIOError as e:
@@ -109,55 +418,195 @@ class FGConnection:
             """
             if '10035' in str(e):
                 self.fg_rx_sock.setblocking(True)
-                return
+                return None
             else:
                 raise e
+        return memoryview(self.fg_rx_buffer)[:rx_len]
 
-        # Auto-version logic
-        if self.fg_auto_partial_parse and self.fg_net_struct is None:
-            # We lazily create the actual struct that will be used for parsing
-            self.fg_net_struct = self.fg_auto_partial_parse.resolve(rx_msg)
+    def _fg_wait_readable(self):
+        readable, _, _ = select.select([self.fg_rx_sock], [], [], self.rx_timeout_s)
+        if not readable:
+            raise FGConnectionError(f'Timeout waiting for data, waited {self.rx_timeout_s} seconds')
 
-        try:
-            s: Container = self.fg_net_struct.parse(rx_msg)
-        except ConstError as e:
-            raise FGCommunicationError(f'Could not decode FG stream. Did you set the right version?\n{e}') from e
+    def _fg_recv_latest(self) -> Optional[memoryview]:
+        self._fg_wait_readable()
 
-        if isinstance(self, FDMConnection):
-            # Fix FG's radian parsing error :(
-            s = fix_fg_radian_parsing(s)
+        # Every datagram overwrites the buffer, so the newest one is left at the end
+        rx_len: Optional[int] = None
+        num_received = 0
+        while True:
+            try:
+                rx_len, _ = self.fg_rx_sock.recvfrom_into(self.fg_rx_buffer)
+            except BlockingIOError:
+                break
+            num_received += 1
+
+        if rx_len is None:
+            return None  # Spurious wakeup
+        if num_received > 1:
+            self.rx_dropped.value += num_received - 1
+        return memoryview(self.fg_rx_buffer)[:rx_len]
+
+    def _fg_recv_batch(self) -> List[memoryview]:
+        self._fg_wait_readable()
+        receiver = self.fg_rx_batch_receiver
+        rx_msgs = receiver.recv(self.fg_rx_sock)
+        if not self.rx_latest_only or not rx_msgs:
+            return rx_msgs
+
+        num_received = len(rx_msgs)
+        while len(rx_msgs) == receiver.max_batch:
+            # There might be even more waiting. An empty receive leaves the buffer alone
+            # so the views from the last batch stay valid
+            next_rx_msgs = receiver.recv(self.fg_rx_sock)
+            if not next_rx_msgs:
+                break
+            num_received += len(next_rx_msgs)
+            rx_msgs = next_rx_msgs
+        if num_received > 1:
+            self.rx_dropped.value += num_received - 1
+
+        # Move the newest datagram to our regular receive buffer, it's the one used for in-place decoding
+        rx_len = len(rx_msgs[-1])
+        self.fg_rx_buffer[:rx_len] = rx_msgs[-1]
+        return [memoryview(self.fg_rx_buffer)[:rx_len]]
+
+    def _fg_send(self, s: Any, rx_msg: ByteString):
+        # Send data back to FG
+        if self.fg_tx_sock is not None and s is not None:
+            tx_msg = self._fg_encode(s, rx_msg)
+            self.fg_tx_sock.sendto(tx_msg, self.fg_tx_addr)
+
+    def _fg_dispatch(self, rx_msg: ByteString):
+        timer = self.rx_stage_timer
+        for hook in self.fg_rx_raw_hooks:
+            hook(rx_msg)
+        s = self._fg_decode(rx_msg)
+        if timer is not None:
+            timer.mark()
 
         # Call user method
         s = self.fg_rx_cb(s, self.event_pipe)
         sys.stdout.flush()  # flush so that `print()` works
+        if timer is not None:
+            timer.mark()
+
+        self._fg_send(s, rx_msg)
+        if timer is not None:
+            timer.mark()
+
+    def _fg_batch_roundtrip(self) -> int:
+        timer = self.rx_stage_timer
+        rx_msgs = self._fg_recv_batch()
+        if timer is not None and rx_msgs:
+            timer.mark()
+        if self.fg_rx_batch_cb is None:
+            for rx_msg in rx_msgs:
+                self._fg_dispatch(rx_msg)
+            return len(rx_msgs)
+        if not rx_msgs:
+            return 0
+
+        for hook in self.fg_rx_raw_hooks:
+            for rx_msg in rx_msgs:
+                hook(rx_msg)
+        batch = [self._fg_decode(rx_msg) for rx_msg in rx_msgs]
+        if timer is not None:
+            timer.mark()
 
-        # Send data back to FG
-        if self.fg_tx_sock is not None and s is not None:
-            tx_msg = self.fg_net_struct.build(dict(**s))
-            self.fg_tx_sock.sendto(tx_msg, self.fg_tx_addr)
+        # Call user method
+        s = self.fg_rx_batch_cb(batch, self.event_pipe)
+        sys.stdout.flush()  # flush so that `print()` works
+        if timer is not None:
+            timer.mark()
+
+        self._fg_send(s, rx_msgs[-1])
+        if timer is not None:
+            timer.mark()
+        return len(rx_msgs)
+
+    def _fg_packet_roundtrip(self) -> int:
+        """
+        :return: Number of datagrams that were handled
+        """
+        timer = self.rx_stage_timer
+        if timer is not None:
+            timer.start_loop()
+        if self.fg_rx_batch_receiver is not None:
+            num_handled = self._fg_batch_roundtrip()
+        else:
+            rx_msg = self._fg_recv()
+            if rx_msg is None:
+                return 0
+            if timer is not None:
+                timer.mark()
+            self._fg_dispatch(rx_msg)
+            num_handled = 1
+        if timer is not None and num_handled:
+            timer.end_loop(num_handled)
+        return num_handled
 
     def _rx_process(self):
         if self.fg_tx_sock is None:
             print(f'Warning: TX not connected, not sending updates to FG for RX {self.fg_rx_sock.getsockname()}')
 
-        self.event_pipe.child_send((True,))  # Signal to parent that child is running
-        while True:
-            self._fg_packet_roundtrip()
+        self.rx_ready_event.set()  # Signal to parent that child is running
+        while not self.rx_stop_event.is_set():
+            try:
+                self._fg_packet_roundtrip()
+            except FGConnectionError:
+                if self.rx_stop_event.is_set():
+                    break  # We were waiting for data when asked to stop, nothing wrong
+                raise
+
+    def step(self, block: bool = True) -> bool:
+        """
+        Run a single iteration of the RX/TX loop in the caller's thread. Use this instead of
+        :meth:`start()` to drive the loop manually, i.e. to service many connections from
+        one loop of your own.
 
-    def start(self):
+        :param block: Wait up to ``rx_timeout_s`` for data. If ``False``, return right away\
+        when there is no data waiting
+        :return: ``True`` if data was received and handled
+        """
+        if not block:
+            readable, _, _ = select.select([self.fg_rx_sock], [], [], 0)
+            if not readable:
+                return False
+        return bool(self._fg_packet_roundtrip())
+
+    def start(self, executor: str = 'process'):
         """
         Start the RX/TX loop with FlightGear
+
+        :param executor: How to run the loop, one of :attr:`supported_executors`
         """
-        self.rx_proc = mp.Process(target=self._rx_process)
-        self.rx_proc.daemon = True  # rx_proc should exit when parent exits
-        self.rx_proc.start()
-        _ = self.event_pipe.parent_recv()  # Wait for child to actually run
+        if executor not in self.supported_executors:
+            raise ValueError(f'Unknown executor "{executor}", must be one of {self.supported_executors}')
+        self.rx_stop_event.clear()
+        self.rx_ready_event.clear()
+        if executor == 'thread':
+            self.rx_thread = threading.Thread(target=self._rx_process)
+            self.rx_thread.daemon = True  # rx_thread should exit when parent exits
+            self.rx_thread.start()
+        else:
+            self.rx_proc = mp.Process(target=self._rx_process)
+            self.rx_proc.daemon = True  # rx_proc should exit when parent exits
+            self.rx_proc.start()
+        self.rx_ready_event.wait()  # Wait for child to actually run
 
     def stop(self):
         """
         Stop the RX/TX loop
         """
-        self.rx_proc.terminate()
+        if self.rx_proc is not None:
+            self.rx_proc.terminate()
+            self.rx_proc = None
+        if self.rx_thread is not None:
+            # Threads can't be killed, ask nicely and wait for the current receive to finish
+            self.rx_stop_event.set()
+            self.rx_thread.join()
+            self.rx_thread = None
 
 
 class PartialParseSwitchStruct:
@@ -197,24 +646,29 @@ class FDMConnection(FGConnection):
 
     :param fdm_version: Net FDM version (24, 25, or None for auto-detection)
     :param rx_timeout_s: Optional timeout value in seconds when receiving data
+    :param codec: Which packet codec to use, one of :attr:`FGConnection.supported_codecs`
+    :param fields: Only decode these fields (i.e. ``['lat_rad', 'lon_rad', 'alt_m']``), which is much\
+    faster than decoding the whole packet. See :class:`flightgear_python.fg_codec.StructCodec`.\
+    Packets sent back are the received packet with these fields updated
     """
 
-    def __init__(self, fdm_version: Optional[int] = None, rx_timeout_s: float = 2.0):
-        super().__init__(rx_timeout_s=rx_timeout_s)
-        fdm_support_dict: Dict[int, Struct] = {
-            24: fdm_struct_v24,
-            25: fdm_struct_v25,
-        }
-
-        if fdm_version is None:
-            self.fg_auto_partial_parse = PartialParseSwitchStruct(
-                partial_parse_construct=Int32ub,
-                replacement_full_structs=fdm_support_dict,
-            )
-        else:
-            self.fg_net_struct = fdm_support_dict.get(fdm_version)
-            if self.fg_net_struct is None:
-                raise NotImplementedError(f'Manually specified FDM version {fdm_version} not supported yet')
+    fg_stream_name = 'FDM'
+    fg_supported_structs: Dict[int, Struct] = {
+        24: fdm_struct_v24,
+        25: fdm_struct_v25,
+    }
+    fg_version_construct = Int32ub
+    fg_fix_radians = True
+
+    def __init__(
+        self,
+        fdm_version: Optional[int] = None,
+        rx_timeout_s: float = 2.0,
+        codec: str = 'construct',
+        fields: Optional[Sequence[str]] = None,
+    ):
+        super().__init__(rx_timeout_s=rx_timeout_s, codec=codec, fields=fields)
+        self._select_net_struct(fdm_version)
 
 
 class CtrlsConnection(FGConnection):
@@ -223,22 +677,27 @@ class CtrlsConnection(FGConnection):
 
     :param ctrls_version: Net Ctrls version (27, or None for auto-detection)
     :param rx_timeout_s: Optional timeout value in seconds when receiving data
+    :param codec: Which packet codec to use, one of :attr:`FGConnection.supported_codecs`
+    :param fields: Only decode these fields (i.e. ``['aileron', 'elevator', 'rudder']``), which is much\
+    faster than decoding the whole packet. See :class:`flightgear_python.fg_codec.StructCodec`.\
+    Packets sent back are the received packet with these fields updated
     """
 
-    def __init__(self, ctrls_version: Optional[int] = None, rx_timeout_s: float = 2.0):
-        super().__init__(rx_timeout_s=rx_timeout_s)
-        ctrls_support_dict: Dict[int, Struct] = {
-            27: ctrls_struct_v27,
-        }
-        if ctrls_version is None:
-            self.fg_auto_partial_parse = PartialParseSwitchStruct(
-                partial_parse_construct=Int32ub,
-                replacement_full_structs=ctrls_support_dict,
-            )
-        else:
-            self.fg_net_struct = ctrls_support_dict.get(ctrls_version)
-            if self.fg_net_struct is None:
-                raise NotImplementedError(f'Manually specified Controls version {ctrls_version} not supported yet')
+    fg_stream_name = 'Controls'
+    fg_supported_structs: Dict[int, Struct] = {
+        27: ctrls_struct_v27,
+    }
+    fg_version_construct = Int32ub
+
+    def __init__(
+        self,
+        ctrls_version: Optional[int] = None,
+        rx_timeout_s: float = 2.0,
+        codec: str = 'construct',
+        fields: Optional[Sequence[str]] = None,
+    ):
+        super().__init__(rx_timeout_s=rx_timeout_s, codec=codec, fields=fields)
+        self._select_net_struct(ctrls_version)
 
 
 class GuiConnection(FGConnection):
@@ -247,22 +706,27 @@ class GuiConnection(FGConnection):
 
     :param gui_version: Net GUI version (8, or None for auto-detection)
     :param rx_timeout_s: Optional timeout value in seconds when receiving data
+    :param codec: Which packet codec to use, one of :attr:`FGConnection.supported_codecs`
+    :param fields: Only decode these fields (i.e. ``['lat_rad', 'lon_rad', 'psi_rad']``), which is much\
+    faster than decoding the whole packet. See :class:`flightgear_python.fg_codec.StructCodec`.\
+    Packets sent back are the received packet with these fields updated
     """
 
-    def __init__(self, gui_version: Optional[int] = None, rx_timeout_s: float = 2.0):
-        super().__init__(rx_timeout_s=rx_timeout_s)
-        gui_support_dict: Dict[int, Struct] = {
-            8: gui_struct_v8,
-        }
-        if gui_version is None:
-            self.fg_auto_partial_parse = PartialParseSwitchStruct(
-                partial_parse_construct=Int32ul,
-                replacement_full_structs=gui_support_dict,
-            )
-        else:
-            self.fg_net_struct = gui_support_dict.get(gui_version)
-            if self.fg_net_struct is None:
-                raise NotImplementedError(f'Manually specified GUI version {gui_version} not supported yet')
+    fg_stream_name = 'GUI'
+    fg_supported_structs: Dict[int, Struct] = {
+        8: gui_struct_v8,
+    }
+    fg_version_construct = Int32ul
+
+    def __init__(
+        self,
+        gui_version: Optional[int] = None,
+        rx_timeout_s: float = 2.0,
+        codec: str = 'construct',
+        fields: Optional[Sequence[str]] = None,
+    ):
+        super().__init__(rx_timeout_s=rx_timeout_s, codec=codec, fields=fields)
+        self._select_net_struct(gui_version)
 
 
 class PropertyTreeValue(NamedTuple):
@@ -283,15 +747,17 @@ class PropsConnectionBase:
     sphinx-no-autodoc
     """
 
-    @staticmethod
-    def _auto_convert_fg_prop(value_str: str, type_str: str) -> Any:
-        convert_fn = {
-            'bool': bool,
-            'int': int,
-            'string': str,
-            'double': float,
-            'float': float,
-        }.get(type_str, lambda x: x)
+    _fg_type_converters: Dict[str, Callable[[str], Any]] = {
+        'bool': bool,
+        'int': int,
+        'string': str,
+        'double': float,
+        'float': float,
+    }
+
+    @classmethod
+    def _auto_convert_fg_prop(cls, value_str: str, type_str: str) -> Any:
+        convert_fn = cls._fg_type_converters.get(type_str, lambda x: x)
         try:
             value = convert_fn(value_str)
         except ValueError as e:
@@ -396,14 +862,40 @@ class TelnetConnection(PropsConnectionBase):
     :param tcp_port: Port of the telnet socket (i.e. the ``5500`` from\
         ``--telnet=socket,bi,60,localhost,5500,tcp``)
     :param rx_timeout_s: Optional timeout value in seconds when receiving data
+    :param data_mode: Use FG's ``data`` mode: no prompts, ``get`` returns only the value and ``set``\
+        returns nothing. Less to send and parse when polling, but FG no longer tells us the types,\
+        so the first ``get`` of a property is done in prompt mode to learn its type (cached in ``prop_types``),\
+        and ``set`` isn't confirmed (errors aren't reported)
     """
 
-    def __init__(self, host: str, tcp_port: int, rx_timeout_s: float = 2.0):
+    telnet_read_size = 65536
+    """Bytes to read from the socket at once"""
+
+    # FG's change notifications are `path=value` lines. Responses never have a path directly followed by `=`
+    _notification_re = re.compile(r'^(/[^\s=]*)=(.*)$', flags=re.DOTALL)
+
+    def __init__(self, host: str, tcp_port: int, rx_timeout_s: float = 2.0, data_mode: bool = False):
         self.host = host
         self.port = tcp_port
         # SOCK_STREAM == TCP
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.rx_timeout_s = rx_timeout_s
+        self.data_mode = data_mode
+        # Type of every property seen so far, by absolute path. Used to convert data mode values
+        self.prop_types: Dict[str, str] = {}
+        # Subscriptions, see subscribe(). While there are any the reader thread owns the socket,
+        # and passes everything but the change notifications on to the command responses
+        self.latest_values: Dict[str, Any] = {}
+        self._subscriptions: Dict[str, Optional[prop_change_callback_type]] = {}
+        self._reader_thread: Optional[threading.Thread] = None
+        self._reader_stop = False
+        self._reader_error: Optional[Exception] = None
+        self._notify_pending = bytearray()
+        self._resp_buf = bytearray()
+        self._resp_cond = threading.Condition()
+        # Received but not yet parsed, consumed from the front. Only ever holds one read
+        # past the line being parsed, so big responses don't pile up when they're streamed
+        self._rx_buf = bytearray()
 
     def connect(self):
         """
@@ -417,34 +909,234 @@ class TelnetConnection(PropsConnectionBase):
 
         self.sock.settimeout(self.rx_timeout_s)
         # force move to the root directory (maybe someone was connected before we were)
+        # (before switching to data mode, there's nothing to wait for after a `cd` otherwise)
+        data_mode = self.data_mode
+        self.data_mode = False
         _ = self._send_cmd_get_resp('cd /')
+        if data_mode:
+            self._send_cmds(['data'])  # No response in data mode
+            self.data_mode = True
 
     @staticmethod
     def _telnet_str(in_str: str) -> ByteString:
         return f'{in_str}\r\n'.encode()
 
-    def _send_cmd_get_resp(self, cmd_str: str, buflen: int = 512) -> str:
+    def _send_cmds(self, cmd_strs: Sequence[str]):
         try:
-            self.sock.sendall(self._telnet_str(cmd_str))
+            self.sock.sendall(b''.join(self._telnet_str(cmd_str) for cmd_str in cmd_strs))
         except BrokenPipeError as e:
             raise FGCommunicationError('Failed to send data. Did you call .connect()?') from e
 
-        # FG telnet always ends with a prompt (`cwd`> ), and since we always
-        # operate relative to the root directory, it should always be the same prompt
+    def _recv_chunk(self, buflen: int) -> bytes:
+        if self._reader_thread is not None:
+            return self._recv_reader_chunk()
+        try:
+            chunk = self.sock.recv(buflen)
+        except socket.timeout as e:
+            raise FGConnectionError(f'Timeout waiting for data, waited {self.rx_timeout_s} seconds') from e
+        if not chunk:
+            raise FGConnectionError('FlightGear closed the telnet connection')
+        return chunk
+
+    def _recv_reader_chunk(self) -> bytes:
+        with self._resp_cond:
+            has_data = self._resp_cond.wait_for(
+                lambda: self._resp_buf or self._reader_error is not None, timeout=self.rx_timeout_s
+            )
+            if not has_data:
+                raise FGConnectionError(f'Timeout waiting for data, waited {self.rx_timeout_s} seconds')
+            if not self._resp_buf:
+                raise FGConnectionError(f'Subscription reader failed: {self._reader_error}') from self._reader_error
+            chunk = bytes(self._resp_buf)
+            self._resp_buf.clear()
+        return chunk
+
+    def _split_notifications(self, data: bytes) -> bytes:
+        # Dispatch the change notifications in the data, return the rest (command responses)
         ending_bytes = b'/> '
-        resp_bytes = b''
-        while not resp_bytes.endswith(ending_bytes):
-            # Loop until FG sends us all the data
-            try:
-                resp_bytes += self.sock.recv(buflen)
-            except socket.timeout as e:
-                raise FGConnectionError(f'Timeout waiting for data, waited {self.rx_timeout_s} seconds') from e
-        resp_bytes = strip_end(resp_bytes, b'\r\n' + ending_bytes)  # trim the prompt
+        pending = self._notify_pending
+        pending += data
+        resp_bytes = bytearray()
+        while True:
+            # The prompt doesn't end with a newline, pass it on right away
+            while pending.startswith(ending_bytes):
+                resp_bytes += ending_bytes
+                del pending[: len(ending_bytes)]
+            line_end = pending.find(b'\n') + 1
+            if line_end == 0:
+                break
+            line = bytes(pending[:line_end])
+            del pending[:line_end]
+            match = self._notification_re.match(line.decode().rstrip('\r\n'))
+            if match is None:
+                resp_bytes += line
+            else:
+                self._dispatch_notification(match.group(1), match.group(2))
+        if pending and not pending.startswith(b'/'):
+            # Can't be a notification (or a prompt), no need to wait for the rest of the line
+            resp_bytes += pending
+            pending.clear()
+        return bytes(resp_bytes)
+
+    def _dispatch_notification(self, prop_str: str, value_str: str):
+        try:
+            value = self._auto_convert_fg_prop(value_str, self.prop_types.get(prop_str, ''))
+        except FGCommunicationError:
+            value = value_str  # Leave it to the callback
+        self.latest_values[prop_str] = value
+        # Subscribing to a directory also gets the changes of everything under it
+        sub_str = prop_str
+        while sub_str and sub_str not in self._subscriptions:
+            sub_str = sub_str.rpartition('/')[0]
+        callback = self._subscriptions.get(sub_str or '/')
+        if callback is not None:
+            callback(prop_str, value)
+
+    def _reader_loop(self):
+        try:
+            while not self._reader_stop:
+                # Short timeout so that stopping doesn't take long
+                readable, _, _ = select.select([self.sock], [], [], 0.1)
+                if not readable:
+                    continue
+                chunk = self.sock.recv(self.telnet_read_size)
+                if not chunk:
+                    raise FGConnectionError('FlightGear closed the telnet connection')
+                resp_bytes = self._split_notifications(chunk)
+                if resp_bytes:
+                    with self._resp_cond:
+                        self._resp_buf += resp_bytes
+                        self._resp_cond.notify()
+        except Exception as e:
+            with self._resp_cond:
+                self._reader_error = e
+                self._resp_cond.notify()
 
-        resp_str = resp_bytes.decode()
+    @staticmethod
+    def _simplify_prop_path(prop_str: str) -> str:
+        # FG leaves out `[0]` indices in notifications
+        return prop_str.replace('[0]', '')
+
+    def _iter_resp_blocks(self, last: bool = True, buflen: Optional[int] = None) -> Iterator[str]:
+        # The next response as it arrives, in blocks of whole lines (with the line endings).
+        # FG telnet always ends a response with a prompt (`cwd`> ), and since we always
+        # operate relative to the root directory, it should always be the same prompt.
+        # The prompt follows the response's last line, so a prompt anywhere else is part of a value
+        # (unless it's the last thing we're waiting for, FG might not end the last line)
+        ending_bytes = b'/> '
+        buflen = buflen or self.telnet_read_size
+        rx_buf = self._rx_buf
+        search_start = 0  # Only look at what's new
+        while True:
+            if rx_buf.startswith(ending_bytes):
+                del rx_buf[: len(ending_bytes)]
+                return
+            block_end = rx_buf.rfind(b'\n', search_start) + 1
+            if block_end:
+                # All the complete lines at once, up to the prompt if it's in there
+                prompt_idx = rx_buf.find(b'\n' + ending_bytes, 0, block_end + len(ending_bytes))
+                if prompt_idx != -1:
+                    block_end = prompt_idx + 1
+                block = rx_buf[:block_end].decode()
+                del rx_buf[:block_end]  # Deleting from the front of a bytearray doesn't copy
+                search_start = 0
+                yield block
+            elif last and len(rx_buf) > len(ending_bytes) and rx_buf.endswith(ending_bytes):
+                block = rx_buf[: -len(ending_bytes)].decode()
+                rx_buf.clear()
+                yield block
+                return
+            else:
+                # The prompt might be split between reads
+                search_start = len(rx_buf)
+                rx_buf += self._recv_chunk(buflen)
+
+    def _iter_resp_lines(self, last: bool = True, buflen: Optional[int] = None) -> Iterator[str]:
+        # Lines of the next response as they arrive, without the line endings
+        for block in self._iter_resp_blocks(last, buflen):
+            lines = block.split('\n')
+            if not lines[-1]:
+                lines.pop()  # After the last line end
+            yield from (line[:-1] if line.endswith('\r') else line for line in lines)
+
+    def _recv_resps(self, num_resps: int, buflen: Optional[int] = None) -> List[str]:
+        return [
+            strip_end(''.join(self._iter_resp_blocks(resp_idx == num_resps - 1, buflen)), '\r\n')
+            for resp_idx in range(num_resps)
+        ]
+
+    def _recv_lines(self, num_lines: int, buflen: Optional[int] = None) -> List[str]:
+        # Data mode responses are a single line each, no prompt
+        buflen = buflen or self.telnet_read_size
+        rx_buf = self._rx_buf
+        lines: List[str] = []
+        search_start = 0
+        while len(lines) < num_lines:
+            block_end = rx_buf.rfind(b'\n', search_start) + 1
+            if not block_end:
+                search_start = len(rx_buf)
+                rx_buf += self._recv_chunk(buflen)
+                continue
+            block_lines = rx_buf[:block_end].split(b'\n', num_lines - len(lines))
+            rest = block_lines.pop()  # Lines we're not waiting for (if any), and the empty end
+            del rx_buf[: block_end - len(rest)]
+            search_start = 0
+            lines += [strip_end(line, b'\r').decode() for line in block_lines]
+        return lines
+
+    @staticmethod
+    def _telnet_resp_error(cmd_str: str, resp_str: str) -> Optional[str]:
         if resp_str.startswith('-ERR') or resp_str.startswith('Valid commands are'):
-            raise FGCommunicationError(f'Bad telnet command "{cmd_str}". Response: "{resp_str}"')
-        return resp_str
+            return f'Bad telnet command "{cmd_str}". Response: "{resp_str}"'
+        return None
+
+    def _send_cmd_get_resp(self, cmd_str: str, buflen: Optional[int] = None) -> str:
+        resp_strs, error_strs = self._send_cmds_get_resps([cmd_str], buflen)
+        if error_strs:
+            raise FGCommunicationError(error_strs[0])
+        return resp_strs[0]
+
+    def _send_cmds_get_resps(
+        self, cmd_strs: Sequence[str], buflen: Optional[int] = None
+    ) -> Tuple[List[str], List[str]]:
+        # All commands go out in one send, FG answers them in order
+        if self.data_mode:
+            # Without prompts the responses can't be told apart, switch to prompt mode for these.
+            # `prompt` is answered with an empty response, `data` with nothing
+            self._send_cmds(['prompt', *cmd_strs, 'data'])
+            resp_strs = self._recv_resps(len(cmd_strs) + 1, buflen)[1:]
+        else:
+            self._send_cmds(cmd_strs)
+            resp_strs = self._recv_resps(len(cmd_strs), buflen)
+        error_strs = []
+        for cmd_str, resp_str in zip(cmd_strs, resp_strs):
+            error_str = self._telnet_resp_error(cmd_str, resp_str)
+            if error_str is not None:
+                error_strs.append(error_str)
+        return resp_strs, error_strs
+
+    def _send_cmd_iter_resp_lines(self, cmd_str: str) -> Iterator[str]:
+        # Like _send_cmd_get_resp(), but the response lines are yielded as they arrive
+        if self.data_mode:
+            self._send_cmds(['prompt', cmd_str, 'data'])
+            for _ in self._iter_resp_lines(last=False):
+                pass  # Response to `prompt`
+        else:
+            self._send_cmds([cmd_str])
+        lines = self._iter_resp_lines()
+        try:
+            first_line = next(lines, '')
+            if self._telnet_resp_error(cmd_str, first_line) is not None:
+                resp_str = '\r\n'.join([first_line, *lines])
+                raise FGCommunicationError(self._telnet_resp_error(cmd_str, resp_str))
+            if first_line:
+                yield first_line
+            for line in lines:
+                yield line  # Not `yield from`, that would close `lines` too
+        finally:
+            # Keep in sync with the stream if the caller stops early (has to close() us)
+            for _ in lines:
+                pass
 
     @staticmethod
     def _telnet_resp_to_val(resp_str: str) -> Tuple[str, str, str]:
@@ -468,10 +1160,13 @@ class TelnetConnection(PropsConnectionBase):
         :return: The value of the property. If FG tells us what the type is we \
             will pre-convert it (i.e. make an int from a string)
         """
+        if self.data_mode:
+            return self.get_props([prop_str])[prop_str]
         prop_str = self.check_and_normalize_prop_path(prop_str)
         resp_str = self._send_cmd_get_resp(f'get {prop_str}')
         abs_path, value_str, type_str = self._telnet_resp_to_val(resp_str)
         converted_value = self._auto_convert_fg_prop(value_str, type_str)
+        self.prop_types[prop_str] = type_str
         return converted_value
 
     def set_prop(self, prop_str: str, value: Any):
@@ -483,32 +1178,213 @@ class TelnetConnection(PropsConnectionBase):
         :param value: Value to set the property to. Must be convertible to ``str``
         """
         prop_str = self.check_and_normalize_prop_path(prop_str)
+        if self.data_mode:
+            self._send_cmds([f'set {prop_str} {str(value)}'])  # No response in data mode
+            return
         _ = self._send_cmd_get_resp(f'set {prop_str} {str(value)}')
         # We don't care about the response
 
+    def get_props(self, prop_strs: Sequence[str]) -> Dict[str, Any]:
+        """
+        Get several properties from FlightGear in one round trip. All the ``get``
+        commands are sent at once, then the responses are read back in order.
+
+        :param prop_strs: Locations of the properties, should always be relative to\
+            the root (``/``)
+        :return: Dictionary with the locations (as given) as keys, values converted like :meth:`get_prop()`
+        :raises FGCommunicationError: If any of the properties couldn't be read, all of the failures\
+            are in the message. The connection stays usable.
+        """
+        norm_prop_strs = [self.check_and_normalize_prop_path(prop_str) for prop_str in prop_strs]
+        if not norm_prop_strs:
+            return {}
+        values: Dict[str, Any] = {}
+        error_strs: List[str] = []
+        if self.data_mode:
+            # Properties with a known type can be fetched raw, the rest need prompt mode to learn it
+            raw_strs = [prop_str for prop_str in norm_prop_strs if prop_str in self.prop_types]
+            typed_strs = [prop_str for prop_str in norm_prop_strs if prop_str not in self.prop_types]
+        else:
+            raw_strs = []
+            typed_strs = norm_prop_strs
+
+        if typed_strs:
+            resp_strs, error_strs = self._send_cmds_get_resps([f'get {prop_str}' for prop_str in typed_strs])
+            for prop_str, resp_str in zip(typed_strs, resp_strs):
+                if self._telnet_resp_error(prop_str, resp_str) is not None:
+                    continue  # Already in error_strs
+                try:
+                    abs_path, value_str, type_str = self._telnet_resp_to_val(resp_str)
+                    values[prop_str] = self._auto_convert_fg_prop(value_str, type_str)
+                except FGCommunicationError as e:
+                    error_strs.append(f'{prop_str}: {e}')
+                    continue
+                self.prop_types[prop_str] = type_str
+        if raw_strs:
+            self._send_cmds([f'get {prop_str}' for prop_str in raw_strs])
+            for prop_str, value_str in zip(raw_strs, self._recv_lines(len(raw_strs))):
+                try:
+                    values[prop_str] = self._auto_convert_fg_prop(value_str, self.prop_types[prop_str])
+                except FGCommunicationError as e:
+                    error_strs.append(f'{prop_str}: {e}')
+
+        if error_strs:
+            raise FGCommunicationError(
+                f'{len(error_strs)} of {len(norm_prop_strs)} gets failed: ' + '; '.join(error_strs)
+            )
+        return {prop_str: values[norm_str] for prop_str, norm_str in zip(prop_strs, norm_prop_strs)}
+
+    def set_props(self, props: Dict[str, Any]):
+        """
+        Set several properties in FlightGear in one round trip. All the ``set``
+        commands are sent at once, then the responses are read back in order.
+
+        :param props: Dictionary of property locations (relative to the root, ``/``)\
+            and the values to set them to. Values must be convertible to ``str``
+        :raises FGCommunicationError: If any of the properties couldn't be set, all of the failures\
+            are in the message. The others are still set. Never raised in data mode, FG doesn't respond to ``set``
+        """
+        cmd_strs = [
+            f'set {self.check_and_normalize_prop_path(prop_str)} {str(value)}' for prop_str, value in props.items()
+        ]
+        if not cmd_strs:
+            return
+        if self.data_mode:
+            self._send_cmds(cmd_strs)  # No response in data mode
+            return
+        resp_strs, error_strs = self._send_cmds_get_resps(cmd_strs)
+        if error_strs:
+            raise FGCommunicationError(f'{len(error_strs)} of {len(resp_strs)} sets failed: ' + '; '.join(error_strs))
+
+    def subscribe(
+        self, prop_strs: Sequence[str], callback: Optional[prop_change_callback_type] = None, get_initial: bool = True
+    ):
+        """
+        Subscribe to property changes, FG sends the new value whenever one of the properties changes,
+        so there's no need to poll. A background thread receives the changes, and keeps the latest
+        value of every subscribed property in :attr:`latest_values` (see :meth:`get_latest()`).
+        Other commands can still be used while subscribed.
+
+        Values are converted with the types in ``prop_types``, which ``get_initial`` fills in.
+        Properties with an unknown type are left as strings. Changes are ``path=value`` lines
+        in the same stream as the command responses, so in data mode a string value that looks
+        like that can't be told apart from a change.
+
+        :param prop_strs: Locations of the properties, should always be relative to\
+            the root (``/``). Subscribing to a directory gets the changes of everything under it
+        :param callback: Optional function to call with the location and new value of every change\
+            (see :attr:`prop_change_callback_type`). Called from the background thread, it should return\
+            quickly and must not use this connection
+        :param get_initial: Get the current values (and types) of the properties, so that\
+            :attr:`latest_values` has them before anything changes
+        """
+        norm_prop_strs = [self.check_and_normalize_prop_path(prop_str) for prop_str in prop_strs]
+        if not norm_prop_strs:
+            return
+        if self._reader_thread is None:
+            # Started first, a change could be sent right after the first subscribe
+            self._reader_stop = False
+            self._reader_error = None
+            self._reader_thread = threading.Thread(target=self._reader_loop, daemon=True)
+            self._reader_thread.start()
+        for prop_str in norm_prop_strs:
+            self._subscriptions[self._simplify_prop_path(prop_str)] = callback
+        _, error_strs = self._send_cmds_get_resps([f'subscribe {prop_str}' for prop_str in norm_prop_strs])
+        if error_strs:
+            raise FGCommunicationError(
+                f'{len(error_strs)} of {len(norm_prop_strs)} subscribes failed: ' + '; '.join(error_strs)
+            )
+        if get_initial:
+            initial_values = self.get_props(norm_prop_strs)
+            for prop_str in norm_prop_strs:
+                if self.prop_types[prop_str] == 'none':
+                    continue  # Directory
+                simple_str = self._simplify_prop_path(prop_str)
+                self.prop_types.setdefault(simple_str, self.prop_types[prop_str])
+                # Changes that came in meanwhile are newer
+                self.latest_values.setdefault(simple_str, initial_values[prop_str])
+
+    def unsubscribe(self, prop_strs: Sequence[str]):
+        """
+        Stop getting changes of properties given to :meth:`subscribe()`. The background thread
+        stops once there are no subscriptions left.
+
+        :param prop_strs: Locations of the properties, as given to :meth:`subscribe()`
+        """
+        norm_prop_strs = [self.check_and_normalize_prop_path(prop_str) for prop_str in prop_strs]
+        if not norm_prop_strs:
+            return
+        _, error_strs = self._send_cmds_get_resps([f'unsubscribe {prop_str}' for prop_str in norm_prop_strs])
+        for prop_str in norm_prop_strs:
+            self._subscriptions.pop(self._simplify_prop_path(prop_str), None)
+        if not self._subscriptions and self._reader_thread is not None:
+            self._reader_stop = True
+            self._reader_thread.join()
+            self._reader_thread = None
+            self._drop_notifications()
+        # Only now, the reader might still have been handling a change
+        for prop_str in norm_prop_strs:
+            self.latest_values.pop(self._simplify_prop_path(prop_str), None)
+        if error_strs:
+            raise FGCommunicationError(
+                f'{len(error_strs)} of {len(norm_prop_strs)} unsubscribes failed: ' + '; '.join(error_strs)
+            )
+
+    def _drop_notifications(self):
+        # Nothing is expected after the response to the last unsubscribe, so whatever the reader
+        # still holds or is already waiting on the socket are changes. Drop them before reading from
+        # the socket directly again, finishing one that was only partly received, or the rest of it
+        # would be taken for the next response
+        pending = self._notify_pending
+        pending += self._resp_buf
+        self._resp_buf.clear()
+        while select.select([self.sock], [], [], 0)[0]:
+            pending += self._recv_chunk(self.telnet_read_size)
+        while pending:
+            line_end = pending.find(b'\n') + 1
+            if not line_end:
+                pending += self._recv_chunk(self.telnet_read_size)
+                continue
+            del pending[:line_end]
+
+    def get_latest(self, prop_str: str, default: Any = None) -> Any:
+        """
+        Latest value of a subscribed property (see :meth:`subscribe()`), without asking FG
+
+        :param prop_str: Location of the property, should always be relative to the root (``/``)
+        :param default: Returned if no value was received (yet)
+        """
+        prop_str = self._simplify_prop_path(self.check_and_normalize_prop_path(prop_str))
+        return self.latest_values.get(prop_str, default)
+
     def get_values_and_dirs(self, path: str) -> Tuple[List[PropertyTreeValue], List[str]]:
         """
         Internal method to populate a shared property tree data structure
         sphinx-no-autodoc
         """
-        resp_list = self._send_cmd_get_resp(f'ls {path}').split('\r\n')
         val_list: List[PropertyTreeValue] = []
         dir_list: List[str] = []
-        for prop_entry in resp_list:
-            if '=' in prop_entry:
-                # prepend the key with the working directory, keep naming consistent
-                abs_path, value_str, type_str = self._telnet_resp_to_val(f'{path}/{prop_entry.rstrip("/")}')
-                val_list.append(
-                    PropertyTreeValue(
-                        absolute_path=abs_path,
-                        value_str=value_str,
-                        type_str=type_str,
+        # Parsed as the listing arrives, big directories (i.e. `/ai/models`) don't need to be buffered
+        resp_lines = self._send_cmd_iter_resp_lines(f'ls {path}')
+        try:
+            for prop_entry in resp_lines:
+                if '=' in prop_entry:
+                    # prepend the key with the working directory, keep naming consistent
+                    abs_path, value_str, type_str = self._telnet_resp_to_val(f'{path}/{prop_entry.rstrip("/")}')
+                    self.prop_types[abs_path] = type_str
+                    val_list.append(
+                        PropertyTreeValue(
+                            absolute_path=abs_path,
+                            value_str=value_str,
+                            type_str=type_str,
+                        )
                     )
-                )
-            elif prop_entry.endswith('/'):
-                dir_list.append(f'{path}/{prop_entry.rstrip("/")}')
-            else:
-                raise FGCommunicationError(f'Unknown Telnet response: {prop_entry}')
+                elif prop_entry.endswith('/'):
+                    dir_list.append(f'{path}/{prop_entry.rstrip("/")}')
+                else:
+                    raise FGCommunicationError(f'Unknown Telnet response: {prop_entry}')
+        finally:
+            resp_lines.close()  # Skips the rest of the listing if we stopped early
         return val_list, dir_list
 
 
@@ -523,6 +1399,9 @@ class HTTPConnection(PropsConnectionBase):
     :param timeout_s: Optional timeout value in seconds for the HTTP connection
     """
 
+    max_json_depth = 32
+    """Most levels of the property tree to fetch in one request when listing, deeper directories take another"""
+
     def __init__(self, host: str, tcp_port: int, timeout_s: float = 2.0):
         self.url = f'http://{host}:{tcp_port}/json'
         self.session = requests.Session()
@@ -575,12 +1454,66 @@ class HTTPConnection(PropsConnectionBase):
         self.request_shim('POST', self.url + prop_str, json=data)
         # We don't care about the response
 
+    def list_props(self, path: str = '/', recurse_limit: Optional[int] = 0) -> Dict[str, Union[list, Dict]]:
+        """
+        List properties in the FlightGear property tree. The same as :meth:`TelnetConnection.list_props()`,
+        but with recursion the whole subtree is fetched in one request (FG's ``/json`` takes a depth),
+        instead of one request per directory.
+
+        :param path: Directory to list from, should always be relative to
+            the root (``/``)
+        :param recurse_limit: How many times to recurse into subdirectories.
+            0 (default) is no recursion, 1 is 1 level deep, etc. Passing in
+            ``None`` disables the recursion limit. Directories deeper than\
+            :attr:`max_json_depth` take another request.
+        :return: Dictionary with keys:
+
+            * ``directories``: List of directories, absolute path
+            * ``properties``: Dictionary with property name as the key (absolute path), value as their value.
+        """
+        path = self.check_and_normalize_prop_path(path)
+        resp_json = self._get_json_tree(path, recurse_limit)
+        return self._list_json_tree(resp_json, recurse_limit)
+
+    def _get_json_tree(self, path: str, recurse_limit: Optional[int]) -> dict:
+        # Depth 1 is the node and its children
+        depth = self.max_json_depth if recurse_limit is None else min(recurse_limit + 1, self.max_json_depth)
+        return self.request_shim('GET', self.url + path, params={'d': depth}).json()
+
+    def _list_json_tree(self, resp_json: dict, recurse_limit: Optional[int]) -> Dict[str, Union[list, Dict]]:
+        # Same result as PropsConnectionBase.list_props(), but from the nested JSON
+        if resp_json['nChildren'] > 0 and 'children' not in resp_json:
+            # Deeper than what we fetched (or FG doesn't know about depth)
+            resp_json = self._get_json_tree(resp_json['path'], recurse_limit)
+        val_list, dir_list = self._json_values_and_dirs(resp_json)
+
+        prop_dict = {}
+        if dir_list and (recurse_limit is None or recurse_limit > 0):
+            new_recurse_limit = None if recurse_limit is None else recurse_limit - 1
+            children_json = {child_json['path'].rstrip('/'): child_json for child_json in resp_json['children']}
+            for dir_str in copy.copy(dir_list):
+                dir_dict = self._list_json_tree(children_json[dir_str], new_recurse_limit)
+                prop_dict = {**prop_dict, **dir_dict['properties']}
+                dir_list.remove(dir_str)  # remove the non-recursed directory
+                dir_list += dir_dict['directories']
+
+        for val_entry in val_list:
+            prop_dict[val_entry.absolute_path] = self._auto_convert_fg_prop(val_entry.value_str, val_entry.type_str)
+        return {
+            'directories': dir_list,
+            'properties': prop_dict,
+        }
+
     def get_values_and_dirs(self, path: str) -> Tuple[List[PropertyTreeValue], List[str]]:
         """
         Internal method to populate a shared property tree data structure
         sphinx-no-autodoc
         """
         resp_json = self.request_shim('GET', self.url + path).json()
+        return self._json_values_and_dirs(resp_json)
+
+    @staticmethod
+    def _json_values_and_dirs(resp_json: dict) -> Tuple[List[PropertyTreeValue], List[str]]:
         if resp_json['nChildren'] == 0:
             return [], []
         resp_list = resp_json['children']
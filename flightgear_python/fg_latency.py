@@ -0,0 +1,168 @@
+"""
+Round-trip latency measurement of the RX/TX loop, with a stand-in for FlightGear
+"""
+
+import select
+import socket
+import struct
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from construct import ConstructError, Struct
+
+from .fg_codec import FIELD_CONST, StructCodec
+
+
+class RoundTripStats(NamedTuple):
+    """
+    Result of :meth:`LoopbackFG.run()`
+    """
+
+    sent: int  # Packets sent to the connection
+    received: int  # Packets that came back with one of our tags
+    lost: int  # Packets that never came back (i.e. the callback returned ``None``, or they were dropped)
+    unmatched: int  # Packets that came back with a tag we didn't send (i.e. the callback changed the tag field)
+    mean_us: float
+    p50_us: float
+    p90_us: float
+    p99_us: float
+    max_us: float
+    latencies_us: List[float]  # Every round trip, in the order the packets were sent
+
+
+class LoopbackFG:
+    """
+    Stand-in for FlightGear, to measure the time from "FlightGear" sending a packet to the
+    connection's reply arriving back on the ``connect_tx()`` port. Every packet is tagged with
+    a sequence number in ``tag_field``, which the callback is expected to leave alone, so that
+    replies can be matched to the packets they answer.
+
+    Everything but FlightGear itself is measured: the network stack, the wakeup of the RX
+    process (or thread), decoding, the callback, encoding and sending. Use it to tune
+    ``rx_timeout_s``, output rates and process scheduling, i.e.
+
+    .. code-block:: python
+
+        loopback = LoopbackFG(fdm_struct_v24, rate_hz=60)
+        fdm_conn = FDMConnection(24)
+        fdm_conn.connect_rx('localhost', 5501, fdm_callback)
+        fdm_conn.connect_tx(*loopback.tx_addr)
+        fdm_conn.start()
+        print(loopback.run(('localhost', 5501), num_packets=600))
+
+    :param net_struct: Struct of the packets to send, i.e. :attr:`flightgear_python.fdm_v24.fdm_struct`
+    :param rate_hz: Packets per second, like the rate given to FlightGear's ``--native-fdm``
+    :param tag_field: Numeric field to put the sequence number in
+    :param template: Packet to send (apart from the tag), defaults to all zeros with the right version
+    :param host: Address to receive the replies on
+    :param port: Port to receive the replies on, ``0`` for any free port (see :attr:`tx_addr`)
+    """
+
+    def __init__(
+        self,
+        net_struct: Struct,
+        rate_hz: float = 60.0,
+        tag_field: str = 'cur_time_s',
+        template: Optional[bytes] = None,
+        host: str = '127.0.0.1',
+        port: int = 0,
+    ):
+        self.rate_hz = rate_hz
+        self.tag_field = tag_field
+        # Only the tag is decoded and encoded, the rest is copied from the template
+        self.codec = StructCodec(net_struct, fields=[tag_field])
+        if template is None:
+            template_buf = bytearray(self.codec.sizeof())
+            for field in self.codec.fields:
+                if field.kind == FIELD_CONST:
+                    struct.pack_into(self.codec.byte_order + field.fmt, template_buf, field.offset, field.subcon.value)
+            template = bytes(template_buf)
+        self.template = template
+
+        self.rx_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.rx_sock.bind((host, port))
+        self.rx_sock.setblocking(False)
+        self.tx_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    @property
+    def tx_addr(self) -> Tuple[str, int]:
+        """
+        Address to give to the connection's ``connect_tx()``
+        """
+        return self.rx_sock.getsockname()
+
+    def _receive(self, sent_ns: Dict[int, int], latencies_ns: Dict[int, int]) -> int:
+        num_unmatched = 0
+        while True:
+            try:
+                reply = self.rx_sock.recv(2048)
+            except BlockingIOError:
+                return num_unmatched
+            received_ns = time.perf_counter_ns()
+            try:
+                tag = self.codec.parse(reply)[self.tag_field]
+            except ConstructError:
+                num_unmatched += 1  # Not even a packet of ours
+                continue
+            if tag in sent_ns:
+                latencies_ns[tag] = received_ns - sent_ns.pop(tag)
+            else:
+                num_unmatched += 1
+
+    def run(self, conn_rx_addr: Tuple[str, int], num_packets: int, timeout_s: float = 1.0) -> RoundTripStats:
+        """
+        Send packets to a connection at :attr:`rate_hz` and measure how long the replies take
+
+        :param conn_rx_addr: Address the connection receives on (what's given to ``connect_rx()``)
+        :param num_packets: Number of packets to send
+        :param timeout_s: How long to wait for the remaining replies after the last packet was sent
+        :return: Latency statistics
+        """
+        period_ns = round(1e9 / self.rate_hz)
+        sent_ns: Dict[int, int] = {}  # Waiting for a reply, by tag
+        latencies_ns: Dict[int, int] = {}
+        num_unmatched = 0
+        num_sent = 0
+        next_send_ns = time.perf_counter_ns()
+        end_ns: Optional[int] = None
+        while True:
+            now_ns = time.perf_counter_ns()
+            if num_sent < num_packets and now_ns >= next_send_ns:
+                num_sent += 1
+                tag = num_sent  # Never 0, that's what an untouched field is
+                packet = self.codec.build({self.tag_field: tag}, base=self.template)
+                sent_ns[tag] = time.perf_counter_ns()
+                self.tx_sock.sendto(packet, conn_rx_addr)
+                next_send_ns += period_ns
+                if num_sent == num_packets:
+                    end_ns = time.perf_counter_ns() + round(timeout_s * 1e9)
+                continue
+            if end_ns is not None and (not sent_ns or now_ns >= end_ns):
+                break
+
+            wait_until_ns = next_send_ns if end_ns is None else end_ns
+            readable, _, _ = select.select([self.rx_sock], [], [], max(wait_until_ns - now_ns, 0) / 1e9)
+            if readable:
+                num_unmatched += self._receive(sent_ns, latencies_ns)
+
+        latencies_us = [latencies_ns[tag] / 1e3 for tag in sorted(latencies_ns)]
+        sorted_us = sorted(latencies_us) or [0.0]
+        return RoundTripStats(
+            sent=num_sent,
+            received=len(latencies_us),
+            lost=len(sent_ns),
+            unmatched=num_unmatched,
+            mean_us=sum(sorted_us) / len(sorted_us),
+            p50_us=sorted_us[len(sorted_us) // 2],
+            p90_us=sorted_us[min(len(sorted_us) - 1, len(sorted_us) * 9 // 10)],
+            p99_us=sorted_us[min(len(sorted_us) - 1, len(sorted_us) * 99 // 100)],
+            max_us=sorted_us[-1],
+            latencies_us=latencies_us,
+        )
+
+    def close(self):
+        """
+        Close the sockets
+        """
+        self.rx_sock.close()
+        self.tx_sock.close()
@@ -0,0 +1,647 @@
+"""
+Recording of the raw FlightGear native protocol datagrams, for later analysis and replay
+"""
+
+import array
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Any, ByteString, Dict, Iterator, NamedTuple, Optional, Sequence, Tuple, Union
+
+from construct import Construct, ConstructError, Struct
+
+from .fg_codec import NumpyStructCodec
+from .fg_util import FGConnectionError, fg_radian_fields, fix_fg_radian_columns
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, it's only needed for the column export
+    np = None
+
+LOG_MAGIC = b'FGPYLOG\x00'
+LOG_FORMAT_VERSION = 1
+# Magic, format version, payload size, index interval, protocol version (-1 if unknown), stream name
+_log_header = struct.Struct('<8sIIIi16s')
+_LOG_HEADER_SIZE = 64  # Leaves room for more header fields, and keeps the records 8 byte aligned
+_record_header = struct.Struct('<qq')  # Monotonic clock, wall clock. Both in nanoseconds
+_index_entry = struct.Struct('<qQ')  # Monotonic clock in nanoseconds, record number
+
+path_type = Union[str, os.PathLike]
+
+
+class PacketRecord(NamedTuple):
+    """
+    A single datagram of a :class:`PacketLog`
+    """
+
+    monotonic_ns: int  # ``time.monotonic_ns()`` when the datagram was recorded
+    wall_ns: int  # ``time.time_ns()`` when the datagram was recorded
+    data: bytes  # The datagram
+
+
+class PacketRecorder:
+    """
+    Append raw datagrams with timestamps to a file, read it back with :class:`PacketLog`.
+
+    The file is a fixed size header followed by fixed size records (timestamps and the
+    datagram), one file per protocol version. Every ``index_interval`` records the time is
+    also appended to an index file next to it (``<path>.idx``), so that a reader can find a
+    point in time without touching the whole recording.
+
+    The files are only created when the first datagram arrives, as the datagram size and the
+    protocol version are taken from it. Datagrams with a different size (i.e. a different
+    protocol version) are skipped and counted in :attr:`bad_size_count`.
+
+    If the file already exists (i.e. the connection was stopped and started again) the records are
+    appended to it, so it has to be a recording of the same stream, protocol version and index
+    interval. A partially written last record is dropped first. The monotonic clock restarts when
+    the machine does, so don't append to a recording from before a reboot.
+
+    Record a connection with :meth:`flightgear_python.fg_if.FGConnection.record_rx()`, or feed it manually
+    with :meth:`write()`.
+
+    :param path: File to record to, an existing recording is appended to
+    :param stream_name: Saved in the header, i.e. ``'FDM'``
+    :param version_construct: Construct to get the protocol version from the first datagram,\
+    i.e. :attr:`flightgear_python.fg_if.FDMConnection.fg_version_construct`
+    :param index_interval: Number of records between index entries
+    :param flush_every: Write the records to the file in groups of this many. Every write is a\
+    syscall, but anything that isn't written yet is lost if the process is killed (i.e. by\
+    :meth:`flightgear_python.fg_if.FGConnection.stop()`)
+    """
+
+    def __init__(
+        self,
+        path: path_type,
+        stream_name: str = '',
+        version_construct: Optional[Construct] = None,
+        index_interval: int = 256,
+        flush_every: int = 1,
+    ):
+        if index_interval < 1:
+            raise ValueError(f'index_interval must be at least 1, not {index_interval}')
+        if flush_every < 1:
+            raise ValueError(f'flush_every must be at least 1, not {flush_every}')
+        self.path = os.fspath(path)
+        self.index_path = self.path + '.idx'
+        self.stream_name = stream_name
+        self.version_construct = version_construct
+        self.index_interval = index_interval
+        self.flush_every = flush_every
+
+        self.version: Optional[int] = None  #: Protocol version, once the first datagram arrived
+        self.payload_size: Optional[int] = None  #: Datagram size, once the first datagram arrived
+        self.record_count = 0  #: Number of datagrams in the file, including ones from earlier recorders
+        self.bad_size_count = 0  #: Number of datagrams skipped because their size didn't match
+
+        # Not opened until the first datagram, so that the recorder can be passed to the RX process
+        self._file: Optional[Any] = None
+        self._index_file: Optional[Any] = None
+        self._pending = bytearray()
+        self._pending_index = bytearray()
+
+    def _open(self, data: ByteString, monotonic_ns: int):
+        if self.version_construct is not None:
+            try:
+                self.version = self.version_construct.parse(data)
+            except ConstructError:
+                pass  # Too short to have a version, still worth recording
+        self.payload_size = len(data)
+
+        header = _log_header.pack(
+            LOG_MAGIC,
+            LOG_FORMAT_VERSION,
+            self.payload_size,
+            self.index_interval,
+            -1 if self.version is None else self.version,
+            self.stream_name.encode(),
+        )
+        # Unbuffered, every flush() is a single write
+        self._file = open(self.path, 'a+b', buffering=0)
+        try:
+            file_size = os.fstat(self._file.fileno()).st_size
+            if file_size:
+                self._open_existing(header, file_size, monotonic_ns)
+                return
+            self._file.write(header.ljust(_LOG_HEADER_SIZE, b'\x00'))
+            self._index_file = open(self.index_path, 'wb', buffering=0)
+        except BaseException:
+            self._file.close()
+            self._file = None
+            # Try again with the next datagram
+            self.version = self.payload_size = None
+            self.record_count = 0
+            raise
+
+    def _open_existing(self, header: bytes, file_size: int, monotonic_ns: int):
+        self._file.seek(0)
+        existing_header = self._file.read(_log_header.size)
+        if existing_header != header:
+            raise ValueError(
+                f'{self.path} is not a recording of the same stream (protocol version, datagram size'
+                ' and index interval have to match too), not appending to it'
+            )
+        record_size = _record_header.size + self.payload_size
+        self.record_count = (file_size - _LOG_HEADER_SIZE) // record_size
+        if self.record_count:
+            self._file.seek(_LOG_HEADER_SIZE + (self.record_count - 1) * record_size)
+            (last_ns,) = struct.unpack('<q', self._file.read(8))
+            if monotonic_ns < last_ns:
+                raise ValueError(f'{self.path} has records from later than now (from before a reboot?)')
+        # Drop a record that was only partially written, appending always goes to the end
+        self._file.truncate(_LOG_HEADER_SIZE + self.record_count * record_size)
+
+        # Same for the index, and entries for records that never made it into the file
+        try:
+            with open(self.index_path, 'rb') as index_file:
+                index = index_file.read()
+        except FileNotFoundError:
+            index = b''
+        entry_size = _index_entry.size
+        index_len = len(index) // entry_size
+        while index_len and _index_entry.unpack_from(index, (index_len - 1) * entry_size)[1] >= self.record_count:
+            index_len -= 1
+        index_end = index_len * entry_size
+        self._index_file = open(self.index_path, 'wb', buffering=0)
+        self._index_file.write(index[:index_end])
+
+    def write(self, data: ByteString, monotonic_ns: Optional[int] = None, wall_ns: Optional[int] = None) -> bool:
+        """
+        Record a datagram
+
+        :param data: The datagram
+        :param monotonic_ns: Timestamp, defaults to ``time.monotonic_ns()``. Must never go backwards
+        :param wall_ns: Timestamp, defaults to ``time.time_ns()``
+        :return: ``True`` if the datagram was recorded, ``False`` if it was skipped
+        """
+        if monotonic_ns is None:
+            monotonic_ns = time.monotonic_ns()
+        if wall_ns is None:
+            wall_ns = time.time_ns()
+        if self.payload_size is None:
+            self._open(data, monotonic_ns)
+        elif len(data) != self.payload_size:
+            self.bad_size_count += 1
+            return False
+
+        if self.record_count % self.index_interval == 0:
+            self._pending_index += _index_entry.pack(monotonic_ns, self.record_count)
+        self._pending += _record_header.pack(monotonic_ns, wall_ns)
+        self._pending += data
+        self.record_count += 1
+        if self.record_count % self.flush_every == 0:
+            self.flush()
+        return True
+
+    def flush(self):
+        """
+        Write the records that are waiting because of ``flush_every``
+        """
+        if self._file is None:
+            return
+        # Records first, so that the index never points past the end of the file
+        if self._pending:
+            self._file.write(self._pending)
+            self._pending.clear()
+        if self._pending_index:
+            self._index_file.write(self._pending_index)
+            self._pending_index.clear()
+
+    def close(self):
+        """
+        Write everything that's left and close the files
+        """
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._index_file.close()
+            self._file = None
+            self._index_file = None
+
+    def __enter__(self) -> 'PacketRecorder':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PacketLog:
+    """
+    Reader for a file written by :class:`PacketRecorder`. The file is memory-mapped, so only
+    the records that are actually accessed are read from disk. Finding a point in time is a
+    binary search over the index and the records (see :meth:`find_time()`).
+
+    A record that was only partially written (i.e. the recorder was killed) is ignored.
+
+    :param path: File that was recorded to
+    """
+
+    def __init__(self, path: path_type):
+        self.path = os.fspath(path)
+        with open(self.path, 'rb') as log_file:
+            file_size = os.fstat(log_file.fileno()).st_size
+            if file_size < _LOG_HEADER_SIZE:
+                raise ValueError(f'{self.path} is not a packet log, it is too short')
+            self._mmap = mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, format_version, payload_size, index_interval, version, stream_name = _log_header.unpack_from(self._mmap)
+        if magic != LOG_MAGIC:
+            self._mmap.close()
+            raise ValueError(f'{self.path} is not a packet log')
+        if format_version > LOG_FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError(
+                f'{self.path} has format version {format_version}, only up to {LOG_FORMAT_VERSION} is known'
+            )
+        self.stream_name: str = stream_name.rstrip(b'\x00').decode()
+        self.version: Optional[int] = None if version < 0 else version  #: Protocol version, if it was known
+        self.payload_size: int = payload_size  #: Size of the datagrams
+        self.record_size: int = _record_header.size + payload_size  #: Size of a record in the file
+        self.data_offset = _LOG_HEADER_SIZE  #: Where the first record starts in the file
+        self.index_interval: int = index_interval
+        self._len = (file_size - _LOG_HEADER_SIZE) // self.record_size
+
+        # The index is small (one entry every `index_interval` records), just read it
+        try:
+            with open(self.path + '.idx', 'rb') as index_file:
+                self._index = index_file.read()
+        except FileNotFoundError:
+            self._index = b''  # Still works, just has to search all the records
+        self._index_len = len(self._index) // _index_entry.size
+        while self._index_len and self._index_entry(self._index_len - 1)[1] >= self._len:
+            self._index_len -= 1
+
+    def _index_entry(self, entry_idx: int):
+        return _index_entry.unpack_from(self._index, entry_idx * _index_entry.size)
+
+    def _record_offset(self, idx: int) -> int:
+        if idx < 0:
+            idx += self._len
+        if not 0 <= idx < self._len:
+            raise IndexError(f'Record {idx} out of range, the log has {self._len} records')
+        return self.data_offset + idx * self.record_size
+
+    def monotonic_ns(self, idx: int) -> int:
+        """
+        Timestamp of a record, without reading the datagram
+
+        :param idx: Record number
+        """
+        (monotonic_ns,) = struct.unpack_from('<q', self._mmap, self._record_offset(idx))
+        return monotonic_ns
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, idx: int) -> PacketRecord:
+        offset = self._record_offset(idx)
+        monotonic_ns, wall_ns = _record_header.unpack_from(self._mmap, offset)
+        data_start = offset + _record_header.size
+        data_end = data_start + self.payload_size
+        return PacketRecord(monotonic_ns, wall_ns, self._mmap[data_start:data_end])
+
+    def __iter__(self) -> Iterator[PacketRecord]:
+        return self.records()
+
+    def records(self, start: int = 0, stop: Optional[int] = None) -> Iterator[PacketRecord]:
+        """
+        Iterate over records ``start`` up to (not including) ``stop``, see :meth:`find_time()`
+
+        :param start: First record number
+        :param stop: Record number to stop at, ``None`` for the end of the log
+        """
+        stop = self._len if stop is None else min(stop, self._len)
+        for idx in range(start, stop):
+            yield self[idx]
+
+    def find_time(self, monotonic_ns: int) -> int:
+        """
+        Find the first record at or after a point in time
+
+        :param monotonic_ns: Monotonic clock timestamp, see :attr:`PacketRecord.monotonic_ns`
+        :return: Record number, ``len()`` if all the records are before ``monotonic_ns``
+        """
+        lo = 0
+        hi = self._len
+        # Narrow it down to the records between two index entries
+        index_lo = 0
+        index_hi = self._index_len
+        while index_lo < index_hi:
+            index_mid = (index_lo + index_hi) // 2
+            entry_ns, record_idx = self._index_entry(index_mid)
+            if entry_ns < monotonic_ns:
+                index_lo = index_mid + 1
+                lo = record_idx + 1
+            else:
+                index_hi = index_mid
+                hi = record_idx
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.monotonic_ns(mid) < monotonic_ns:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find_elapsed(self, elapsed_s: float) -> int:
+        """
+        Same as :meth:`find_time()`, but relative to the first record
+
+        :param elapsed_s: Seconds since the first record
+        :return: Record number, ``len()`` if all the records are earlier
+        """
+        if not self._len:
+            return 0
+        return self.find_time(self.monotonic_ns(0) + round(elapsed_s * 1e9))
+
+    def close(self):
+        """
+        Unmap the file
+        """
+        self._mmap.close()
+
+    def __enter__(self) -> 'PacketLog':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ReplayStats(NamedTuple):
+    """
+    Statistics of a replay, see :meth:`PacketReplayer.play()`. Jitter is how late a datagram
+    was sent compared to when it should have been sent (it's never sent early)
+    """
+
+    packets: int  # Datagrams sent
+    elapsed_s: float  # Time the replay took
+    rate_hz: float  # Datagrams per second
+    jitter_mean_us: float
+    jitter_p50_us: float
+    jitter_p99_us: float
+    jitter_max_us: float
+
+
+class PacketReplayer:
+    """
+    Send the datagrams of a :class:`PacketLog` back out, with the same timing as when
+    they were recorded (or faster). I.e. to replay a recorded flight into FlightGear
+    without running the flight model.
+
+    Datagrams are sent through the TX socket of a connection, so connect it first
+    with :meth:`flightgear_python.fg_if.FGConnection.connect_tx()`. The connection
+    doesn't need to be receiving.
+
+    Waiting for the next datagram sleeps until shortly before it's due and then spins
+    for the rest, as ``time.sleep()`` alone can be off by more than a millisecond
+    (especially on Windows).
+
+    :param log: Recording to replay
+    :param speed: ``1.0`` for real-time, ``2.0`` for twice as fast etc. ``None`` to send\
+    the datagrams as fast as possible
+    :param spin_s: How long before a datagram is due to stop sleeping and start spinning.\
+    Larger is more accurate, but burns more CPU
+    """
+
+    def __init__(self, log: PacketLog, speed: Optional[float] = 1.0, spin_s: float = 0.002):
+        if speed is not None and speed <= 0:
+            raise ValueError(f'speed must be positive, not {speed}')
+        self.log = log
+        self.speed = speed
+        self.spin_ns = round(spin_s * 1e9)
+        self.stop_event = threading.Event()
+
+    def _wait_until(self, deadline_ns: int):
+        remaining_ns = deadline_ns - time.perf_counter_ns()
+        if remaining_ns > self.spin_ns:
+            time.sleep((remaining_ns - self.spin_ns) / 1e9)
+        while time.perf_counter_ns() < deadline_ns:
+            pass
+
+    def play(self, conn: Any, start_s: float = 0.0, stop_s: Optional[float] = None) -> ReplayStats:
+        """
+        Replay the datagrams, blocks until done or until :meth:`stop()` is called
+
+        :param conn: Connection to send with, connected with ``connect_tx()``
+        :param start_s: Where to start in the recording, seconds since its first datagram
+        :param stop_s: Where to stop in the recording, ``None`` for the end
+        :return: Statistics of the replay
+        """
+        if conn.fg_tx_sock is None:
+            raise FGConnectionError('TX not connected, call connect_tx() first')
+        net_struct = conn.fg_net_struct
+        if net_struct is not None and net_struct.sizeof() != self.log.payload_size:
+            raise ValueError(
+                f'Connection sends {net_struct.sizeof()} byte datagrams, the recording has {self.log.payload_size}'
+            )
+        start = self.log.find_elapsed(start_s)
+        stop = None if stop_s is None else self.log.find_elapsed(stop_s)
+        tx_sock = conn.fg_tx_sock
+        tx_addr = conn.fg_tx_addr
+
+        self.stop_event.clear()
+        num_packets = 0
+        jitter_ns = array.array('q')
+        first_recorded_ns: Optional[int] = None
+        play_start_ns = time.perf_counter_ns()
+        for record in self.log.records(start, stop):
+            if self.stop_event.is_set():
+                break
+            if self.speed is not None:
+                if first_recorded_ns is None:
+                    first_recorded_ns = record.monotonic_ns
+                due_ns = play_start_ns + round((record.monotonic_ns - first_recorded_ns) / self.speed)
+                self._wait_until(due_ns)
+                jitter_ns.append(time.perf_counter_ns() - due_ns)
+            tx_sock.sendto(record.data, tx_addr)
+            num_packets += 1
+        elapsed_s = (time.perf_counter_ns() - play_start_ns) / 1e9
+
+        sorted_jitter_us = sorted(jitter_ns_value / 1e3 for jitter_ns_value in jitter_ns) or [0.0]
+        return ReplayStats(
+            packets=num_packets,
+            elapsed_s=elapsed_s,
+            rate_hz=num_packets / elapsed_s if elapsed_s > 0 else 0.0,
+            jitter_mean_us=sum(sorted_jitter_us) / len(sorted_jitter_us),
+            jitter_p50_us=sorted_jitter_us[len(sorted_jitter_us) // 2],
+            jitter_p99_us=sorted_jitter_us[min(len(sorted_jitter_us) - 1, len(sorted_jitter_us) * 99 // 100)],
+            jitter_max_us=sorted_jitter_us[-1],
+        )
+
+    def stop(self):
+        """
+        Stop a replay that's running in another thread
+        """
+        self.stop_event.set()
+
+
+#: Column layouts that :func:`export_columns` can write:
+#:
+#: * ``npz``: A single ``.npz`` file (see ``numpy.savez()``) with an array per column
+#: * ``npy``: A directory with a ``<column>.npy`` file per column, each can be memory-mapped\
+#:   with ``numpy.load(path, mmap_mode='r')``. The columns are written chunk by chunk, so the\
+#:   recording never has to fit in memory
+column_layouts = ('npz', 'npy')
+
+
+def _recorded_conn_class(log: PacketLog) -> Optional[type]:
+    # Not at the top, fg_if imports this module
+    from .fg_if import FDMConnection, CtrlsConnection, GuiConnection
+
+    for conn_class in (FDMConnection, CtrlsConnection, GuiConnection):
+        if conn_class.fg_stream_name == log.stream_name:
+            return conn_class
+    return None
+
+
+def recorded_struct(log: PacketLog) -> Struct:
+    """
+    Find the struct of the datagrams in a recording, from its stream name and protocol version
+
+    :param log: Recording of a connection, see :meth:`flightgear_python.fg_if.FGConnection.record_rx()`
+    :return: i.e. :attr:`flightgear_python.fdm_v24.fdm_struct`
+    """
+    conn_class = _recorded_conn_class(log)
+    if conn_class is not None and log.version in conn_class.fg_supported_structs:
+        return conn_class.fg_supported_structs[log.version]
+    raise ValueError(f'Unknown stream "{log.stream_name}" version {log.version}, pass the struct explicitly')
+
+
+def _allocate_columns(
+    log: PacketLog,
+    net_struct: Optional[Struct],
+    fields: Optional[Sequence[str]],
+    fix_radians: bool,
+    allocate: Any,
+):
+    if np is None:
+        raise ImportError('Exporting columns requires numpy, install it with `pip3 install numpy`')
+    if net_struct is None:
+        net_struct = recorded_struct(log)
+    packet_dtype = NumpyStructCodec(net_struct).dtype
+    if packet_dtype.itemsize != log.payload_size:
+        raise ValueError(f'Struct is {packet_dtype.itemsize} bytes, the recording has {log.payload_size}')
+    if fields is None:
+        # Padding and other raw data isn't worth exporting
+        fields = [name for name in packet_dtype.names if packet_dtype.fields[name][0].base.kind != 'V']
+    unknown_names = [name for name in fields if name not in packet_dtype.names]
+    if unknown_names:
+        raise ValueError(f'Unknown fields {unknown_names}')
+    # Only where the connection corrects them too (i.e. not GUI, even though it has the same fields)
+    conn_class = _recorded_conn_class(log)
+    fix_radians = fix_radians and conn_class is not None and conn_class.fg_fix_radians
+    radian_fields = [name for name in fields if fix_radians and name in fg_radian_fields]
+
+    record_dtype = np.dtype(
+        {
+            'names': ['monotonic_ns', 'wall_ns', 'packet'],
+            'formats': ['<i8', '<i8', packet_dtype],
+            'offsets': [0, 8, 16],
+            'itemsize': log.record_size,
+        }
+    )
+    num_records = len(log)
+    columns = {
+        'monotonic_ns': allocate('monotonic_ns', np.dtype(np.int64), (num_records,)),
+        'wall_ns': allocate('wall_ns', np.dtype(np.int64), (num_records,)),
+    }
+    for name in fields:
+        field_dtype = packet_dtype.fields[name][0]
+        if name in radian_fields:
+            column_dtype = np.dtype(np.float64)  # Same as the per-packet correction
+        else:
+            column_dtype = field_dtype.base.newbyteorder('=')
+        # Array fields (i.e. `rpm`) get a 2D column
+        columns[name] = allocate(name, column_dtype, (num_records,) + field_dtype.shape)
+    return record_dtype, fields, radian_fields, columns
+
+
+def _fill_columns(
+    log: PacketLog,
+    record_dtype: Any,
+    fields: Sequence[str],
+    radian_fields: Sequence[str],
+    columns: Dict[str, Any],
+    chunk_records: int,
+):
+    for chunk_start in range(0, len(log), chunk_records):
+        count = min(chunk_records, len(log) - chunk_start)
+        # Zero-copy view of the records, the copy into the columns does the decoding
+        records = np.frombuffer(
+            log._mmap, dtype=record_dtype, count=count, offset=log.data_offset + chunk_start * log.record_size
+        )
+        chunk_end = chunk_start + count
+        columns['monotonic_ns'][chunk_start:chunk_end] = records['monotonic_ns']
+        columns['wall_ns'][chunk_start:chunk_end] = records['wall_ns']
+        packets = records['packet']
+        fixed = fix_fg_radian_columns({name: packets[name] for name in radian_fields}, radian_fields)
+        for name in fields:
+            columns[name][chunk_start:chunk_end] = fixed[name] if name in fixed else packets[name]
+        del records, packets  # So that the file can be unmapped
+
+
+def read_columns(
+    log: PacketLog,
+    fields: Optional[Sequence[str]] = None,
+    fix_radians: bool = True,
+    net_struct: Optional[Struct] = None,
+    chunk_records: int = 65536,
+) -> Dict[str, Any]:
+    """
+    Decode a whole recording into a numpy array per field, in large chunks instead of
+    one packet at a time. Requires ``numpy``
+
+    :param log: Recording to decode
+    :param fields: Only decode these fields. ``None`` for all of them, except padding
+    :param fix_radians: Apply the radian correction (see :func:`flightgear_python.fg_util.fix_fg_radian_columns`),\
+    to the recordings of streams whose connection applies it too (FDM)
+    :param net_struct: Struct of the datagrams, ``None`` to find it from the recording (see :func:`recorded_struct`)
+    :param chunk_records: Number of records that are decoded at once
+    :return: Arrays in native byte order, by field name. Also has the ``monotonic_ns``\
+    and ``wall_ns`` timestamps of the records
+    """
+    record_dtype, fields, radian_fields, columns = _allocate_columns(
+        log, net_struct, fields, fix_radians, lambda name, dtype, shape: np.empty(shape, dtype=dtype)
+    )
+    _fill_columns(log, record_dtype, fields, radian_fields, columns, chunk_records)
+    return columns
+
+
+def export_columns(
+    log: PacketLog,
+    path: path_type,
+    layout: str = 'npz',
+    fields: Optional[Sequence[str]] = None,
+    fix_radians: bool = True,
+    net_struct: Optional[Struct] = None,
+    chunk_records: int = 65536,
+):
+    """
+    Write a recording as columns, see :func:`read_columns`. Requires ``numpy``
+
+    :param log: Recording to export
+    :param path: File (``npz``) or directory (``npy``) to write to
+    :param layout: One of :attr:`column_layouts`
+    :param fields: Same as for :func:`read_columns`
+    :param fix_radians: Same as for :func:`read_columns`
+    :param net_struct: Same as for :func:`read_columns`
+    :param chunk_records: Same as for :func:`read_columns`
+    """
+    if layout not in column_layouts:
+        raise ValueError(f'Unknown layout "{layout}", must be one of {column_layouts}')
+    if layout == 'npz':
+        np.savez(path, **read_columns(log, fields, fix_radians, net_struct, chunk_records))
+        return
+
+    os.makedirs(path, exist_ok=True)
+
+    def allocate(name: str, dtype: Any, shape: Tuple[int, ...]) -> Any:
+        return np.lib.format.open_memmap(os.path.join(path, f'{name}.npy'), mode='w+', dtype=dtype, shape=shape)
+
+    record_dtype, fields, radian_fields, columns = _allocate_columns(log, net_struct, fields, fix_radians, allocate)
+    _fill_columns(log, record_dtype, fields, radian_fields, columns, chunk_records)
+    for column in columns.values():
+        column.flush()
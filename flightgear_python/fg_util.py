@@ -3,9 +3,15 @@ FlightGear-specific utility functionality
 """
 
 import math
+from typing import Any, Dict, Iterable, Tuple
 
 from construct import Container
 
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, it's only needed for the column functions
+    np = None
+
 
 class FGConnectionError(Exception):
     """
@@ -23,7 +29,14 @@ class FGCommunicationError(Exception):
     pass
 
 
-def offset_fg_radian(in_rad: float) -> float:
+#: Coefficient of :func:`offset_fg_radian`, per degree
+FG_RADIAN_OFFSET_COEFF = 1.09349403e-9
+DEGREES_PER_RADIAN = 180.0 / math.pi  #: Same factor as ``math.degrees()``
+M_PER_FT = 0.3048  #: Feet to meters
+M_PER_S_PER_KT = 1852.0 / 3600.0  #: Knots to meters per second
+
+
+def offset_fg_radian(in_rad: Any) -> Any:
     """
     Even when echoing back literally what FG sends over the Net FDM connection,
     (i.e. UDP bytes in -> UDP bytes out) the latitude/longitude shown in FG
@@ -32,26 +45,115 @@ def offset_fg_radian(in_rad: float) -> float:
     represented in radians. The coefficient was chosen through trial-and-error.
     sphinx-no-autodoc
 
-    :param in_rad: Input property, in radians
+    :param in_rad: Input property, in radians. Either a float or a numpy array
     :return: Offset that needs to be applied to the input, in radians
     """
-    coeff = 1.09349403e-9
-    return math.degrees(in_rad) * coeff
+    return in_rad * DEGREES_PER_RADIAN * FG_RADIAN_OFFSET_COEFF
 
 
-def fix_fg_radian_parsing(s: Container) -> Container:
+def fix_fg_radian(in_rad: Any) -> Any:
+    """
+    Correct a single radian value (or a numpy array of them), see :func:`offset_fg_radian`
+    sphinx-no-autodoc
+
+    :param in_rad: Input property, in radians
+    :return: Corrected property, in radians
+    """
+    return in_rad + offset_fg_radian(in_rad)
+
+
+#: Fields of the FDM that are in radians, and need :func:`offset_fg_radian`
+fg_radian_fields = (
+    'lon_rad',
+    'lat_rad',
+    'phi_rad',
+    'theta_rad',
+    'psi_rad',
+    'alpha_rad',
+    'beta_rad',
+    'phidot_rad_per_s',
+    'thetadot_rad_per_s',
+    'psidot_rad_per_s',
+)
+
+#: FDM fields that :func:`convert_fdm_units` converts, to (converted name, factor)
+fdm_unit_conversions: Dict[str, Tuple[str, float]] = {
+    **{field: (field.replace('_rad', '_deg'), DEGREES_PER_RADIAN) for field in fg_radian_fields},
+    'vcas': ('vcas_m_per_s', M_PER_S_PER_KT),
+    'climb_rate_ft_per_s': ('climb_rate_m_per_s', M_PER_FT),
+    'v_north_ft_per_s': ('v_north_m_per_s', M_PER_FT),
+    'v_east_ft_per_s': ('v_east_m_per_s', M_PER_FT),
+    'v_down_ft_per_s': ('v_down_m_per_s', M_PER_FT),
+    'v_body_u': ('v_body_u_m_per_s', M_PER_FT),
+    'v_body_v': ('v_body_v_m_per_s', M_PER_FT),
+    'v_body_w': ('v_body_w_m_per_s', M_PER_FT),
+    'A_X_pilot_ft_per_s_per_s': ('A_X_pilot_m_per_s_per_s', M_PER_FT),
+    'A_Y_pilot_ft_per_s_per_s': ('A_Y_pilot_m_per_s_per_s', M_PER_FT),
+    'A_Z_pilot_ft_per_s_per_s': ('A_Z_pilot_m_per_s_per_s', M_PER_FT),
+}
+
+
+def fix_fg_radian_parsing(s: Container, fields: Iterable[str] = fg_radian_fields) -> Container:
     """
     Helper for all the radian values in the FDM
     sphinx-no-autodoc
+
+    :param s: Decoded FDM packet
+    :param fields: Which of the radian fields to fix, i.e. when only some fields were decoded
     """
-    s.lon_rad += offset_fg_radian(s.lon_rad)
-    s.lat_rad += offset_fg_radian(s.lat_rad)
-    s.phi_rad += offset_fg_radian(s.phi_rad)
-    s.theta_rad += offset_fg_radian(s.theta_rad)
-    s.psi_rad += offset_fg_radian(s.psi_rad)
-    s.alpha_rad += offset_fg_radian(s.alpha_rad)
-    s.beta_rad += offset_fg_radian(s.beta_rad)
-    s.phidot_rad_per_s += offset_fg_radian(s.phidot_rad_per_s)
-    s.thetadot_rad_per_s += offset_fg_radian(s.thetadot_rad_per_s)
-    s.psidot_rad_per_s += offset_fg_radian(s.psidot_rad_per_s)
+    for field in fields:
+        # Item access, attribute access on a Container is a lot slower
+        s[field] = fix_fg_radian(s[field])
     return s
+
+
+def _column_names(columns: Any) -> Iterable[str]:
+    dtype = getattr(columns, 'dtype', None)
+    return dtype.names if dtype is not None else columns.keys()
+
+
+def _as_float64(values: Any) -> Any:
+    # Same precision as the per-packet path, where everything is a Python float
+    if np is not None and isinstance(values, np.ndarray):
+        return values.astype(np.float64, copy=False)
+    return values
+
+
+def fix_fg_radian_columns(columns: Any, fields: Iterable[str] = fg_radian_fields) -> Dict[str, Any]:
+    """
+    Batch version of :func:`fix_fg_radian_parsing`, for lots of packets at once
+    (i.e. post-processing a recording). Gives exactly the same values.
+
+    :param columns: Decoded FDM packets as columns, either a ``dict`` of numpy arrays or a\
+    structured numpy array (i.e. ``numpy.frombuffer()`` with the dtype of a\
+    :class:`flightgear_python.fg_codec.NumpyStructCodec`)
+    :param fields: Which of the radian fields to fix, the ones that aren't in ``columns`` are skipped
+    :return: Every column of ``columns``, the radian fields as corrected ``float64`` copies
+    """
+    fixed = {name: columns[name] for name in _column_names(columns)}
+    for field in fields:
+        if field in fixed:
+            fixed[field] = fix_fg_radian(_as_float64(fixed[field]))
+    return fixed
+
+
+def convert_fdm_units(data: Any, fix_radians: bool = True) -> Dict[str, Any]:
+    """
+    Convert FDM fields to degrees and SI units (see :attr:`fdm_unit_conversions`),
+    applying the radian correction in the same pass
+
+    :param data: A decoded FDM packet, or many of them as columns (see :func:`fix_fg_radian_columns`)
+    :param fix_radians: Apply :func:`fix_fg_radian` to the radian fields first. Leave this off if\
+    the packets were already fixed, i.e. by the connection
+    :return: The converted fields that are in ``data``, with their new names (i.e. ``lat_deg``)
+    """
+    names = set(_column_names(data))
+    converted: Dict[str, Any] = {}
+    for field, (converted_name, factor) in fdm_unit_conversions.items():
+        if field not in names:
+            continue
+        values = _as_float64(data[field])
+        if fix_radians and field in fg_radian_fields:
+            values = fix_fg_radian(values)
+        converted[converted_name] = values * factor
+    return converted
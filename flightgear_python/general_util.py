@@ -2,10 +2,19 @@
 non-FlightGear-specific utility functionality
 """
 
+import ctypes
+import errno
+import os
+import socket
+import struct
+import sys
+import time
 import warnings
-from typing import Any, Union, ByteString
+import weakref
+from typing import Any, Union, ByteString, List, NamedTuple, Optional, Sequence, Tuple
 
 import multiprocess as mp
+from multiprocess import shared_memory
 
 
 class EventPipe:
@@ -57,6 +66,592 @@ class EventPipe:
         return msg
 
 
+# Sequence number in front of the value, odd while the value is being written
+_seqlock_header = struct.Struct('Q')
+
+
+class LatestValueChannel:
+    """
+    Shared memory "latest value" channel, for passing high-rate data (i.e. telemetry)
+    from one writer process to any number of reader processes. The writer always overwrites
+    the value and never waits for the readers, the readers always get the newest complete
+    value. Reading and writing are plain memory accesses: no syscalls and no pickling.
+    Consistency is ensured with a sequence lock, the value is tagged with a counter that
+    is odd while a write is in progress.
+
+    Values are tuples with a fixed layout, given as a :mod:`struct` format. To pass a
+    whole packet, use a bytes field i.e. ``LatestValueChannel(f'{fdm_struct.sizeof()}s')``.
+
+    :param fmt: :mod:`struct` format of the value, i.e. ``'dd'`` for a tuple of 2 floats
+    """
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self._struct = struct.Struct(fmt)
+        self.shm = shared_memory.SharedMemory(create=True, size=_seqlock_header.size + self._struct.size)
+        _seqlock_header.pack_into(self.shm.buf, 0, 0)
+        # The block is removed once the creating process is done with it
+        weakref.finalize(self, self.shm.unlink)
+        # Values are packed here first, so that a bad value can't corrupt the shared one
+        self._write_buffer = bytearray(self._struct.size)
+
+    def __getstate__(self):
+        # struct.Struct can't be pickled, it's recreated from the format.
+        # SharedMemory pickles as its name, so the block is attached again
+        state = self.__dict__.copy()
+        del state['_struct']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._struct = struct.Struct(self.fmt)
+
+    @property
+    def sequence(self) -> int:
+        """
+        Number of values that were written so far
+        """
+        (seq,) = _seqlock_header.unpack_from(self.shm.buf)
+        return seq // 2
+
+    def write(self, values: Sequence[Any]):
+        """
+        Overwrite the value. Must only be called from one process (and thread) at a time
+
+        :param values: Tuple matching :attr:`fmt`
+        """
+        self._struct.pack_into(self._write_buffer, 0, *values)
+        (seq,) = _seqlock_header.unpack_from(self.shm.buf)
+        # Not pack_into(), it zeroes the destination before writing so readers could see a sequence of 0
+        header_end = _seqlock_header.size
+        self.shm.buf[:header_end] = _seqlock_header.pack(seq + 1)
+        # No views into `shm.buf` are kept around, they would prevent closing it
+        value_start = header_end
+        value_end = value_start + self._struct.size
+        self.shm.buf[value_start:value_end] = self._write_buffer
+        self.shm.buf[:header_end] = _seqlock_header.pack(seq + 2)
+
+    def read(self, timeout_s: float = 1.0) -> Tuple[int, Optional[Tuple[Any, ...]]]:
+        """
+        Read the newest value
+
+        :param timeout_s: How long to keep retrying while the value is being written
+        :return: Sequence number of the value (see :attr:`sequence`) and the value, or ``(0, None)``\
+        when nothing was written yet
+        """
+        deadline: Optional[float] = None
+        while True:
+            (seq,) = _seqlock_header.unpack_from(self.shm.buf)
+            if seq == 0:
+                return 0, None
+            if not seq % 2:
+                values = self._struct.unpack_from(self.shm.buf, _seqlock_header.size)
+                (seq_after,) = _seqlock_header.unpack_from(self.shm.buf)
+                if seq_after == seq:
+                    return seq // 2, values
+
+            # Being written right now, give the writer a chance to finish (it might be waiting for our CPU)
+            if deadline is None:
+                deadline = time.monotonic() + timeout_s
+            elif time.monotonic() > deadline:
+                raise RuntimeError(
+                    f'Could not read a consistent value within {timeout_s} seconds, did the writer crash?'
+                )
+            time.sleep(0)
+
+
+class LatestValueEventPipe(EventPipe):
+    """
+    Drop-in replacement for :class:`EventPipe` where the child to parent direction
+    (``child_send()``/``parent_poll()``/``parent_recv()``) goes through a
+    :class:`LatestValueChannel` instead of a pipe. The parent only gets the newest
+    value, anything it didn't get to in time is skipped instead of queued up.
+    The parent to child direction is unchanged.
+
+    Use it by replacing the pipe of a connection before starting it, i.e.
+    ``fdm_conn.event_pipe = LatestValueEventPipe('d')`` if the callback does
+    ``event_pipe.child_send((roll_deg,))``
+
+    :param fmt: :mod:`struct` format of the tuples the child sends
+    :param duplex: Same as for :class:`EventPipe`
+    :param recv_poll_interval_s: How often :meth:`parent_recv()` checks for a new value while waiting
+    """
+
+    def __init__(self, fmt: str, duplex=True, recv_poll_interval_s: float = 0.001):
+        super().__init__(duplex=duplex)
+        self.channel = LatestValueChannel(fmt)
+        self.recv_poll_interval_s = recv_poll_interval_s
+        self.parent_seq = 0  # Sequence number of the last value the parent received
+
+        # function aliases, the ones from EventPipe would shadow our methods
+        self.child_send = self.channel.write
+        del self.parent_poll
+        del self.parent_recv
+
+    def parent_poll(self, timeout: Optional[float] = 0.0) -> bool:
+        """
+        Check if there's a value the parent didn't receive yet
+
+        :param timeout: Seconds to wait for a new value, ``None`` to wait forever
+        :return: ``True`` if :meth:`parent_recv()` will return right away
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.channel.sequence == self.parent_seq:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(self.recv_poll_interval_s)
+        return True
+
+    def parent_recv(self) -> Tuple[Any, ...]:
+        """
+        Receive the newest value from the child process, waiting for one if the
+        parent already received the newest one
+
+        :return: Tuple matching the channel format
+        """
+        self.parent_poll(timeout=None)
+        self.parent_seq, values = self.channel.read()
+        return values
+
+
+# Header fields of the ring buffer, each one is only ever written by one side
+_RING_WRITE_COUNT = 0  # Producer
+_RING_READ_COUNT = 1  # Consumer
+_RING_OVERRUNS = 2  # Producer
+_RING_BAD_SIZE = 3  # Producer
+_ring_header_field = struct.Struct('Q')
+_ring_header_size = 4 * _ring_header_field.size
+
+
+class DatagramRingBuffer:
+    """
+    Single-producer/single-consumer ring buffer of raw datagrams in shared memory,
+    for passing every packet (not just the latest one) from the RX process to the parent.
+    Every slot holds exactly one packet, so the packets the consumer gets are back to
+    back and can be decoded in bulk (i.e. ``numpy.frombuffer()`` with the dtype of a
+    :class:`flightgear_python.fg_codec.NumpyStructCodec`).
+
+    The producer never waits: when the ring is full, new datagrams are dropped and
+    counted in :attr:`overrun_count`. Datagrams that aren't exactly ``slot_size`` long
+    (i.e. a different protocol version) are dropped and counted in :attr:`bad_size_count`.
+
+    Feed it from a connection with
+    ``fdm_conn.add_rx_raw_hook(ring.put)``
+
+    :param slot_size: Size of one packet, i.e. ``fdm_struct.sizeof()``
+    :param capacity: Number of packets the ring can hold
+    """
+
+    def __init__(self, slot_size: int, capacity: int = 1024):
+        if capacity < 1:
+            raise ValueError(f'capacity must be at least 1, not {capacity}')
+        self.slot_size = slot_size
+        self.capacity = capacity
+        self.shm = shared_memory.SharedMemory(create=True, size=_ring_header_size + slot_size * capacity)
+        self.shm.buf[:_ring_header_size] = bytes(_ring_header_size)
+        # The block is removed once the creating process is done with it
+        weakref.finalize(self, self.shm.unlink)
+
+    def _get(self, field_idx: int) -> int:
+        (value,) = _ring_header_field.unpack_from(self.shm.buf, field_idx * _ring_header_field.size)
+        return value
+
+    def _set(self, field_idx: int, value: int):
+        # Not pack_into(), it zeroes the destination before writing so the other side could see a count of 0
+        field_start = field_idx * _ring_header_field.size
+        field_end = field_start + _ring_header_field.size
+        self.shm.buf[field_start:field_end] = _ring_header_field.pack(value)
+
+    @property
+    def overrun_count(self) -> int:
+        """
+        Number of datagrams dropped because the ring was full
+        """
+        return self._get(_RING_OVERRUNS)
+
+    @property
+    def bad_size_count(self) -> int:
+        """
+        Number of datagrams dropped because their size didn't match ``slot_size``
+        """
+        return self._get(_RING_BAD_SIZE)
+
+    def __len__(self) -> int:
+        return self._get(_RING_WRITE_COUNT) - self._get(_RING_READ_COUNT)
+
+    def put(self, data: ByteString) -> bool:
+        """
+        Add a datagram, producer side
+
+        :param data: Datagram, must be ``slot_size`` long
+        :return: ``True`` if the datagram was added, ``False`` if it was dropped
+        """
+        if len(data) != self.slot_size:
+            self._set(_RING_BAD_SIZE, self._get(_RING_BAD_SIZE) + 1)
+            return False
+        write_count = self._get(_RING_WRITE_COUNT)
+        if write_count - self._get(_RING_READ_COUNT) >= self.capacity:
+            self._set(_RING_OVERRUNS, self._get(_RING_OVERRUNS) + 1)
+            return False
+
+        slot_start = _ring_header_size + (write_count % self.capacity) * self.slot_size
+        slot_end = slot_start + self.slot_size
+        self.shm.buf[slot_start:slot_end] = data
+        # Only publish the slot once it's completely written
+        self._set(_RING_WRITE_COUNT, write_count + 1)
+        return True
+
+    def consume(self, max_count: Optional[int] = None) -> bytes:
+        """
+        Take all the waiting datagrams (up to ``max_count``) out of the ring, consumer side
+
+        :param max_count: Maximum number of datagrams to take, ``None`` for all of them
+        :return: The datagrams back to back, oldest first. ``len() // slot_size`` of them
+        """
+        read_count = self._get(_RING_READ_COUNT)
+        count = self._get(_RING_WRITE_COUNT) - read_count
+        if max_count is not None:
+            count = min(count, max_count)
+        if count <= 0:
+            return b''
+
+        first_slot = read_count % self.capacity
+        first_count = min(count, self.capacity - first_slot)
+        first_start = _ring_header_size + first_slot * self.slot_size
+        first_end = first_start + first_count * self.slot_size
+        data = bytes(self.shm.buf[first_start:first_end])
+        if first_count < count:
+            # Wrapped around to the start of the ring
+            wrapped_end = _ring_header_size + (count - first_count) * self.slot_size
+            data += bytes(self.shm.buf[_ring_header_size:wrapped_end])
+        # Only free the slots once they're copied
+        self._set(_RING_READ_COUNT, read_count + count)
+        return data
+
+
+class StageStats(NamedTuple):
+    """
+    Latency of one stage of a loop, see :meth:`StageTimer.snapshot()`. Percentiles are
+    the upper end of the histogram bucket they fall into, so at most ``1 / 2**sub_bucket_bits``
+    too high
+    """
+
+    name: str
+    count: int  # Number of times the stage ran
+    mean_us: float
+    p50_us: float
+    p90_us: float
+    p99_us: float
+    max_us: float
+
+
+class LoopStats(NamedTuple):
+    """
+    Timing of a loop, see :meth:`StageTimer.snapshot()`
+    """
+
+    loops: int  # Number of iterations
+    items: int  # Number of items handled (i.e. datagrams, more than ``loops`` when receiving in batches)
+    overruns: int  # Iterations that took longer than the budget, not counting the first stage
+    rate_hz: float  # Iterations per second, from the first to the latest iteration
+    stages: List[StageStats]
+
+
+# Counters in front of the histograms
+_TIMER_LOOPS = 0
+_TIMER_ITEMS = 1
+_TIMER_OVERRUNS = 2
+_TIMER_FIRST_NS = 3
+_TIMER_LAST_NS = 4
+_TIMER_HEADER_LEN = 5
+# Per stage, in front of its histogram
+_STAGE_TOTAL_NS = 0
+_STAGE_MAX_NS = 1
+_STAGE_HEADER_LEN = 2
+
+
+class StageTimer:
+    """
+    Latency histograms for the stages of a loop (i.e. receive, decode, callback, send), kept in
+    shared memory so that another process can look at them (see :meth:`snapshot()`) while the
+    loop keeps running. The loop never waits for the reader, so a snapshot can be off by the
+    iteration that's in progress.
+
+    Histograms have logarithmic buckets, each power of 2 split into ``2**sub_bucket_bits`` linear
+    buckets (like HdrHistogram), so the relative precision is the same from nanoseconds to seconds.
+
+    The loop calls :meth:`start_loop()`, :meth:`mark()` after every stage and :meth:`end_loop()`.
+
+    :param stage_names: Names of the stages, in the order they run. The first one is considered to\
+    be waiting for work (i.e. receiving), so it doesn't count towards overruns
+    :param budget_s: An iteration that takes longer than this (without the first stage) is an overrun
+    :param sub_bucket_bits: Precision of the histograms
+    :param max_bits: Durations of ``2**max_bits`` nanoseconds or longer all go into the last bucket
+    """
+
+    def __init__(
+        self, stage_names: Sequence[str], budget_s: Optional[float] = None, sub_bucket_bits: int = 3, max_bits: int = 40
+    ):
+        self.stage_names = tuple(stage_names)
+        self.budget_ns = None if budget_s is None else round(budget_s * 1e9)
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_buckets = 1 << sub_bucket_bits
+        self.num_buckets = (max_bits - sub_bucket_bits + 1) * self.sub_buckets
+        self.stage_len = _STAGE_HEADER_LEN + self.num_buckets
+        # Plain shared array, every entry is only ever written by the loop
+        self.counters = mp.Array('Q', _TIMER_HEADER_LEN + len(self.stage_names) * self.stage_len, lock=False)
+        # Only used by the loop
+        self._stage_starts = tuple(
+            _TIMER_HEADER_LEN + stage_idx * self.stage_len for stage_idx in range(len(self.stage_names))
+        )
+        num_stages = len(self.stage_names)
+        self._next_stage = tuple(range(1, num_stages)) + (min(1, num_stages - 1),)
+        self._last_ns = 0
+        self._busy_start_ns = 0
+        self._stage_idx = 0
+
+    def _bucket(self, duration_ns: int) -> int:
+        if duration_ns < self.sub_buckets:
+            return duration_ns
+        # Keep the top `sub_bucket_bits + 1` bits, the leading 1 moves it up into the next power of 2
+        shift = duration_ns.bit_length() - 1 - self.sub_bucket_bits
+        return min((shift << self.sub_bucket_bits) + (duration_ns >> shift), self.num_buckets - 1)
+
+    def _bucket_upper_ns(self, bucket: int) -> int:
+        if bucket < self.sub_buckets:
+            return bucket + 1
+        shift = bucket // self.sub_buckets - 1
+        return (self.sub_buckets + bucket % self.sub_buckets + 1) << shift
+
+    def start_loop(self):
+        """
+        Start timing an iteration, the first stage starts now
+        """
+        self._last_ns = time.perf_counter_ns()
+        self._stage_idx = 0
+        if not self.counters[_TIMER_FIRST_NS]:
+            self.counters[_TIMER_FIRST_NS] = self._last_ns
+
+    def mark(self):
+        """
+        The current stage is done, the next one starts now. Stages that are marked more
+        than once in an iteration (i.e. one decode per datagram of a batch) wrap around to
+        the second stage
+        """
+        now_ns = time.perf_counter_ns()
+        duration_ns = now_ns - self._last_ns
+        self._last_ns = now_ns
+        stage_idx = self._stage_idx
+        stage_start = self._stage_starts[stage_idx]
+        counters = self.counters
+        counters[stage_start + _STAGE_TOTAL_NS] += duration_ns
+        if duration_ns > counters[stage_start + _STAGE_MAX_NS]:
+            counters[stage_start + _STAGE_MAX_NS] = duration_ns
+        # Same as _bucket(), this runs a couple of times per iteration so it's worth avoiding the call
+        sub_bucket_bits = self.sub_bucket_bits
+        if duration_ns >> sub_bucket_bits:
+            shift = duration_ns.bit_length() - 1 - sub_bucket_bits
+            bucket = min((shift << sub_bucket_bits) + (duration_ns >> shift), self.num_buckets - 1)
+        else:
+            bucket = duration_ns
+        counters[stage_start + _STAGE_HEADER_LEN + bucket] += 1
+
+        if not stage_idx:
+            self._busy_start_ns = now_ns
+        self._stage_idx = self._next_stage[stage_idx]
+
+    def end_loop(self, num_items: int = 1):
+        """
+        Finish timing an iteration, call after the :meth:`mark()` of the last stage
+
+        :param num_items: Number of items handled in this iteration
+        """
+        counters = self.counters
+        if self.budget_ns is not None and self._last_ns - self._busy_start_ns > self.budget_ns:
+            counters[_TIMER_OVERRUNS] += 1
+        counters[_TIMER_ITEMS] += num_items
+        counters[_TIMER_LOOPS] += 1
+        counters[_TIMER_LAST_NS] = self._last_ns
+
+    def snapshot(self) -> LoopStats:
+        """
+        Get the current statistics, can be called from any process
+
+        :return: Statistics since the loop started
+        """
+        counters = self.counters[:]  # One copy, then the loop can carry on
+        stages: List[StageStats] = []
+        for stage_idx, name in enumerate(self.stage_names):
+            stage_start = _TIMER_HEADER_LEN + stage_idx * self.stage_len
+            buckets_start = stage_start + _STAGE_HEADER_LEN
+            buckets_end = stage_start + self.stage_len
+            buckets = counters[buckets_start:buckets_end]
+            count = sum(buckets)
+            max_ns = counters[stage_start + _STAGE_MAX_NS]
+
+            def percentile_us(fraction: float) -> float:
+                if not count:
+                    return 0.0
+                threshold = fraction * count
+                seen = 0
+                for bucket, bucket_count in enumerate(buckets):
+                    seen += bucket_count
+                    if seen >= threshold:
+                        return min(self._bucket_upper_ns(bucket), max_ns) / 1e3
+                return max_ns / 1e3
+
+            stages.append(
+                StageStats(
+                    name=name,
+                    count=count,
+                    mean_us=counters[stage_start + _STAGE_TOTAL_NS] / count / 1e3 if count else 0.0,
+                    p50_us=percentile_us(0.5),
+                    p90_us=percentile_us(0.9),
+                    p99_us=percentile_us(0.99),
+                    max_us=max_ns / 1e3,
+                )
+            )
+        loops = counters[_TIMER_LOOPS]
+        elapsed_ns = counters[_TIMER_LAST_NS] - counters[_TIMER_FIRST_NS]
+        return LoopStats(
+            loops=loops,
+            items=counters[_TIMER_ITEMS],
+            overruns=counters[_TIMER_OVERRUNS],
+            rate_hz=loops / elapsed_ns * 1e9 if elapsed_ns > 0 else 0.0,
+            stages=stages,
+        )
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p), ('iov_len', ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ('msg_name', ctypes.c_void_p),
+        ('msg_namelen', ctypes.c_uint32),
+        ('msg_iov', ctypes.POINTER(_IOVec)),
+        ('msg_iovlen', ctypes.c_size_t),
+        ('msg_control', ctypes.c_void_p),
+        ('msg_controllen', ctypes.c_size_t),
+        ('msg_flags', ctypes.c_int),
+    ]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', _MsgHdr), ('msg_len', ctypes.c_uint)]
+
+
+def _load_recvmmsg() -> Optional[Any]:
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        recvmmsg = ctypes.CDLL(None, use_errno=True).recvmmsg
+    except (OSError, AttributeError):
+        return None
+    recvmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+    recvmmsg.restype = ctypes.c_int
+    return recvmmsg
+
+
+class DatagramBatchReceiver:
+    """
+    Receive many datagrams from a socket at once. On Linux this is a single
+    ``recvmmsg()`` syscall (through ``ctypes``, so no compiled extension is needed),
+    everywhere else it falls back to a non-blocking ``recv_into()`` loop.
+    Datagrams are received into one preallocated buffer.
+
+    :param max_batch: Maximum number of datagrams returned from one :meth:`recv()`
+    :param max_size: Maximum size of a datagram, anything longer is truncated
+    :param use_recvmmsg: Set to ``False`` to always use the ``recv_into()`` loop
+    """
+
+    def __init__(self, max_batch: int = 64, max_size: int = 1024, use_recvmmsg: bool = True):
+        if max_batch < 1:
+            raise ValueError(f'max_batch must be at least 1, not {max_batch}')
+        self.max_batch = max_batch
+        self.max_size = max_size
+        self.use_recvmmsg = use_recvmmsg
+        self.buffer = bytearray(max_batch * max_size)
+        self._iovecs: Optional[ctypes.Array] = None
+        self._mmsg_vec: Optional[ctypes.Array] = None
+        self._recvmmsg: Optional[Any] = None
+
+    def __getstate__(self):
+        # ctypes objects can't be pickled (i.e. when spawning a process), they're recreated on first use
+        state = self.__dict__.copy()
+        state['_iovecs'] = None
+        state['_mmsg_vec'] = None
+        state['_recvmmsg'] = None
+        return state
+
+    @property
+    def uses_recvmmsg(self) -> bool:
+        """
+        If ``recvmmsg()`` is available and used
+        """
+        return self.use_recvmmsg and _load_recvmmsg() is not None
+
+    def _setup_recvmmsg(self) -> bool:
+        if self._mmsg_vec is not None:
+            return True
+        if not self.use_recvmmsg:
+            return False
+        self._recvmmsg = _load_recvmmsg()
+        if self._recvmmsg is None:
+            return False
+
+        buffer_addr = ctypes.addressof(ctypes.c_char.from_buffer(self.buffer))
+        self._iovecs = (_IOVec * self.max_batch)()
+        self._mmsg_vec = (_MMsgHdr * self.max_batch)()
+        for idx in range(self.max_batch):
+            self._iovecs[idx].iov_base = buffer_addr + idx * self.max_size
+            self._iovecs[idx].iov_len = self.max_size
+            self._mmsg_vec[idx].msg_hdr.msg_iov = ctypes.pointer(self._iovecs[idx])
+            self._mmsg_vec[idx].msg_hdr.msg_iovlen = 1
+        return True
+
+    def recv(self, sock: socket.socket) -> List[memoryview]:
+        """
+        Receive all the datagrams that are waiting on the socket (up to ``max_batch``), without blocking
+
+        :param sock: UDP socket
+        :return: Datagrams, oldest first. These are views into :attr:`buffer` that\
+        are only valid until the next call
+        """
+        view = memoryview(self.buffer)
+        if self._setup_recvmmsg():
+            num_received = self._recvmmsg(sock.fileno(), self._mmsg_vec, self.max_batch, socket.MSG_DONTWAIT, None)
+            if num_received < 0:
+                err = ctypes.get_errno()
+                if err in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                    return []
+                raise OSError(err, os.strerror(err))
+            datagrams = []
+            for idx in range(num_received):
+                slot_start = idx * self.max_size
+                slot_end = slot_start + self._mmsg_vec[idx].msg_len
+                datagrams.append(view[slot_start:slot_end])
+            return datagrams
+
+        datagrams: List[memoryview] = []
+        timeout = sock.gettimeout()
+        sock.setblocking(False)
+        try:
+            for idx in range(self.max_batch):
+                slot_start = idx * self.max_size
+                slot_end = slot_start + self.max_size
+                slot = view[slot_start:slot_end]
+                try:
+                    rx_len = sock.recv_into(slot)
+                except (BlockingIOError, InterruptedError):
+                    break
+                datagrams.append(slot[:rx_len])
+        finally:
+            sock.settimeout(timeout)
+        return datagrams
+
+
 def strip_end(text: Union[str, ByteString], suffix: Union[str, ByteString]) -> Union[str, ByteString]:
     """
     This could be removed if we want to move lowest supported version to 3.9 (.removesuffix())
@@ -0,0 +1,148 @@
+import asyncio
+import socket
+
+from flightgear_python.fg_aio import AsyncFDMConnection, AsyncCtrlsConnection, AsyncGuiConnection
+from flightgear_python.fg_codec import StructCodec
+from flightgear_python.fg_util import FGConnectionError
+from flightgear_python.fdm_v24 import fdm_struct as fdm_struct_v24
+from flightgear_python.ctrls_v27 import ctrls_struct as ctrls_struct_v27
+from flightgear_python.gui_v8 import gui_struct as gui_struct_v8
+from testing_common import random_packet
+
+import pytest
+
+codecs = ['construct', 'compiled', 'numpy', 'lazy']
+
+
+def make_packet(net_struct, counter_field, value):
+    packet = random_packet(StructCodec(net_struct), 0)
+    packet[counter_field] = value
+    return net_struct.build(packet)
+
+
+def rx_addr(conn):
+    return conn.rx_transport.get_extra_info('sockname')
+
+
+@pytest.mark.parametrize('codec', codecs)
+@pytest.mark.parametrize(
+    'conn_cls, net_struct, counter_field',
+    [
+        (AsyncFDMConnection, fdm_struct_v24, 'cur_time_s'),
+        (AsyncCtrlsConnection, ctrls_struct_v27, 'num_engines'),
+        (AsyncGuiConnection, gui_struct_v8, 'cur_time_s'),
+    ],
+)
+def test_async_iterator(conn_cls, net_struct, counter_field, codec):
+    if codec == 'numpy':
+        pytest.importorskip('numpy')
+
+    async def run():
+        conn = conn_cls(codec=codec)  # auto-version
+        await conn.connect_rx('127.0.0.1', 0)
+        fg_out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for i in range(3):
+            fg_out_sock.sendto(make_packet(net_struct, counter_field, i), rx_addr(conn))
+
+        received = []
+        async for packet in conn:
+            received.append(int(packet[counter_field]))
+            if len(received) == 3:
+                break
+        assert received == [0, 1, 2]
+        assert conn.fg_net_struct is net_struct
+
+        conn.stop()
+        fg_out_sock.close()
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize('codec', codecs)
+@pytest.mark.parametrize('use_coroutine', [True, False])
+def test_async_callback_roundtrip(codec, use_coroutine):
+    if codec == 'numpy':
+        pytest.importorskip('numpy')
+
+    def modify(fdm_data):
+        fdm_data['cur_time_s'] = fdm_data['cur_time_s'] + 100
+        return fdm_data
+
+    async def async_rx_cb(fdm_data):
+        await asyncio.sleep(0)
+        return modify(fdm_data)
+
+    async def run():
+        conn = AsyncFDMConnection(24, codec=codec)
+        await conn.connect_rx('127.0.0.1', 0, async_rx_cb if use_coroutine else modify)
+        fg_in_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        fg_in_sock.bind(('127.0.0.1', 0))
+        fg_in_sock.setblocking(False)
+        await conn.connect_tx(*fg_in_sock.getsockname())
+        rx_task = conn.start()
+
+        fg_out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        fg_out_sock.sendto(make_packet(fdm_struct_v24, 'cur_time_s', 5), rx_addr(conn))
+        loop = asyncio.get_running_loop()
+        tx_msg = await asyncio.wait_for(loop.sock_recv(fg_in_sock, 1024), 2.0)
+        assert fdm_struct_v24.parse(tx_msg).cur_time_s == 105
+
+        conn.stop()
+        with pytest.raises(asyncio.CancelledError):
+            await rx_task
+        fg_out_sock.close()
+        fg_in_sock.close()
+
+    asyncio.run(run())
+
+
+def test_async_queue_overflow_drops_oldest():
+    async def run():
+        conn = AsyncFDMConnection(24)
+        await conn.connect_rx('127.0.0.1', 0, max_queue=2)
+        fg_out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for i in range(5):
+            fg_out_sock.sendto(make_packet(fdm_struct_v24, 'cur_time_s', i), rx_addr(conn))
+        # Let the event loop read everything from the socket
+        for _ in range(50):
+            if conn.rx_dropped_count == 3:
+                break
+            await asyncio.sleep(0.01)
+
+        assert conn.rx_dropped_count == 3
+        assert [(await conn.__anext__()).cur_time_s for _ in range(2)] == [3, 4]
+        conn.stop()
+        fg_out_sock.close()
+
+    asyncio.run(run())
+
+
+def test_async_timeout_and_stop():
+    async def run():
+        conn = AsyncFDMConnection(24, rx_timeout_s=0.05)
+        await conn.connect_rx('127.0.0.1', 0)
+        with pytest.raises(FGConnectionError):
+            await conn.__anext__()
+
+        # Stopping wakes up a pending iteration
+        conn.rx_timeout_s = None
+        pending = asyncio.ensure_future(conn.__anext__())
+        await asyncio.sleep(0)
+        conn.stop()
+        with pytest.raises(StopAsyncIteration):
+            await pending
+        with pytest.raises(FGConnectionError):
+            conn.send({})
+
+    asyncio.run(run())
+
+
+def test_async_no_callback():
+    conn = AsyncFDMConnection(24)
+    with pytest.raises(FGConnectionError):
+        conn.start()
+
+
+def test_async_unsupported_version():
+    with pytest.raises(NotImplementedError):
+        AsyncFDMConnection(1)
@@ -0,0 +1,123 @@
+import socket
+
+import dill
+
+from flightgear_python.fg_if import FDMConnection
+from flightgear_python.fg_codec import StructCodec
+from flightgear_python.fdm_v24 import fdm_struct as fdm_struct_v24
+from flightgear_python.general_util import DatagramBatchReceiver
+from testing_common import random_packet
+
+import pytest
+
+use_recvmmsg_options = [True, False]
+
+
+def udp_pair():
+    rx_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    rx_sock.bind(('127.0.0.1', 0))
+    tx_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    return rx_sock, tx_sock
+
+
+@pytest.mark.parametrize('use_recvmmsg', use_recvmmsg_options)
+def test_batch_receiver_order_and_limit(use_recvmmsg):
+    rx_sock, tx_sock = udp_pair()
+    receiver = DatagramBatchReceiver(max_batch=4, max_size=16, use_recvmmsg=use_recvmmsg)
+
+    assert receiver.recv(rx_sock) == []
+    for i in range(6):
+        tx_sock.sendto(bytes([i]) * (i + 1), rx_sock.getsockname())
+    # Last datagram is longer than max_size
+    tx_sock.sendto(b'x' * 20, rx_sock.getsockname())
+
+    first_batch = [bytes(d) for d in receiver.recv(rx_sock)]
+    assert first_batch == [bytes([i]) * (i + 1) for i in range(4)]
+    second_batch = [bytes(d) for d in receiver.recv(rx_sock)]
+    assert second_batch == [bytes([4]) * 5, bytes([5]) * 6, b'x' * 16]
+    assert receiver.recv(rx_sock) == []
+
+    rx_sock.close()
+    tx_sock.close()
+
+
+def test_batch_receiver_pickle_after_use():
+    rx_sock, tx_sock = udp_pair()
+    receiver = DatagramBatchReceiver(max_batch=2)
+    tx_sock.sendto(b'abc', rx_sock.getsockname())
+    assert [bytes(d) for d in receiver.recv(rx_sock)] == [b'abc']
+
+    unpickled_receiver = dill.loads(dill.dumps(receiver))
+    tx_sock.sendto(b'def', rx_sock.getsockname())
+    assert [bytes(d) for d in unpickled_receiver.recv(rx_sock)] == [b'def']
+
+    rx_sock.close()
+    tx_sock.close()
+
+
+def setup_batch_connection(fdm_c: FDMConnection):
+    fg_out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    codec = StructCodec(fdm_struct_v24)
+    rx_addr = fdm_c.fg_rx_sock.getsockname()
+
+    def send_packet(cur_time_s):
+        fg_out_sock.sendto(codec.build(dict(random_packet(codec, 0), cur_time_s=cur_time_s)), rx_addr)
+
+    return fg_out_sock, send_packet
+
+
+@pytest.mark.parametrize('codec', ['construct', 'compiled', 'numpy', 'lazy'])
+def test_fdm_rx_batch_callback(codec):
+    if codec == 'numpy':
+        pytest.importorskip('numpy')
+
+    def rx_batch_cb(fdm_batch, event_pipe):
+        event_pipe.child_send([int(fdm_data['cur_time_s']) for fdm_data in fdm_batch])
+        return fdm_batch[-1]
+
+    fdm_c = FDMConnection(24, codec=codec)
+    fdm_c.connect_rx_batch('127.0.0.1', 0, rx_batch_cb, max_batch=16)
+    fg_in_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    fg_in_sock.bind(('127.0.0.1', 0))
+    fg_in_sock.settimeout(1.0)
+    fdm_c.connect_tx(*fg_in_sock.getsockname())
+    fg_out_sock, send_packet = setup_batch_connection(fdm_c)
+
+    for i in range(10):
+        send_packet(i)
+    fdm_c._fg_packet_roundtrip()
+    assert fdm_c.event_pipe.parent_recv() == list(range(10))
+    # Only one packet is sent back per batch
+    assert fdm_struct_v24.parse(fg_in_sock.recv(1024)).cur_time_s == 9
+
+    for sock in (fg_out_sock, fg_in_sock, fdm_c.fg_rx_sock, fdm_c.fg_tx_sock):
+        sock.close()
+
+
+@pytest.mark.parametrize('latest_only', [True, False])
+def test_fdm_rx_batched_single_callback(latest_only):
+    def rx_cb(fdm_data, event_pipe):
+        event_pipe.child_send((fdm_data['cur_time_s'],))
+
+    fdm_c = FDMConnection(24, codec='compiled')
+    fdm_c.connect_rx('127.0.0.1', 0, rx_cb, latest_only=latest_only, max_batch=8)
+    fg_out_sock, send_packet = setup_batch_connection(fdm_c)
+
+    for i in range(20):
+        send_packet(i)
+    fdm_c._fg_packet_roundtrip()
+
+    received = []
+    while fdm_c.event_pipe.parent_poll():
+        (cur_time_s,) = fdm_c.event_pipe.parent_recv()
+        received.append(cur_time_s)
+    if latest_only:
+        assert received == [19]
+        assert fdm_c.rx_dropped_count == 19
+    else:
+        # One batch worth of datagrams, still one callback each
+        assert received == list(range(8))
+        assert fdm_c.rx_dropped_count == 0
+
+    fg_out_sock.close()
+    fdm_c.fg_rx_sock.close()
@@ -0,0 +1,174 @@
+import dill
+from construct import ConstError, Container, ListContainer, RangeError, StreamError
+
+from flightgear_python.fg_codec import StructCodec, TrackedContainer
+from testing_common import all_net_structs, random_packet
+
+import pytest
+
+
+@pytest.mark.parametrize('struct_name', all_net_structs.keys())
+def test_codec_size(struct_name):
+    net_struct = all_net_structs[struct_name]
+    codec = StructCodec(net_struct)
+    assert codec.sizeof() == net_struct.sizeof()
+    last_field = codec.fields[-1]
+    assert last_field.offset + last_field.size == net_struct.sizeof()
+
+
+@pytest.mark.parametrize('seed', range(10))
+@pytest.mark.parametrize('struct_name', all_net_structs.keys())
+def test_codec_matches_construct(struct_name, seed):
+    net_struct = all_net_structs[struct_name]
+    codec = StructCodec(net_struct)
+    packet = random_packet(codec, seed)
+
+    construct_bytes = net_struct.build(packet)
+    assert codec.build(packet) == construct_bytes
+
+    construct_parsed = net_struct.parse(construct_bytes)
+    codec_parsed = codec.parse(construct_bytes)
+    assert codec_parsed == construct_parsed
+    assert list(codec_parsed.keys()) == [k for k in construct_parsed.keys() if k != '_io']
+    assert codec.build(codec_parsed) == construct_bytes
+    # Also works on other buffer types
+    assert codec.parse(memoryview(bytearray(construct_bytes))) == construct_parsed
+
+
+@pytest.mark.parametrize('struct_name', all_net_structs.keys())
+def test_codec_wrong_version(struct_name):
+    net_struct = all_net_structs[struct_name]
+    codec = StructCodec(net_struct)
+    packet_bytes = bytearray(net_struct.build(random_packet(codec, 0)))
+    packet_bytes[0:4] = b'\xff\xff\xff\xff'
+    with pytest.raises(ConstError):
+        codec.parse(packet_bytes)
+
+
+@pytest.mark.parametrize('struct_name', all_net_structs.keys())
+def test_codec_short_packet(struct_name):
+    codec = StructCodec(all_net_structs[struct_name])
+    with pytest.raises(StreamError):
+        codec.parse(b'\0' * (codec.sizeof() - 1))
+
+
+@pytest.mark.parametrize('struct_name', all_net_structs.keys())
+def test_codec_pickle(struct_name):
+    net_struct = all_net_structs[struct_name]
+    codec = StructCodec(net_struct)
+    packet_bytes = net_struct.build(random_packet(codec, 0))
+    unpickled_codec = dill.loads(dill.dumps(codec))
+    assert unpickled_codec.parse(packet_bytes) == codec.parse(packet_bytes)
+
+
+partial_fields = ['lat_rad', 'lon_rad', 'alt_m', 'phi_rad', 'theta_rad', 'psi_rad']
+
+
+@pytest.mark.parametrize('struct_name', ['fdm_v24', 'fdm_v25'])
+def test_codec_partial_fields(struct_name):
+    net_struct = all_net_structs[struct_name]
+    full_codec = StructCodec(net_struct)
+    codec = StructCodec(net_struct, fields=partial_fields)
+    assert codec.is_partial
+    assert not full_codec.is_partial
+    assert codec.sizeof() == net_struct.sizeof()
+
+    packet_bytes = net_struct.build(random_packet(full_codec, 0))
+    parsed = codec.parse(packet_bytes)
+    full_parsed = full_codec.parse(packet_bytes)
+    # The version is always decoded so that it's checked
+    assert list(parsed.keys()) == ['version'] + [k for k in full_parsed.keys() if k in partial_fields]
+    for field_name in partial_fields:
+        assert parsed[field_name] == full_parsed[field_name]
+
+    with pytest.raises(ValueError):
+        codec.build(parsed)  # Nothing to take the other fields from
+    assert codec.build(parsed, base=packet_bytes) == packet_bytes
+    parsed['alt_m'] = 1234.5
+    full_parsed['alt_m'] = 1234.5
+    assert codec.build(parsed, base=packet_bytes) == full_codec.build(full_parsed)
+
+    with pytest.raises(ConstError):
+        codec.parse(bytes(codec.sizeof()))
+    with pytest.raises(StreamError):
+        codec.parse(packet_bytes[:-1])
+
+    unpickled_codec = dill.loads(dill.dumps(codec))
+    assert unpickled_codec.parse(packet_bytes) == codec.parse(packet_bytes)
+    assert unpickled_codec.struct_format == codec.struct_format
+
+
+def test_codec_partial_unknown_field():
+    with pytest.raises(ValueError):
+        StructCodec(all_net_structs['fdm_v24'], fields=['lat_rad', 'not_a_field'])
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('struct_name', all_net_structs.keys())
+def test_codec_patch_modified_fields(struct_name, seed):
+    net_struct = all_net_structs[struct_name]
+    codec = StructCodec(net_struct, track_changes=True)
+    packet_bytes = net_struct.build(random_packet(codec, seed))
+    new_values = random_packet(codec, seed + 100)
+
+    parsed = codec.parse(packet_bytes)
+    assert isinstance(parsed, TrackedContainer)
+    assert parsed.modified_fields == set()
+    assert codec.build(parsed, base=packet_bytes) == packet_bytes
+
+    # A few whole fields, and single array elements
+    names = [name for name in new_values if name != 'version']
+    step = len(names) // 3
+    for name in names[seed::step]:
+        parsed[name] = new_values[name]
+    for field in codec.fields:
+        if field.count is not None:
+            parsed[field.name][seed % field.count] = new_values[field.name][seed % field.count]
+            break
+    assert 0 < len(parsed.modified_fields) <= codec._max_patch_fields
+    assert codec.build(parsed, base=packet_bytes) == net_struct.build(parsed)
+
+    # Lots of changes end up as a full build, same result
+    for name in names:
+        setattr(parsed, name, new_values[name])
+    assert codec.build(parsed, base=packet_bytes) == net_struct.build(new_values)
+
+
+def test_codec_patch_enums_and_array_lengths():
+    net_struct = all_net_structs['ctrls_v27']
+    codec = StructCodec(net_struct, track_changes=True)
+    packet_bytes = net_struct.build(random_packet(codec, 0))
+    parsed = codec.parse(packet_bytes)
+    parsed.master_bat[1] = 'off' if parsed.master_bat[1] == 'on' else 'on'
+    parsed.magnetos.reverse()
+    assert parsed.modified_fields == {'master_bat', 'magnetos'}
+    # Opaque values are compared to how they were decoded instead
+    parsed.freeze.master = not parsed.freeze.master
+    assert codec._modified_names(parsed) == {'master_bat', 'magnetos', 'freeze'}
+    assert codec.build(parsed, base=packet_bytes) == net_struct.build(parsed)
+
+    parsed.throttle.append(1.0)
+    with pytest.raises(RangeError):
+        codec.build(parsed, base=packet_bytes)
+    del parsed['throttle']
+    with pytest.raises(KeyError):
+        codec.build(parsed, base=packet_bytes)
+
+
+def test_codec_patch_needs_source():
+    net_struct = all_net_structs['fdm_v24']
+    codec = StructCodec(net_struct, track_changes=True)
+    packet_bytes = net_struct.build(random_packet(codec, 0))
+    other_bytes = net_struct.build(random_packet(codec, 1))
+    parsed = codec.parse(packet_bytes)
+    parsed.alt_m = 1234.5
+    # Not the packet it was decoded from, so the unmodified fields can't be taken from it
+    assert codec.build(parsed, base=other_bytes) == net_struct.build(parsed)
+
+    # Copies are plain containers
+    unpickled = dill.loads(dill.dumps(parsed))
+    assert type(unpickled) is Container
+    assert type(unpickled.rpm) is ListContainer
+    assert unpickled == parsed
+    assert codec.build(unpickled, base=packet_bytes) == net_struct.build(parsed)
+    assert dill.loads(dill.dumps(codec)).track_changes
@@ -0,0 +1,165 @@
+import socket
+import time
+
+from flightgear_python.fg_if import FDMConnection, FGConnection, GuiConnection
+from flightgear_python.fg_hub import FGConnectionHub
+from flightgear_python.fg_codec import StructCodec
+from flightgear_python.fg_util import FGConnectionError
+from flightgear_python.fdm_v24 import fdm_struct as fdm_struct_v24
+from flightgear_python.gui_v8 import gui_struct as gui_struct_v8
+from testing_common import random_packet
+
+import pytest
+
+
+def rx_cb(data, event_pipe):
+    event_pipe.child_send((data['cur_time_s'],))
+    data['cur_time_s'] = data['cur_time_s'] + 100
+    return data
+
+
+@pytest.mark.parametrize('executor', FDMConnection.supported_executors)
+def test_hub_services_connections(executor):
+    num_connections = 4
+    fg_in_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    fg_in_sock.bind(('127.0.0.1', 0))
+    fg_in_sock.settimeout(2.0)
+    fg_out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    hub = FGConnectionHub(num_workers=2)
+    connections = []
+    for i in range(num_connections):
+        # Mix of structs and receive modes
+        if i % 2:
+            conn = GuiConnection(codec='compiled')
+            conn.connect_rx('127.0.0.1', 0, rx_cb)
+        else:
+            conn = FDMConnection(24)
+            conn.connect_rx('127.0.0.1', 0, rx_cb, latest_only=True)
+        conn.connect_tx(*fg_in_sock.getsockname())
+        hub.add_connection(conn)
+        connections.append(conn)
+    hub.start(executor=executor)
+
+    for i, conn in enumerate(connections):
+        net_struct = gui_struct_v8 if i % 2 else fdm_struct_v24
+        packet = random_packet(StructCodec(net_struct), i)
+        packet['cur_time_s'] = i
+        fg_out_sock.sendto(net_struct.build(packet), conn.fg_rx_sock.getsockname())
+
+    for i, conn in enumerate(connections):
+        assert conn.event_pipe.parent_recv() == (i,)
+    echoed = set()
+    for _ in range(num_connections):
+        tx_msg = fg_in_sock.recv(1024)
+        net_struct = fdm_struct_v24 if len(tx_msg) == fdm_struct_v24.sizeof() else gui_struct_v8
+        echoed.add(net_struct.parse(tx_msg).cur_time_s)
+    assert echoed == {100 + i for i in range(num_connections)}
+
+    time.sleep(hub.poll_interval_s)
+    stats = hub.stats()
+    hub.stop()
+
+    assert [conn_stats.packets for conn_stats in stats.connections] == [1] * num_connections
+    assert all(conn_stats.rate_hz > 0 for conn_stats in stats.connections)
+    assert sum(worker_stats.num_connections for worker_stats in stats.workers) == num_connections
+    for conn_idx, conn_stats in enumerate(stats.connections):
+        assert conn_stats.worker == conn_stats.rx_addr[1] % 2 == hub.worker_of(conn_idx)
+    for worker_stats in stats.workers:
+        assert 0.0 <= worker_stats.utilisation <= 1.0
+
+    # No new packets, so no rate
+    assert all(conn_stats.rate_hz == 0 for conn_stats in hub.stats().connections)
+
+    for sock in [fg_in_sock, fg_out_sock] + [conn.fg_rx_sock for conn in connections]:
+        sock.close()
+
+
+@pytest.mark.parametrize('executor', FGConnection.supported_executors)
+def test_hub_counts_decode_errors(executor):
+    fdm_c = FDMConnection(25)
+    fdm_c.connect_rx('127.0.0.1', 0, rx_cb)
+    hub = FGConnectionHub()
+    hub.add_connection(fdm_c)
+    hub.start(executor=executor)
+
+    fg_out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    # Wrong version
+    fg_out_sock.sendto(
+        fdm_struct_v24.build(random_packet(StructCodec(fdm_struct_v24), 0)), fdm_c.fg_rx_sock.getsockname()
+    )
+    for _ in range(100):
+        if hub.stats().connections[0].errors:
+            break
+        time.sleep(0.01)
+    hub.stop()
+
+    (conn_stats,) = hub.stats().connections
+    assert conn_stats.errors == 1
+    assert conn_stats.last_error.startswith('FGCommunicationError: ')
+    assert conn_stats.packets == 0
+
+    fg_out_sock.close()
+    fdm_c.fg_rx_sock.close()
+
+
+def test_hub_misuse():
+    hub = FGConnectionHub()
+    with pytest.raises(FGConnectionError):
+        hub.add_connection(FDMConnection(24))  # Not connected
+    with pytest.raises(FGConnectionError):
+        hub.stats()  # Not started
+    with pytest.raises(ValueError):
+        hub.start(executor='fiber')
+    with pytest.raises(ValueError):
+        FGConnectionHub(num_workers=0)
+
+
+def raising_cb(data, event_pipe):
+    raise RuntimeError('Bug in the callback')
+
+
+def test_hub_survives_bad_datagrams_and_callbacks():
+    # Both connections on the same worker
+    bad_c = FDMConnection(24)
+    bad_c.connect_rx('127.0.0.1', 0, rx_cb)
+    raising_c = FDMConnection(24)
+    raising_c.connect_rx('127.0.0.1', 0, raising_cb)
+    good_c = FDMConnection(24)
+    good_c.connect_rx('127.0.0.1', 0, rx_cb)
+    hub = FGConnectionHub(num_workers=1)
+    for conn in [bad_c, raising_c, good_c]:
+        hub.add_connection(conn)
+    hub.start(executor='thread')
+
+    fg_out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    packet = fdm_struct_v24.build(random_packet(StructCodec(fdm_struct_v24), 0))
+    fg_out_sock.sendto(packet[:10], bad_c.fg_rx_sock.getsockname())  # Truncated
+    fg_out_sock.sendto(b'garbage', bad_c.fg_rx_sock.getsockname())
+    fg_out_sock.sendto(packet, raising_c.fg_rx_sock.getsockname())
+    for _ in range(100):
+        if sum(conn_stats.errors for conn_stats in hub.stats().connections) == 3:
+            break
+        time.sleep(0.01)
+    # The other connection on the worker keeps receiving
+    for _ in range(3):
+        fg_out_sock.sendto(packet, good_c.fg_rx_sock.getsockname())
+        good_c.event_pipe.parent_recv()
+    for _ in range(100):
+        # Counted after the callback returns
+        stats = hub.stats()
+        if stats.connections[2].packets == 3:
+            break
+        time.sleep(0.01)
+    assert all(worker.is_alive() for worker in hub.workers)
+    hub.stop()
+
+    assert [conn_stats.errors for conn_stats in stats.connections] == [2, 1, 0]
+    assert stats.connections[0].last_error.startswith('FGCommunicationError: ')  # Garbage came last
+    assert stats.connections[1].last_error.startswith('RuntimeError: Bug in the callback (test_connection_hub.py:')
+    assert stats.connections[2].last_error == ''
+    assert [conn_stats.packets for conn_stats in stats.connections] == [0, 0, 3]
+
+    fg_out_sock.close()
+    for conn in [bad_c, raising_c, good_c]:
+        conn.fg_rx_sock.close()
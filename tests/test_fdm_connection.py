@@ -1,6 +1,11 @@
+import socket
+
 from flightgear_python.fg_if import FDMConnection
 from flightgear_python.fg_util import FGConnectionError
-from testing_common import supported_fdm_versions
+from flightgear_python.fg_codec import StructCodec
+from flightgear_python.fdm_v24 import fdm_struct as fdm_struct_v24
+from flightgear_python.fdm_v25 import fdm_struct as fdm_struct_v25
+from testing_common import supported_fdm_versions, random_packet
 
 import pytest
 
@@ -21,13 +26,14 @@ def test_fdm_length(mocker, fdm_version):
 
 def setup_fdm_mock(mocker, version: int, struct_length: int):
     # this is mocking what flightgear will send
-    def mock_socket_recvfrom(self, buflen):
+    def mock_socket_recvfrom_into(self, buffer):
         # big endian
         data = bytes([0, 0, 0, version])
         while len(data) < struct_length:
             data += b'\0'
+        buffer[: len(data)] = data
         ret_addr = ('localhost', 12345)
-        return data, ret_addr
+        return len(data), ret_addr
 
     # this is mocking what flightgear will receive
     def mock_socket_sendto(self, tx_bytes, addr):
@@ -36,13 +42,14 @@ def setup_fdm_mock(mocker, version: int, struct_length: int):
     def mock_socket_bind(self, addr):
         pass
 
-    mocker.patch('socket.socket.recvfrom', mock_socket_recvfrom)
+    mocker.patch('socket.socket.recvfrom_into', mock_socket_recvfrom_into)
     mocker.patch('socket.socket.sendto', mock_socket_sendto)
     mocker.patch('socket.socket.bind', mock_socket_bind)
 
 
+@pytest.mark.parametrize('codec', ['construct', 'compiled', 'numpy', 'lazy'])
 @pytest.mark.parametrize('fdm_version', supported_fdm_versions)
-def test_fdm_rx_and_tx(mocker, fdm_version):
+def test_fdm_rx_and_tx(mocker, fdm_version, codec):
     if fdm_version is None:
         pytest.skip('Can\'t generate mocks for auto version')
 
@@ -57,7 +64,7 @@ def test_fdm_rx_and_tx(mocker, fdm_version):
         )
         return fdm_data
 
-    fdm_c = FDMConnection(fdm_version)
+    fdm_c = FDMConnection(fdm_version, codec=codec)
 
     setup_fdm_mock(mocker, fdm_version, fdm_c.fg_net_struct.sizeof())
 
@@ -107,6 +114,11 @@ def test_fdm_wrong_version_on_create():
         FDMConnection(fdm_version=1)
 
 
+def test_fdm_unknown_codec_on_create():
+    with pytest.raises(ValueError):
+        FDMConnection(fdm_version=24, codec='not_a_codec')
+
+
 @pytest.mark.parametrize('fdm_version', supported_fdm_versions)
 def test_fdm_bad_port(mocker, fdm_version):
     def mock_bind(addr):
@@ -128,3 +140,188 @@ def test_fdm_rx_timeout(mocker, fdm_version):
     fdm_c.connect_rx('localhost', 9999, lambda data, pipe: data)
     with pytest.raises(FGConnectionError, match='[Tt]imeout'):
         fdm_c._fg_packet_roundtrip()
+
+
+@pytest.mark.parametrize('fdm_version', supported_fdm_versions)
+def test_fdm_latest_only(fdm_version):
+    def rx_cb(fdm_data, event_pipe):
+        event_pipe.child_send((fdm_data['cur_time_s'],))
+
+    fdm_c = FDMConnection(fdm_version, codec='compiled')
+    fdm_c.connect_rx('127.0.0.1', 0, rx_cb, latest_only=True)
+    rx_addr = fdm_c.fg_rx_sock.getsockname()
+    fg_out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    # Auto-version will just detect what we send
+    send_codec = StructCodec(fdm_struct_v25 if fdm_version == 25 else fdm_struct_v24)
+
+    def send_packet(cur_time_s):
+        fg_out_sock.sendto(send_codec.build(dict(random_packet(send_codec, 0), cur_time_s=cur_time_s)), rx_addr)
+
+    for i in range(5):
+        send_packet(i)
+    fdm_c._fg_packet_roundtrip()
+    (cur_time_s,) = fdm_c.event_pipe.parent_recv()
+    assert cur_time_s == 4
+    assert fdm_c.rx_dropped_count == 4
+
+    # Nothing queued up, nothing dropped
+    send_packet(5)
+    fdm_c._fg_packet_roundtrip()
+    (cur_time_s,) = fdm_c.event_pipe.parent_recv()
+    assert cur_time_s == 5
+    assert fdm_c.rx_dropped_count == 4
+
+    fg_out_sock.close()
+    fdm_c.fg_rx_sock.close()
+
+
+@pytest.mark.timeout(3)  # If this fails don't wait a long time
+def test_fdm_latest_only_rx_timeout():
+    fdm_c = FDMConnection(24, rx_timeout_s=0.1)
+    fdm_c.connect_rx('localhost', 9999, lambda data, pipe: data, latest_only=True)
+    with pytest.raises(FGConnectionError, match='[Tt]imeout'):
+        fdm_c._fg_packet_roundtrip()
+    fdm_c.fg_rx_sock.close()
+
+
+@pytest.mark.timeout(5)
+@pytest.mark.parametrize('executor', ['thread', 'process'])
+def test_fdm_start_stop_executor(executor):
+    def rx_cb(fdm_data, event_pipe):
+        event_pipe.child_send((fdm_data['cur_time_s'],))
+
+    fdm_c = FDMConnection(24, rx_timeout_s=0.5, codec='compiled')
+    fdm_c.connect_rx('127.0.0.1', 0, rx_cb)
+    fg_out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    send_codec = StructCodec(fdm_struct_v24)
+
+    rx_addr = fdm_c.fg_rx_sock.getsockname()
+
+    fdm_c.start(executor=executor)
+    for i in range(5):
+        fg_out_sock.sendto(send_codec.build(dict(random_packet(send_codec, 0), cur_time_s=i)), rx_addr)
+        (cur_time_s,) = fdm_c.event_pipe.parent_recv()
+        assert cur_time_s == i
+    fdm_c.stop()
+    assert fdm_c.rx_thread is None and fdm_c.rx_proc is None
+
+    fg_out_sock.close()
+    fdm_c.fg_rx_sock.close()
+
+
+def test_fdm_unknown_executor():
+    fdm_c = FDMConnection(24)
+    with pytest.raises(ValueError):
+        fdm_c.start(executor='not_an_executor')
+
+
+def test_fdm_manual_step():
+    def rx_cb(fdm_data, event_pipe):
+        event_pipe.child_send((fdm_data['cur_time_s'],))
+
+    fdm_c = FDMConnection(24, codec='compiled')
+    fdm_c.connect_rx('127.0.0.1', 0, rx_cb)
+    fg_out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    send_codec = StructCodec(fdm_struct_v24)
+
+    rx_addr = fdm_c.fg_rx_sock.getsockname()
+
+    assert fdm_c.step(block=False) is False
+    fg_out_sock.sendto(send_codec.build(dict(random_packet(send_codec, 0), cur_time_s=3)), rx_addr)
+    assert fdm_c.step() is True
+    assert fdm_c.event_pipe.parent_recv() == (3,)
+
+    fg_out_sock.close()
+    fdm_c.fg_rx_sock.close()
+
+
+def test_fdm_manual_step_nothing_handled(mocker):
+    fdm_c = FDMConnection(24)
+    fdm_c.connect_rx('127.0.0.1', 0, lambda fdm_data, event_pipe: None)
+    fg_out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    send_codec = StructCodec(fdm_struct_v24)
+
+    # The socket is readable, but the receive comes back empty (i.e. a spurious wakeup)
+    fg_out_sock.sendto(send_codec.build(random_packet(send_codec, 0)), fdm_c.fg_rx_sock.getsockname())
+    mocker.patch.object(fdm_c, '_fg_recv', return_value=None)
+    assert fdm_c.step(block=False) is False
+    assert fdm_c.step() is False
+
+    fg_out_sock.close()
+    fdm_c.fg_rx_sock.close()
+
+
+@pytest.mark.parametrize('codec', ['construct', 'compiled'])
+@pytest.mark.parametrize('fdm_version', supported_fdm_versions)
+def test_fdm_selected_fields(fdm_version, codec):
+    def rx_cb(fdm_data, event_pipe):
+        event_pipe.child_send((sorted(fdm_data.keys()), fdm_data.lat_rad))
+        fdm_data.alt_m = 1234.5
+        return fdm_data
+
+    fdm_c = FDMConnection(fdm_version, codec=codec, fields=['lat_rad', 'alt_m'])
+    fdm_c.connect_rx('127.0.0.1', 0, rx_cb)
+    fg_in_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    fg_in_sock.bind(('127.0.0.1', 0))
+    fg_in_sock.settimeout(1.0)
+    fdm_c.connect_tx(*fg_in_sock.getsockname())
+    fg_out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    net_struct = fdm_struct_v24 if fdm_version == 24 else fdm_struct_v25
+    packet = random_packet(StructCodec(net_struct), 0)
+    fg_out_sock.sendto(net_struct.build(packet), fdm_c.fg_rx_sock.getsockname())
+    fdm_c._fg_packet_roundtrip()
+
+    field_names, lat_rad = fdm_c.event_pipe.parent_recv()
+    assert field_names == ['alt_m', 'lat_rad', 'version']
+    # Radian correction is only applied to the decoded fields
+    assert lat_rad != packet['lat_rad']
+    # Everything that wasn't decoded is sent back untouched
+    expected = dict(packet, alt_m=1234.5, lat_rad=lat_rad)
+    assert fg_in_sock.recv(1024) == net_struct.build(expected)
+
+    for sock in (fg_out_sock, fg_in_sock, fdm_c.fg_rx_sock, fdm_c.fg_tx_sock):
+        sock.close()
+
+
+def test_fdm_selected_fields_on_create():
+    with pytest.raises(ValueError):
+        FDMConnection(fdm_version=24, fields=['not_a_field'])
+    with pytest.raises(ValueError):
+        FDMConnection(fields=['not_a_field'])  # Checked against all the versions
+    with pytest.raises(ValueError):
+        FDMConnection(fdm_version=24, codec='numpy', fields=['lat_rad'])
+
+
+def test_fdm_tx_patches_modified_fields():
+    kept = []
+
+    def rx_cb(fdm_data, event_pipe):
+        if not kept:
+            kept.append(fdm_data)  # Sent back on the next packet
+            fdm_data.alt_m = 1234.5
+            return fdm_data
+        return kept[0]
+
+    fdm_c = FDMConnection(24, codec='compiled')
+    fdm_c.connect_rx('127.0.0.1', 0, rx_cb)
+    fg_in_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    fg_in_sock.bind(('127.0.0.1', 0))
+    fg_in_sock.settimeout(1.0)
+    fdm_c.connect_tx(*fg_in_sock.getsockname())
+    fg_out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    packets = [random_packet(StructCodec(fdm_struct_v24), seed) for seed in range(2)]
+    for packet in packets:
+        fg_out_sock.sendto(fdm_struct_v24.build(packet), fdm_c.fg_rx_sock.getsockname())
+        fdm_c._fg_packet_roundtrip()
+    # Radian correction counts as a modification
+    first = fdm_struct_v24.parse(fg_in_sock.recv(1024))
+    assert first.alt_m == 1234.5
+    assert first.lat_rad != packets[0]['lat_rad']
+    assert first.cur_time_s == packets[0]['cur_time_s']
+    # The kept packet's buffer was reused by the second packet, so it's fully built
+    assert fg_in_sock.recv(1024) == fdm_struct_v24.build(kept[0])
+
+    for sock in (fg_out_sock, fg_in_sock, fdm_c.fg_rx_sock, fdm_c.fg_tx_sock):
+        sock.close()
@@ -85,3 +85,72 @@ def test_http_set_prop_must_be_absolute():
         m.post(h_con.url + prop_path)
         with pytest.raises(ValueError):
             h_con.set_prop(prop_path, 'test value')
+
+
+def json_dir(path, children=None, n_children=None):
+    node = {'path': path, 'name': path.rsplit('/', 1)[-1], 'type': 'none', 'index': 0}
+    if children is not None:
+        node['children'] = children
+    node['nChildren'] = len(children) if n_children is None else n_children
+    return node
+
+
+def json_value(path, value, type_str='double'):
+    return {'path': path, 'name': path.rsplit('/', 1)[-1], 'value': value, 'type': type_str, 'index': 0, 'nChildren': 0}
+
+
+sun_tree = json_dir(
+    '/ephemeris/sun',
+    [
+        json_dir('/ephemeris/sun/local', [json_value('/ephemeris/sun/local/ra-deg', '1.5')]),
+        json_value('/ephemeris/sun/az-deg', '123.25'),
+        json_value('/ephemeris/sun/count', '3', 'int'),
+    ],
+)
+
+
+@pytest.mark.parametrize(
+    'recurse_limit, expected',
+    [
+        (
+            0,
+            {
+                'directories': ['/ephemeris/sun/local'],
+                'properties': {'/ephemeris/sun/az-deg': 123.25, '/ephemeris/sun/count': 3},
+            },
+        ),
+        (
+            None,
+            {
+                'directories': [],
+                'properties': {
+                    '/ephemeris/sun/local/ra-deg': 1.5,
+                    '/ephemeris/sun/az-deg': 123.25,
+                    '/ephemeris/sun/count': 3,
+                },
+            },
+        ),
+    ],
+)
+def test_http_list_props_one_request(recurse_limit, expected):
+    h_con = HTTPConnection('localhost', 55555)
+    with requests_mock.Mocker() as m:
+        m.get(h_con.url + '/ephemeris/sun', json=sun_tree)
+        assert h_con.list_props('/ephemeris/sun/', recurse_limit=recurse_limit) == expected
+        assert m.call_count == 1
+        expected_depth = h_con.max_json_depth if recurse_limit is None else recurse_limit + 1
+        assert m.request_history[0].qs == {'d': [str(expected_depth)]}
+
+
+def test_http_list_props_deeper_than_fetched():
+    # Only one level per request, like an FG that doesn't know about depth
+    h_con = HTTPConnection('localhost', 55555)
+    local_truncated = json_dir('/ephemeris/sun/local', n_children=1)
+    with requests_mock.Mocker() as m:
+        m.get(h_con.url + '/ephemeris/sun', json=json_dir('/ephemeris/sun', [local_truncated]))
+        m.get(h_con.url + '/ephemeris/sun/local', json=sun_tree['children'][0])
+        assert h_con.list_props('/ephemeris/sun', recurse_limit=1) == {
+            'directories': [],
+            'properties': {'/ephemeris/sun/local/ra-deg': 1.5},
+        }
+        assert [request.qs for request in m.request_history] == [{'d': ['2']}, {'d': ['1']}]
@@ -0,0 +1,66 @@
+from flightgear_python.fg_if import FDMConnection, GuiConnection
+from flightgear_python.fg_latency import LoopbackFG
+from flightgear_python.fdm_v24 import fdm_struct as fdm_struct_v24
+from flightgear_python.gui_v8 import gui_struct as gui_struct_v8
+
+import pytest
+
+
+def echo_cb(data, event_pipe):
+    data['alt_m'] = 100.0  # Anything but the tag can be changed
+    return data
+
+
+def tag_changing_cb(data, event_pipe):
+    data['cur_time_s'] = 0
+    return data
+
+
+@pytest.mark.parametrize('codec', ['construct', 'lazy'])
+def test_loopback_round_trip(codec):
+    loopback = LoopbackFG(fdm_struct_v24, rate_hz=500)
+    fdm_c = FDMConnection(24, rx_timeout_s=0.1, codec=codec)
+    fdm_c.connect_rx('127.0.0.1', 0, echo_cb)
+    fdm_c.connect_tx(*loopback.tx_addr)
+    fdm_c.start(executor='thread')
+
+    stats = loopback.run(fdm_c.fg_rx_sock.getsockname(), num_packets=50)
+    fdm_c.stop()
+    assert stats.sent == stats.received == len(stats.latencies_us) == 50
+    assert stats.lost == stats.unmatched == 0
+    assert 0 < stats.p50_us <= stats.p90_us <= stats.p99_us <= stats.max_us
+    assert stats.max_us == max(stats.latencies_us)
+
+    loopback.close()
+    fdm_c.fg_rx_sock.close()
+
+
+@pytest.mark.parametrize('rx_cb', [tag_changing_cb, lambda data, event_pipe: None])
+def test_loopback_lost_replies(rx_cb):
+    loopback = LoopbackFG(fdm_struct_v24, rate_hz=1000)
+    fdm_c = FDMConnection(24, rx_timeout_s=0.1)
+    fdm_c.connect_rx('127.0.0.1', 0, rx_cb)
+    fdm_c.connect_tx(*loopback.tx_addr)
+    fdm_c.start(executor='thread')
+
+    stats = loopback.run(fdm_c.fg_rx_sock.getsockname(), num_packets=10, timeout_s=0.1)
+    fdm_c.stop()
+    assert stats.sent == stats.lost == 10
+    assert stats.received == 0
+    assert stats.unmatched == (10 if rx_cb is tag_changing_cb else 0)
+
+    loopback.close()
+    fdm_c.fg_rx_sock.close()
+
+
+def test_loopback_other_struct():
+    loopback = LoopbackFG(gui_struct_v8, rate_hz=1000, tag_field='cur_time_s')
+    gui_c = GuiConnection(8, rx_timeout_s=0.1)
+    gui_c.connect_rx('127.0.0.1', 0, lambda data, event_pipe: data)
+    gui_c.connect_tx(*loopback.tx_addr)
+    gui_c.start(executor='thread')
+    assert loopback.run(gui_c.fg_rx_sock.getsockname(), num_packets=10).received == 10
+    gui_c.stop()
+
+    loopback.close()
+    gui_c.fg_rx_sock.close()
@@ -0,0 +1,100 @@
+import socket
+
+import dill
+import multiprocess as mp
+
+from flightgear_python.fg_if import FDMConnection
+from flightgear_python.fg_codec import StructCodec
+from flightgear_python.fdm_v24 import fdm_struct as fdm_struct_v24
+from flightgear_python.general_util import LatestValueChannel, LatestValueEventPipe
+from testing_common import random_packet
+
+import pytest
+
+
+def test_channel_read_write():
+    channel = LatestValueChannel('dI')
+    assert channel.read() == (0, None)
+    assert channel.sequence == 0
+    channel.write((1.5, 2))
+    channel.write((2.5, 3))
+    assert channel.read() == (2, (2.5, 3))
+    assert channel.sequence == 2
+
+    with pytest.raises(Exception):
+        channel.write(('not a number', 3))
+    # A failed write doesn't touch the shared value
+    assert channel.read() == (2, (2.5, 3))
+
+    unpickled_channel = dill.loads(dill.dumps(channel))
+    unpickled_channel.write((4.5, 5))
+    assert channel.read() == (3, (4.5, 5))
+
+
+def writer_proc(channel, count):
+    for i in range(1, count + 1):
+        channel.write((i, float(i), -i))
+
+
+def test_channel_concurrent_reads_are_consistent():
+    count = 20000
+    channel = LatestValueChannel('qdq')
+    proc = mp.Process(target=writer_proc, args=(channel, count))
+    proc.start()
+
+    last_seq = 0
+    while last_seq < count:
+        seq, values = channel.read()
+        assert seq >= last_seq
+        if values is not None:
+            # Never a mix of two writes
+            assert values == (values[0], float(values[0]), -values[0])
+            assert values[0] == seq
+        last_seq = seq
+    proc.join()
+    assert channel.read() == (count, (count, float(count), -count))
+
+
+def test_event_pipe_adapter_parent_direction():
+    event_pipe = LatestValueEventPipe('d')
+    assert not event_pipe.parent_poll()
+    assert not event_pipe.parent_poll(timeout=0.01)
+    event_pipe.child_send((1.0,))
+    event_pipe.child_send((2.0,))
+    assert event_pipe.parent_poll()
+    assert event_pipe.parent_recv() == (2.0,)  # Only the newest
+    assert not event_pipe.parent_poll()
+
+    # Parent to child still goes through the regular pipe
+    event_pipe.parent_send('hello')
+    assert event_pipe.is_set()
+    assert event_pipe.child_recv() == 'hello'
+    assert not event_pipe.is_set()
+
+
+def test_event_pipe_adapter_with_connection():
+    def rx_cb(fdm_data, event_pipe):
+        event_pipe.child_send((fdm_data.cur_time_s, fdm_data.alt_m))
+
+    fdm_c = FDMConnection(24)
+    fdm_c.event_pipe = LatestValueEventPipe('Id')
+    fdm_event_pipe = fdm_c.connect_rx('127.0.0.1', 0, rx_cb)
+    assert fdm_event_pipe is fdm_c.event_pipe
+    rx_addr = fdm_c.fg_rx_sock.getsockname()
+    fdm_c.start()
+
+    fg_out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    codec = StructCodec(fdm_struct_v24)
+    packet = random_packet(codec, 0)
+    for i in range(5):
+        fg_out_sock.sendto(codec.build(dict(packet, cur_time_s=i, alt_m=i * 10.0)), rx_addr)
+    last_time_s = -1
+    while last_time_s < 4:
+        cur_time_s, alt_m = fdm_event_pipe.parent_recv()
+        assert cur_time_s > last_time_s
+        assert alt_m == cur_time_s * 10.0
+        last_time_s = cur_time_s
+
+    fdm_c.stop()
+    fg_out_sock.close()
+    fdm_c.fg_rx_sock.close()
@@ -0,0 +1,123 @@
+import socket
+
+import dill
+from construct import ConstError, Container, StreamError
+
+from flightgear_python.fg_if import FDMConnection
+from flightgear_python.fg_codec import StructCodec, LazyStructCodec
+from flightgear_python.fg_util import fix_fg_radian
+from flightgear_python.fdm_v25 import fdm_struct as fdm_struct_v25
+from testing_common import all_net_structs, random_packet
+
+import pytest
+
+
+@pytest.mark.parametrize('struct_name', all_net_structs.keys())
+def test_lazy_matches_codec(struct_name):
+    net_struct = all_net_structs[struct_name]
+    codec = StructCodec(net_struct)
+    lazy_codec = LazyStructCodec(net_struct)
+    packet_bytes = net_struct.build(random_packet(codec, 0))
+
+    parsed = lazy_codec.parse(packet_bytes)
+    assert len(parsed._values) == 0  # Nothing decoded yet
+    assert 'version' in parsed
+    assert 'not_a_field' not in parsed
+    assert len(parsed._values) == 0
+    codec_parsed = codec.parse(packet_bytes)
+    assert parsed == codec_parsed
+    assert list(parsed.keys()) == [field.name for field in codec.fields]
+    assert lazy_codec.build(parsed) == packet_bytes
+    assert lazy_codec.build(codec.parse(packet_bytes)) == packet_bytes
+
+    unpickled = dill.loads(dill.dumps(parsed))
+    assert type(unpickled) is Container
+    assert unpickled == codec_parsed
+    assert dill.loads(dill.dumps(lazy_codec)).parse(packet_bytes) == parsed
+
+
+def test_lazy_read_write():
+    codec = StructCodec(fdm_struct_v25)
+    lazy_codec = LazyStructCodec(fdm_struct_v25)
+    packet_buffer = bytearray(fdm_struct_v25.build(random_packet(codec, 0)))
+    packet = codec.parse(packet_buffer)  # Floats are rounded
+
+    parsed = lazy_codec.parse(packet_buffer)
+    assert parsed.alt_m == packet['alt_m']
+    assert parsed['phi_rad'] == packet['phi_rad']
+    assert set(parsed._values) == {'alt_m', 'phi_rad'}
+
+    parsed.alt_m = parsed.alt_m + 0.5
+    parsed['phi_rad'] = 0.25
+    parsed.rpm[1] = 1234.0  # In-place
+    parsed.eng_state[0] = 'running'
+    # The packet was copied, so the buffer can be reused
+    packet_buffer[:] = bytes(len(packet_buffer))
+    expected = dict(packet, alt_m=packet['alt_m'] + 0.5, phi_rad=0.25)
+    expected['rpm'][1] = 1234.0
+    expected['eng_state'][0] = 'running'
+    assert lazy_codec.build(parsed) == fdm_struct_v25.build(expected)
+
+    with pytest.raises(AttributeError):
+        parsed.not_a_field
+    with pytest.raises(AttributeError):
+        parsed.not_a_field = 1
+    with pytest.raises(TypeError):
+        del parsed['alt_m']
+
+
+def test_lazy_corrections():
+    codec = StructCodec(fdm_struct_v25)
+    lazy_codec = LazyStructCodec(fdm_struct_v25, corrections={'lat_rad': fix_fg_radian, 'lon_rad': fix_fg_radian})
+    packet_bytes = fdm_struct_v25.build(random_packet(codec, 0))
+    packet = codec.parse(packet_bytes)
+
+    parsed = lazy_codec.parse(packet_bytes)
+    assert parsed.lat_rad == fix_fg_radian(packet['lat_rad'])
+    assert parsed.lat_rad == parsed.lat_rad  # Only corrected once
+    # Corrected fields are sent back corrected, even if they weren't read
+    expected = dict(packet, lat_rad=fix_fg_radian(packet['lat_rad']), lon_rad=fix_fg_radian(packet['lon_rad']))
+    assert lazy_codec.build(parsed) == fdm_struct_v25.build(expected)
+
+    with pytest.raises(ValueError):
+        LazyStructCodec(fdm_struct_v25, corrections={'not_a_field': fix_fg_radian})
+
+
+def test_lazy_bad_packets():
+    lazy_codec = LazyStructCodec(fdm_struct_v25)
+    with pytest.raises(ConstError):
+        lazy_codec.parse(bytes(lazy_codec.sizeof()))
+    with pytest.raises(StreamError):
+        lazy_codec.parse(fdm_struct_v25.build(random_packet(lazy_codec, 0))[:-1])
+
+
+def test_lazy_matches_compiled_connection():
+    # Same callback as examples/simple_fdm.py
+    def rx_cb(fdm_data, event_pipe):
+        fdm_data['phi_rad'] = 0.5
+        fdm_data.alt_m = fdm_data.alt_m + 0.5
+        return fdm_data
+
+    packet_bytes = fdm_struct_v25.build(random_packet(StructCodec(fdm_struct_v25), 0))
+    fg_in_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    fg_in_sock.bind(('127.0.0.1', 0))
+    fg_in_sock.settimeout(1.0)
+    fg_out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    tx_msgs = []
+    for codec in ['compiled', 'lazy']:
+        fdm_c = FDMConnection(25, codec=codec)
+        fdm_c.connect_rx('127.0.0.1', 0, rx_cb)
+        fdm_c.connect_tx(*fg_in_sock.getsockname())
+        fg_out_sock.sendto(packet_bytes, fdm_c.fg_rx_sock.getsockname())
+        fdm_c._fg_packet_roundtrip()
+        tx_msgs.append(fg_in_sock.recv(1024))
+        fdm_c.fg_rx_sock.close()
+        fdm_c.fg_tx_sock.close()
+    assert tx_msgs[0] == tx_msgs[1]
+
+    with pytest.raises(ValueError):
+        FDMConnection(25, codec='lazy', fields=['alt_m'])
+
+    fg_in_sock.close()
+    fg_out_sock.close()
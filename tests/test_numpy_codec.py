@@ -0,0 +1,115 @@
+import socket
+
+from construct import ConstError, StreamError
+
+from flightgear_python.fg_if import FDMConnection, GuiConnection
+from flightgear_python.fg_codec import StructCodec, NumpyStructCodec
+from flightgear_python.fdm_v24 import fdm_struct as fdm_struct_v24
+from flightgear_python.fdm_v25 import fdm_struct as fdm_struct_v25
+from flightgear_python.ctrls_v27 import ctrls_struct as ctrls_struct_v27
+from flightgear_python.gui_v8 import gui_struct as gui_struct_v8
+from testing_common import all_net_structs, random_packet
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+
+def plain_value(value):
+    # Enums are just their integer value in numpy
+    return int(value) if isinstance(value, str) else value
+
+
+@pytest.mark.parametrize('struct_name', all_net_structs.keys())
+def test_numpy_dtype_matches_struct(struct_name):
+    net_struct = all_net_structs[struct_name]
+    codec = NumpyStructCodec(net_struct)
+    assert codec.dtype.itemsize == net_struct.sizeof()
+
+    packet_bytes = net_struct.build(random_packet(StructCodec(net_struct), 0))
+    construct_parsed = net_struct.parse(packet_bytes)
+    record = codec.parse(packet_bytes)
+    for field in codec.fields:
+        if field.fmt[-1] == 's':
+            # Padding and opaque fields are raw bytes
+            field_start = field.offset
+            field_end = field_start + field.size
+            assert record[field.name].tobytes() == packet_bytes[field_start:field_end]
+        elif field.count is None:
+            assert record[field.name] == plain_value(construct_parsed[field.name])
+        else:
+            assert list(record[field.name]) == [plain_value(v) for v in construct_parsed[field.name]]
+    assert codec.build(record) == packet_bytes
+
+
+@pytest.mark.parametrize(
+    'net_struct, byte_order',
+    [
+        (fdm_struct_v24, '>'),
+        (fdm_struct_v25, '>'),
+        (ctrls_struct_v27, '>'),
+        (gui_struct_v8, '<'),
+    ],
+)
+def test_numpy_byte_order(net_struct, byte_order):
+    codec = NumpyStructCodec(net_struct)
+    for field_dtype, _ in codec.dtype.fields.values():
+        if field_dtype.subdtype is not None:
+            field_dtype = field_dtype.subdtype[0]
+        if field_dtype.kind != 'V':
+            assert field_dtype.str[0] == byte_order
+
+
+def test_numpy_view_is_zero_copy():
+    codec = NumpyStructCodec(fdm_struct_v24)
+    packet_buffer = bytearray(fdm_struct_v24.build(random_packet(StructCodec(fdm_struct_v24), 0)))
+    record = codec.parse(packet_buffer)
+    record.alt_m = 1234.5
+    record.rpm[2] = 99.0
+    reparsed = fdm_struct_v24.parse(packet_buffer)
+    assert reparsed.alt_m == 1234.5
+    assert reparsed.rpm[2] == 99.0
+
+
+def test_numpy_wrong_version_and_length():
+    codec = NumpyStructCodec(fdm_struct_v25)
+    with pytest.raises(StreamError):
+        codec.parse(bytes(10))
+    with pytest.raises(ConstError):
+        codec.parse(bytes(codec.sizeof()))
+
+
+@pytest.mark.parametrize('conn_cls, net_struct', [(FDMConnection, fdm_struct_v25), (GuiConnection, gui_struct_v8)])
+def test_numpy_connection_loopback(conn_cls, net_struct):
+    def rx_cb(data, event_pipe):
+        event_pipe.child_send((type(data).__name__, float(data.lat_rad), float(data['cur_time_s'])))
+        data.cur_time_s = 42
+        return data
+
+    conn = conn_cls(codec='numpy')
+    conn.connect_rx('127.0.0.1', 0, rx_cb)
+    rx_addr = conn.fg_rx_sock.getsockname()
+
+    fg_out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    fg_in_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    fg_in_sock.bind(('127.0.0.1', 0))
+    fg_in_sock.settimeout(2.0)
+    conn.connect_tx(*fg_in_sock.getsockname())
+
+    packet = random_packet(StructCodec(net_struct), 0)
+    packet['cur_time_s'] = 7
+    fg_out_sock.sendto(net_struct.build(packet), rx_addr)
+    conn._fg_packet_roundtrip()
+
+    type_name, lat_rad, cur_time_s = conn.event_pipe.parent_recv()
+    assert type_name == 'record'
+    if conn_cls is FDMConnection:
+        # Radian correction is applied in-place
+        assert lat_rad != packet['lat_rad']
+    assert cur_time_s == 7
+
+    tx_msg = fg_in_sock.recv(1024)
+    assert net_struct.parse(tx_msg).cur_time_s == 42
+
+    for sock in (fg_out_sock, fg_in_sock, conn.fg_rx_sock, conn.fg_tx_sock):
+        sock.close()
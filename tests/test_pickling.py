@@ -38,3 +38,12 @@ def test_pickle_gui(gui_version):
         dill.dumps(gui_c.fg_net_struct)
     except dill.PicklingError as e:
         raise Failed(f'Failed to pickle Gui fg_net_struct: {e}') from None
+
+
+@pytest.mark.parametrize('fdm_version', supported_fdm_versions)
+def test_pickle_fdm_compiled_codec(fdm_version):
+    fdm_c = FDMConnection(fdm_version, codec='compiled')
+    try:
+        dill.dumps(fdm_c.fg_net_codec)
+    except dill.PicklingError as e:
+        raise Failed(f'Failed to pickle FDM fg_net_codec: {e}') from None
@@ -0,0 +1,270 @@
+import os
+import socket
+import time
+
+from flightgear_python.fg_if import FDMConnection, GuiConnection
+from flightgear_python.fg_codec import StructCodec
+from flightgear_python.fg_record import PacketLog, PacketRecorder, PacketReplayer, export_columns, read_columns
+from flightgear_python.fg_util import FGConnectionError, fix_fg_radian_parsing
+from flightgear_python.fdm_v24 import fdm_struct as fdm_struct_v24
+from flightgear_python.fdm_v25 import fdm_struct as fdm_struct_v25
+from flightgear_python.ctrls_v27 import ctrls_struct as ctrls_struct_v27
+from flightgear_python.gui_v8 import gui_struct as gui_struct_v8
+from testing_common import random_packet
+
+import pytest
+
+
+def record_packets(path, count, index_interval):
+    with PacketRecorder(path, stream_name='Test', index_interval=index_interval, flush_every=3) as recorder:
+        for i in range(count):
+            # A couple of records share a timestamp
+            assert recorder.write(i.to_bytes(4, 'little') * 2, monotonic_ns=1000 + (i // 2) * 10, wall_ns=i)
+        assert not recorder.write(b'too long for the log')
+        assert recorder.bad_size_count == 1
+        assert recorder.record_count == count
+
+
+@pytest.mark.parametrize('with_index', [True, False])
+def test_record_and_seek(tmp_path, with_index):
+    path = tmp_path / 'packets.fglog'
+    record_packets(path, 101, index_interval=8)
+    if not with_index:
+        os.remove(f'{path}.idx')
+
+    with PacketLog(path) as log:
+        assert log.stream_name == 'Test'
+        assert log.version is None
+        assert log.payload_size == 8
+        assert len(log) == 101
+        assert log[5] == (1020, 5, (5).to_bytes(4, 'little') * 2)
+        assert log[-1].wall_ns == 100
+        with pytest.raises(IndexError):
+            log[101]
+        assert [record.wall_ns for record in log.records(98)] == [98, 99, 100]
+
+        # First record at or after the time
+        assert log.find_time(0) == 0
+        assert log.find_time(1020) == 4
+        assert log.find_time(1021) == 6
+        assert log.find_time(1500) == 100
+        assert log.find_time(1501) == 101
+        assert log.find_elapsed(0.00000002) == 4
+
+
+def test_partial_record_ignored(tmp_path):
+    path = tmp_path / 'packets.fglog'
+    record_packets(path, 10, index_interval=1)
+    with open(path, 'ab') as log_file:
+        log_file.write(b'\x01' * 5)  # Killed while writing
+    with PacketLog(path) as log:
+        assert len(log) == 10
+        assert log.find_time(2000) == 10
+
+    with open(path, 'wb') as log_file:
+        log_file.write(b'not a log'.ljust(100))
+    with pytest.raises(ValueError):
+        PacketLog(path)
+
+
+def test_record_connection(tmp_path):
+    path = tmp_path / 'fdm.fglog'
+    fdm_c = FDMConnection()
+    fdm_c.connect_rx('127.0.0.1', 0, lambda data, pipe: None, max_batch=4)
+    recorder = fdm_c.record_rx(path)
+    fg_out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    codec = StructCodec(fdm_struct_v24)
+    packets = [codec.build(dict(random_packet(codec, 0), cur_time_s=i)) for i in range(10)]
+    for packet in packets:
+        fg_out_sock.sendto(packet, fdm_c.fg_rx_sock.getsockname())
+    while fdm_c.step(block=False):
+        pass
+    recorder.close()
+
+    with PacketLog(path) as log:
+        assert log.stream_name == 'FDM'
+        assert log.version == 24
+        assert [record.data for record in log] == packets
+        assert all(log[i].monotonic_ns <= log[i + 1].monotonic_ns for i in range(len(log) - 1))
+
+    fg_out_sock.close()
+    fdm_c.fg_rx_sock.close()
+
+
+def test_record_connection_restart(tmp_path):
+    path = tmp_path / 'fdm.fglog'
+    fdm_c = FDMConnection()
+    fdm_c.connect_rx('127.0.0.1', 0, lambda data, pipe: None)
+    fdm_c.record_rx(path)
+    fg_out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    codec = StructCodec(fdm_struct_v24)
+    packets = [codec.build(dict(random_packet(codec, 0), cur_time_s=i)) for i in range(10)]
+
+    def wait_for_records(count):
+        for _ in range(200):
+            if os.path.exists(path):
+                with PacketLog(path) as log:
+                    if len(log) >= count:
+                        return
+            time.sleep(0.01)
+
+    # The recorder is opened again in the new RX process
+    for run_start, run_end in [(0, 5), (5, 10)]:
+        fdm_c.start()
+        for packet in packets[run_start:run_end]:
+            fg_out_sock.sendto(packet, fdm_c.fg_rx_sock.getsockname())
+        wait_for_records(run_end)
+        fdm_c.stop()
+
+    with PacketLog(path) as log:
+        assert [record.data for record in log] == packets
+        assert log.find_time(log[5].monotonic_ns) == 5
+
+    fg_out_sock.close()
+    fdm_c.fg_rx_sock.close()
+
+
+def test_record_append(tmp_path):
+    path = tmp_path / 'packets.fglog'
+    record_packets(path, 10, index_interval=4)
+    with open(path, 'ab') as log_file:
+        log_file.write(b'\x01' * 5)  # Killed while writing
+    with PacketRecorder(path, stream_name='Test', index_interval=4) as recorder:
+        assert recorder.write(b'appended', monotonic_ns=2000)
+        assert recorder.record_count == 11
+    with PacketLog(path) as log:
+        assert len(log) == 11
+        assert log[9].wall_ns == 9
+        assert log[10].data == b'appended'
+        assert log.find_time(2000) == 10
+
+    # Something else entirely
+    with PacketRecorder(path, stream_name='Other', index_interval=4) as recorder:
+        with pytest.raises(ValueError):
+            recorder.write(b'appended', monotonic_ns=3000)
+    with PacketRecorder(path, stream_name='Test', index_interval=4) as recorder:
+        with pytest.raises(ValueError):
+            recorder.write(b'too long for the log')
+        # Back in time
+        with pytest.raises(ValueError):
+            recorder.write(b'appended', monotonic_ns=1999)
+    with PacketLog(path) as log:
+        assert len(log) == 11
+
+
+@pytest.mark.parametrize('speed', [1.0, 4.0, None])
+def test_replay(tmp_path, speed):
+    path = tmp_path / 'fdm.fglog'
+    codec = StructCodec(fdm_struct_v24)
+    packets = [codec.build(dict(random_packet(codec, 0), cur_time_s=i)) for i in range(20)]
+    with PacketRecorder(path) as recorder:
+        for i, packet in enumerate(packets):
+            recorder.write(packet, monotonic_ns=i * 5_000_000)  # 200Hz
+
+    fg_in_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    fg_in_sock.bind(('127.0.0.1', 0))
+    fg_in_sock.settimeout(2.0)
+    fdm_c = FDMConnection(24)
+    fdm_c.connect_tx(*fg_in_sock.getsockname())
+
+    with PacketLog(path) as log:
+        replayer = PacketReplayer(log, speed=speed)
+        stats = replayer.play(fdm_c, start_s=0.02)
+    assert stats.packets == 16
+    assert [fg_in_sock.recv(1024) for _ in range(16)] == packets[4:]
+    if speed is not None:
+        # Never early, as 15 intervals of 5ms have to pass
+        assert stats.elapsed_s >= 0.075 / speed
+        assert 0 <= stats.jitter_p50_us <= stats.jitter_p99_us <= stats.jitter_max_us
+        assert stats.jitter_mean_us <= stats.jitter_max_us
+    else:
+        assert stats.jitter_max_us == 0.0
+    assert stats.rate_hz > 0
+
+    fg_in_sock.close()
+
+
+def test_replay_misuse(tmp_path):
+    path = tmp_path / 'fdm.fglog'
+    with PacketRecorder(path) as recorder:
+        recorder.write(bytes(fdm_struct_v24.sizeof()))
+    with PacketLog(path) as log:
+        replayer = PacketReplayer(log)
+        with pytest.raises(FGConnectionError):
+            replayer.play(FDMConnection(24))  # TX not connected
+        gui_c = GuiConnection(8)
+        gui_c.connect_tx('127.0.0.1', 5504)
+        with pytest.raises(ValueError):
+            replayer.play(gui_c)  # Wrong struct
+        with pytest.raises(ValueError):
+            PacketReplayer(log, speed=0)
+
+
+@pytest.mark.parametrize('layout', ['memory', 'npz', 'npy'])
+def test_export_columns(tmp_path, layout):
+    np = pytest.importorskip('numpy')
+    path = tmp_path / 'fdm.fglog'
+    codec = StructCodec(fdm_struct_v25)
+    packets = [codec.build(random_packet(codec, seed)) for seed in range(50)]
+    with PacketRecorder(path, stream_name='FDM', version_construct=FDMConnection.fg_version_construct) as recorder:
+        for i, packet in enumerate(packets):
+            recorder.write(packet, monotonic_ns=i, wall_ns=i * 2)
+
+    with PacketLog(path) as log:
+        if layout == 'memory':
+            columns = read_columns(log, chunk_records=7)
+        elif layout == 'npz':
+            export_columns(log, tmp_path / 'fdm.npz', chunk_records=7)
+            columns = np.load(tmp_path / 'fdm.npz')
+        else:
+            export_columns(log, tmp_path / 'fdm', layout='npy', chunk_records=7)
+            columns = {name: np.load(tmp_path / 'fdm' / f'{name}.npy', mmap_mode='r') for name in ['lat_rad', 'rpm']}
+            columns.update(read_columns(log, fields=['version', 'alt_m']))
+
+    assert list(columns['wall_ns']) == [i * 2 for i in range(50)]
+    # Same as decoding every packet
+    decoded = [fix_fg_radian_parsing(codec.parse(packet)) for packet in packets]
+    for name in ['version', 'lat_rad', 'alt_m', 'rpm']:
+        assert columns[name].tolist() == [packet[name] for packet in decoded]
+    if layout == 'memory':
+        assert '_padding' not in columns  # Padding is skipped
+
+
+def test_export_gui_columns_unchanged(tmp_path):
+    # Same field names as FDM, but GuiConnection doesn't correct them
+    pytest.importorskip('numpy')
+    path = tmp_path / 'gui.fglog'
+    codec = StructCodec(gui_struct_v8)
+    packets = []
+    for seed in range(5):
+        packet = random_packet(codec, seed)
+        packet['lat_rad'] = 0.5
+        packets.append(codec.build(packet))
+    with PacketRecorder(path, stream_name='GUI', version_construct=GuiConnection.fg_version_construct) as recorder:
+        for packet in packets:
+            recorder.write(packet)
+
+    with PacketLog(path) as log:
+        columns = read_columns(log)
+    decoded = [codec.parse(packet) for packet in packets]
+    for name in ['lat_rad', 'lon_rad', 'phi_rad', 'theta_rad', 'psi_rad']:
+        assert columns[name].tolist() == [packet[name] for packet in decoded]
+    assert columns['lat_rad'].tolist() == [0.5] * 5
+
+
+def test_export_columns_misuse(tmp_path):
+    pytest.importorskip('numpy')
+    path = tmp_path / 'ctrls.fglog'
+    codec = StructCodec(ctrls_struct_v27)
+    with PacketRecorder(path) as recorder:
+        recorder.write(codec.build(random_packet(codec, 0)))
+    with PacketLog(path) as log:
+        with pytest.raises(ValueError):
+            read_columns(log)  # Stream unknown, the struct has to be given
+        assert read_columns(log, fields=['throttle'], net_struct=ctrls_struct_v27)['throttle'].shape == (1, 4)
+        with pytest.raises(ValueError):
+            read_columns(log, net_struct=fdm_struct_v24)
+        with pytest.raises(ValueError):
+            read_columns(log, fields=['lat_rad'], net_struct=ctrls_struct_v27)
+        with pytest.raises(ValueError):
+            export_columns(log, tmp_path / 'ctrls.parquet', layout='parquet', net_struct=ctrls_struct_v27)
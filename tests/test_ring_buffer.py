@@ -0,0 +1,90 @@
+import socket
+import struct
+
+import dill
+import multiprocess as mp
+
+from flightgear_python.fg_if import FDMConnection
+from flightgear_python.fg_codec import StructCodec
+from flightgear_python.fdm_v24 import fdm_struct as fdm_struct_v24
+from flightgear_python.general_util import DatagramRingBuffer
+from testing_common import random_packet
+
+import pytest
+
+
+def test_ring_put_consume_wraparound():
+    ring = DatagramRingBuffer(slot_size=4, capacity=3)
+    assert ring.consume() == b''
+    for i in range(3):
+        assert ring.put(bytes([i]) * 4)
+    assert len(ring) == 3
+    assert ring.consume(max_count=2) == b'\x00' * 4 + b'\x01' * 4
+
+    # Slots 0 and 1 are free again, so these wrap around
+    assert ring.put(b'\x03' * 4)
+    assert ring.put(b'\x04' * 4)
+    assert ring.consume() == b'\x02' * 4 + b'\x03' * 4 + b'\x04' * 4
+    assert len(ring) == 0
+    assert ring.overrun_count == 0
+
+
+def test_ring_overrun_and_bad_size():
+    ring = DatagramRingBuffer(slot_size=4, capacity=2)
+    assert ring.put(b'aaaa')
+    assert ring.put(b'bbbb')
+    assert not ring.put(b'cccc')  # Full, newest is dropped
+    assert not ring.put(b'dd')
+    assert ring.overrun_count == 1
+    assert ring.bad_size_count == 1
+    assert ring.consume() == b'aaaabbbb'
+
+    with pytest.raises(ValueError):
+        DatagramRingBuffer(slot_size=4, capacity=0)
+
+
+def producer_proc(ring, count):
+    for i in range(count):
+        while not ring.put(i.to_bytes(8, 'little')):
+            pass  # Wait for the consumer
+
+
+def test_ring_across_processes():
+    count = 2000
+    ring = DatagramRingBuffer(slot_size=8, capacity=64)
+    # Attaching by name works too (i.e. when spawning instead of forking)
+    proc = mp.Process(target=producer_proc, args=(dill.loads(dill.dumps(ring)), count))
+    proc.start()
+
+    received = []
+    while len(received) < count:
+        data = ring.consume()
+        received.extend(value for (value,) in struct.iter_unpack('<Q', data))
+    proc.join()
+    assert received == list(range(count))
+
+
+def test_ring_fed_by_connection():
+    np = pytest.importorskip('numpy')
+    from flightgear_python.fg_codec import NumpyStructCodec
+
+    codec = NumpyStructCodec(fdm_struct_v24)
+    ring = DatagramRingBuffer(slot_size=codec.sizeof(), capacity=64)
+
+    fdm_c = FDMConnection(24)
+    fdm_c.connect_rx('127.0.0.1', 0, lambda data, pipe: None, max_batch=8)
+    fdm_c.add_rx_raw_hook(ring.put)
+    fg_out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    packet = random_packet(StructCodec(fdm_struct_v24), 0)
+    for i in range(20):
+        fg_out_sock.sendto(fdm_struct_v24.build(dict(packet, cur_time_s=i)), fdm_c.fg_rx_sock.getsockname())
+    while fdm_c.step(block=False):
+        pass
+
+    packets = np.frombuffer(ring.consume(), dtype=codec.dtype)
+    assert list(packets['cur_time_s']) == list(range(20))
+    # The raw datagrams don't have the radian correction applied
+    assert packets['lat_rad'][0] == packet['lat_rad']
+
+    fg_out_sock.close()
+    fdm_c.fg_rx_sock.close()
@@ -0,0 +1,62 @@
+import gc
+import socket
+import tracemalloc
+
+from flightgear_python.fg_if import FDMConnection
+from flightgear_python.fg_codec import StructCodec
+from flightgear_python.fdm_v25 import fdm_struct as fdm_struct_v25
+from testing_common import random_packet
+
+import pytest
+
+# Bytes that are allowed to be allocated, either in total across all the packets
+# (i.e. garbage that doesn't get freed) or at one time (peak while handling a packet)
+alloc_budgets = {
+    'compiled': {'total': 8 * 1024, 'peak': 32 * 1024},
+    'numpy': {'total': 4 * 1024, 'peak': 4 * 1024},
+}
+
+
+@pytest.mark.parametrize('codec', alloc_budgets.keys())
+def test_steady_state_allocations(codec):
+    if codec == 'numpy':
+        pytest.importorskip('numpy')
+    num_packets = 1000
+
+    fdm_c = FDMConnection(25, codec=codec)
+    fdm_c.connect_rx('127.0.0.1', 0, lambda data, pipe: data)
+    rx_addr = fdm_c.fg_rx_sock.getsockname()
+    fg_out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    fg_in_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    fg_in_sock.bind(('127.0.0.1', 0))
+    fg_in_sock.settimeout(1.0)
+    fdm_c.connect_tx(*fg_in_sock.getsockname())
+
+    packet_bytes = fdm_struct_v25.build(random_packet(StructCodec(fdm_struct_v25), 0))
+    fg_in_buffer = bytearray(1024)
+
+    def run_packets(count: int):
+        for _ in range(count):
+            fg_out_sock.sendto(packet_bytes, rx_addr)
+            fdm_c._fg_packet_roundtrip()
+            fg_in_sock.recv_into(fg_in_buffer)
+
+    # Warm up, so that lazily created objects (i.e. the auto-version struct) aren't counted
+    run_packets(100)
+    gc.collect()
+
+    tracemalloc.start()
+    try:
+        start_bytes, _ = tracemalloc.get_traced_memory()
+        run_packets(num_packets)
+        end_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert end_bytes - start_bytes < alloc_budgets[codec]['total']
+    assert peak_bytes - start_bytes < alloc_budgets[codec]['peak']
+    # Make sure we actually echoed the packets
+    assert bytes(fg_in_buffer[:4]) == packet_bytes[:4]
+
+    for sock in (fg_out_sock, fg_in_sock, fdm_c.fg_rx_sock, fdm_c.fg_tx_sock):
+        sock.close()
@@ -0,0 +1,101 @@
+import socket
+import time
+
+from flightgear_python.fg_if import FDMConnection
+from flightgear_python.fg_codec import StructCodec
+from flightgear_python.fg_util import FGConnectionError
+from flightgear_python.fdm_v24 import fdm_struct as fdm_struct_v24
+from flightgear_python.general_util import StageTimer
+from testing_common import random_packet
+
+import pytest
+
+
+def test_histogram_buckets():
+    timer = StageTimer(['a'], sub_bucket_bits=3, max_bits=40)
+    last_bucket = 0
+    for duration_ns in list(range(100)) + [1000, 12345, 10**6, 3 * 10**9, 2**39]:
+        bucket = timer._bucket(duration_ns)
+        assert bucket >= last_bucket
+        last_bucket = bucket
+        upper_ns = timer._bucket_upper_ns(bucket)
+        # Precision is 1/8 of the value
+        assert duration_ns < upper_ns <= duration_ns + max(1, duration_ns / 8)
+    assert timer._bucket(2**50) == timer.num_buckets - 1
+
+
+def test_timer_snapshot(mocker):
+    # Fake clock so that scheduler jitter can't turn a short iteration into an overrun
+    work_durations_ns = [100_000, 100_000, 5_000_000]
+    clock_ns = [10**9]
+    readings = []
+    for work_ns in work_durations_ns:
+        readings.append(clock_ns[0])  # start_loop()
+        clock_ns[0] += 1_000_000  # Waiting doesn't count towards the budget
+        readings.append(clock_ns[0])  # mark() after 'wait'
+        clock_ns[0] += work_ns
+        readings.append(clock_ns[0])  # mark() after 'work'
+    mocker.patch('flightgear_python.general_util.time.perf_counter_ns', side_effect=readings)
+
+    timer = StageTimer(['wait', 'work'], budget_s=0.002)
+    assert timer.snapshot().loops == 0
+    for _ in work_durations_ns:
+        timer.start_loop()
+        timer.mark()
+        timer.mark()
+        timer.end_loop()
+
+    stats = timer.snapshot()
+    assert stats.loops == stats.items == 3
+    assert stats.overruns == 1
+    assert stats.rate_hz == pytest.approx(3 / (clock_ns[0] - 10**9) * 1e9)
+    wait_stats, work_stats = stats.stages
+    assert wait_stats.name == 'wait'
+    assert wait_stats.mean_us == wait_stats.max_us == 1000
+    assert work_stats.count == 3
+    assert work_stats.p50_us < 2000 <= 5000 == work_stats.p99_us == work_stats.max_us
+    assert work_stats.mean_us == pytest.approx(5200 / 3)
+
+
+def rx_cb(fdm_data, event_pipe):
+    time.sleep(0.002)
+    return fdm_data
+
+
+@pytest.mark.parametrize('batched', [False, True])
+def test_connection_stage_timing(batched):
+    fdm_c = FDMConnection(24)
+    with pytest.raises(FGConnectionError):
+        fdm_c.stage_timing()
+    fdm_c.enable_stage_timing(budget_s=0.001)
+    if batched:
+        fdm_c.connect_rx_batch('127.0.0.1', 0, lambda batch, pipe: rx_cb(batch[-1], pipe), max_batch=8)
+    else:
+        fdm_c.connect_rx('127.0.0.1', 0, rx_cb)
+    fg_in_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    fg_in_sock.bind(('127.0.0.1', 0))
+    fdm_c.connect_tx(*fg_in_sock.getsockname())
+    fdm_c.start()  # In a separate process, the timing is shared
+
+    fg_out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    packet = fdm_struct_v24.build(random_packet(StructCodec(fdm_struct_v24), 0))
+    for _ in range(5):
+        fg_out_sock.sendto(packet, fdm_c.fg_rx_sock.getsockname())
+        fg_in_sock.recv(1024)  # Wait for the reply, one datagram per loop
+    # The reply goes out before the send stage is done
+    for _ in range(100):
+        stats = fdm_c.stage_timing()
+        if stats.loops == 5:
+            break
+        time.sleep(0.01)
+    fdm_c.stop()
+
+    assert stats.loops == stats.items == 5
+    assert stats.overruns == 5
+    assert [stage_stats.name for stage_stats in stats.stages] == list(FDMConnection.loop_stage_names)
+    assert all(stage_stats.count == 5 for stage_stats in stats.stages)
+    callback_stats = stats.stages[2]
+    assert callback_stats.p50_us >= 2000
+
+    for sock in [fg_in_sock, fg_out_sock, fdm_c.fg_rx_sock]:
+        sock.close()
@@ -1,4 +1,9 @@
+import socket
+import threading
+import time
+
 from flightgear_python.fg_if import TelnetConnection
+from flightgear_python.fg_util import FGCommunicationError, FGConnectionError
 
 import pytest
 
@@ -57,3 +62,251 @@ def test_telnet_deprecated_name_still_works():
         t_con = PropsConnection('localhost', 55554)
     # Prevent 'ResourceWarning: unclosed' warning
     t_con.sock.close()
+
+
+def setup_pipelined_mock(mocker, resp_bytes, chunk_len, later_chunks=()):
+    # FG answers every command in order, the stream arrives in arbitrary chunks
+    sent = []
+    chunks = [resp_bytes[start:][:chunk_len] for start in range(0, len(resp_bytes), chunk_len)]
+    chunks += list(later_chunks)
+    mocker.patch('socket.socket.recv', side_effect=chunks)
+    mocker.patch('socket.socket.sendall', lambda self, tx_bytes: sent.append(tx_bytes))
+    mocker.patch('socket.socket.connect', lambda self, addr: None)
+    return sent
+
+
+@pytest.mark.parametrize('chunk_len', [1, 2, 7, 4096])
+def test_telnet_get_props(mocker, chunk_len):
+    resp_bytes = (
+        b"altitude-ft = '1234.5' (double)\r\n/> " b"name = 'a/> b' (string)\r\n/> " b"gear-down = 'true' (bool)\r\n/> "
+    )
+    sent = setup_pipelined_mock(mocker, resp_bytes, chunk_len)
+    t_con = TelnetConnection('localhost', 55554)
+    values = t_con.get_props(['/position/altitude-ft', '/sim/name/', '/gear/gear-down'])
+    assert values == {'/position/altitude-ft': 1234.5, '/sim/name/': 'a/> b', '/gear/gear-down': True}
+    # All in one send
+    assert sent == [b'get /position/altitude-ft\r\nget /sim/name\r\nget /gear/gear-down\r\n']
+    t_con.sock.close()
+
+
+def test_telnet_get_props_error_attribution(mocker):
+    resp_bytes = (
+        b"altitude-ft = '1234.5' (double)\r\n/> " b"-ERR get: '/nope' not found\r\n/> " b"count = 'abc' (int)\r\n/> "
+    )
+    setup_pipelined_mock(mocker, resp_bytes, 5, later_chunks=[b"x = '1' (int)\r\n/> "])
+    t_con = TelnetConnection('localhost', 55554)
+    with pytest.raises(FGCommunicationError) as exc_info:
+        t_con.get_props(['/position/altitude-ft', '/nope', '/count'])
+    assert '2 of 3' in str(exc_info.value)
+    assert '/nope' in str(exc_info.value)
+    assert '/count' in str(exc_info.value)
+    assert '/position/altitude-ft' not in str(exc_info.value)
+    # Every response was consumed, the next command gets its own
+    assert t_con.get_prop('/x') == 1
+    t_con.sock.close()
+
+
+def test_telnet_set_props(mocker):
+    resp_bytes = b"a = '1' (int)\r\n/> -ERR set: bad\r\n/> "
+    sent = setup_pipelined_mock(mocker, resp_bytes, 3)
+    t_con = TelnetConnection('localhost', 55554)
+    with pytest.raises(FGCommunicationError, match='1 of 2 sets failed.*set /b 2'):
+        t_con.set_props({'/a': 1, '/b': 2})
+    assert sent == [b'set /a 1\r\nset /b 2\r\n']
+    t_con.sock.close()
+
+
+def test_telnet_batch_empty(mocker):
+    sent = setup_pipelined_mock(mocker, b'', 1)
+    t_con = TelnetConnection('localhost', 55554)
+    assert t_con.get_props([]) == {}
+    t_con.set_props({})
+    assert sent == []
+    t_con.sock.close()
+
+
+def test_telnet_data_mode(mocker):
+    # First get learns the type in prompt mode, the next ones only get the raw value
+    later_chunks = [b"/> alt = '1.5' (double)\r\n/> ", b'2.5\r\n', b'3.', b'5\r\n']
+    sent = setup_pipelined_mock(mocker, b'/> ', 3, later_chunks=later_chunks)
+    t_con = TelnetConnection('localhost', 55554, data_mode=True)
+    t_con.connect()
+    assert sent == [b'cd /\r\n', b'data\r\n']
+    assert t_con.get_prop('/alt') == 1.5
+    assert sent[-1] == b'prompt\r\nget /alt\r\ndata\r\n'
+    assert t_con.prop_types == {'/alt': 'double'}
+    assert t_con.get_prop('/alt') == 2.5
+    assert sent[-1] == b'get /alt\r\n'
+    assert t_con.get_props(['/alt/']) == {'/alt/': 3.5}
+    # Sets aren't answered
+    t_con.set_props({'/alt': 1, '/b': 'x'})
+    t_con.set_prop('/alt', 2)
+    assert sent[-2:] == [b'set /alt 1\r\nset /b x\r\n', b'set /alt 2\r\n']
+    t_con.sock.close()
+
+
+def test_telnet_data_mode_mixed_batch(mocker):
+    later_chunks = [b"/> b = '7' (int)\r\n/> -ERR get: '/c' not found\r\n/> ", b'1.5\r\nabc\r\n']
+    sent = setup_pipelined_mock(mocker, b'', 1, later_chunks=later_chunks)
+    t_con = TelnetConnection('localhost', 55554, data_mode=True)
+    t_con.prop_types = {'/a': 'double', '/d': 'int'}
+    with pytest.raises(FGCommunicationError, match='2 of 4 gets failed') as exc_info:
+        t_con.get_props(['/a', '/b', '/c', '/d'])
+    assert '/c' in str(exc_info.value) and '/d' in str(exc_info.value)
+    assert sent == [b'prompt\r\nget /b\r\nget /c\r\ndata\r\n', b'get /a\r\nget /d\r\n']
+    assert t_con.prop_types['/b'] == 'int'
+    assert '/c' not in t_con.prop_types
+    t_con.sock.close()
+
+
+def wait_for(condition, timeout_s=2.0):
+    end_s = time.monotonic() + timeout_s
+    while not condition():
+        assert time.monotonic() < end_s, 'Timed out'
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def fg_pair():
+    # The test plays FG on the other end of a connected socket pair
+    t_con = TelnetConnection('localhost', 55554, rx_timeout_s=1.0)
+    t_con.sock.close()
+    t_con.sock, fg_sock = socket.socketpair()
+    yield t_con, fg_sock
+    if t_con._subscriptions:
+        fg_sock.sendall(b'/> ' * len(t_con._subscriptions))
+        t_con.unsubscribe(list(t_con._subscriptions))
+    t_con.sock.close()
+    fg_sock.close()
+
+
+def test_telnet_subscribe(fg_pair):
+    t_con, fg_sock = fg_pair
+    changes = []
+    # Responses to both subscribes, then to the initial gets
+    fg_sock.sendall(b"/> /> a = '1' (int)\r\n/> b = 'x' (string)\r\n/> ")
+    t_con.subscribe(['/a', '/b'], callback=lambda prop_str, value: changes.append((prop_str, value)))
+    assert fg_sock.recv(1024) == b'subscribe /a\r\nsubscribe /b\r\nget /a\r\nget /b\r\n'
+    assert t_con.latest_values == {'/a': 1, '/b': 'x'}
+
+    # Split across reads, in the middle of the line end too
+    for chunk in [b'/a=2\r', b'\n/b=y', b'\r\n/a', b'=3\r\n']:
+        fg_sock.sendall(chunk)
+    wait_for(lambda: len(changes) == 3)
+    assert changes == [('/a', 2), ('/b', 'y'), ('/a', 3)]
+    assert t_con.get_latest('/a') == 3
+    assert t_con.get_latest('/c', 'default') == 'default'
+
+
+def test_telnet_subscribe_interleaved(fg_pair):
+    t_con, fg_sock = fg_pair
+    changes = []
+    fg_sock.sendall(b'/> /> ')
+    t_con.subscribe(
+        ['/engines/engine[0]', '/x'], callback=lambda prop_str, value: changes.append(value), get_initial=False
+    )
+    fg_sock.recv(1024)
+    t_con.prop_types['/engines/engine/rpm'] = 'double'
+    # Changes before, inside and after the response, with the prompt directly followed by a change
+    fg_sock.sendall(b"/x=1\r\n/x=2\r\n/engines/engine/rpm=2400.5\r\nc = 'z' (string)\r\n/x=3\r\n/> /x=4\r\n")
+    assert t_con.get_props(['/c']) == {'/c': 'z'}
+    wait_for(lambda: len(changes) == 5)
+    assert changes == ['1', '2', 2400.5, '3', '4']
+    assert t_con.get_latest('/engines/engine[0]/rpm') == 2400.5
+    # Response that starts with a path isn't a change
+    fg_sock.sendall(b"/c = 'w' (string)\r\n/> ")
+    assert t_con.get_prop('/c') == 'w'
+
+
+def test_telnet_unsubscribe(fg_pair):
+    t_con, fg_sock = fg_pair
+    fg_sock.sendall(b'/> ')
+    t_con.subscribe(['/a'], get_initial=False)
+    fg_sock.sendall(b'/a=1\r\n/> ')
+    t_con.unsubscribe(['/a'])
+    assert fg_sock.recv(1024) == b'subscribe /a\r\nunsubscribe /a\r\n'
+    assert t_con._reader_thread is None
+    assert t_con.get_latest('/a') is None
+    # Reads from the socket again
+    fg_sock.sendall(b"a = '5' (int)\r\n/> ")
+    assert t_con.get_prop('/a') == 5
+
+
+def test_telnet_unsubscribe_partial_change(fg_pair):
+    t_con, fg_sock = fg_pair
+    # In data mode the response to a get is just the value, so a leftover change would be taken for it
+    t_con.data_mode = True
+    t_con.prop_types['/a'] = 'int'
+    fg_sock.sendall(b'/> /> ')
+    t_con.subscribe(['/a'], get_initial=False)
+    # A change is only partly received when the unsubscribe response arrives, the rest comes after
+    # the reader has stopped
+    fg_sock.sendall(b'/> /> /a=')
+    rest_sender = threading.Timer(0.3, fg_sock.sendall, args=(b'2\r\n/a=3\r\n',))
+    rest_sender.start()
+    t_con.unsubscribe(['/a'])
+    rest_sender.join()
+    assert fg_sock.recv(1024) == b'prompt\r\nsubscribe /a\r\ndata\r\nprompt\r\nunsubscribe /a\r\ndata\r\n'
+    assert t_con.get_latest('/a') is None
+    fg_sock.sendall(b'5\r\n')
+    assert t_con.get_prop('/a') == 5
+    assert fg_sock.recv(1024) == b'get /a\r\n'
+
+
+def test_telnet_subscribe_connection_closed(fg_pair):
+    t_con, fg_sock = fg_pair
+    fg_sock.sendall(b'/> ')
+    t_con.subscribe(['/a'], get_initial=False)
+    fg_sock.shutdown(socket.SHUT_WR)
+    with pytest.raises(FGConnectionError, match='closed'):
+        t_con.get_prop('/a')
+    t_con._subscriptions.clear()
+    t_con._reader_thread = None
+
+
+def test_telnet_ls_streamed(mocker):
+    # Big listing, in small reads, shouldn't all be buffered before it's parsed
+    listing = b'model/\r\n' + b''.join(f"prop{i} = '{i}' (int)\r\n".encode() for i in range(2000)) + b'/> '
+    chunk_len = 1000
+    setup_pipelined_mock(mocker, listing, chunk_len, later_chunks=[b"a = '1' (int)\r\n/> "])
+    t_con = TelnetConnection('localhost', 55554)
+    max_buffered = 0
+    recv_chunk = t_con._recv_chunk
+
+    def track_recv_chunk(buflen):
+        nonlocal max_buffered
+        max_buffered = max(max_buffered, len(t_con._rx_buf))
+        return recv_chunk(buflen)
+
+    t_con._recv_chunk = track_recv_chunk
+    props = t_con.list_props('/ai')
+    assert props['directories'] == ['/ai/model']
+    assert len(props['properties']) == 2000
+    assert props['properties']['/ai/prop1999'] == 1999
+    assert max_buffered < chunk_len
+    assert t_con.get_prop('/a') == 1
+    t_con.sock.close()
+
+
+def test_telnet_ls_errors_stay_in_sync(mocker):
+    later_chunks = [b"b = '2' (int)\r\n/> "]
+    resp_bytes = b"-ERR ls: 'x'\r\nnot found\r\n/> prop = '1' (int)\r\n???\r\nc = '3' (int)\r\n/> "
+    setup_pipelined_mock(mocker, resp_bytes, 4, later_chunks=later_chunks)
+    t_con = TelnetConnection('localhost', 55554)
+    with pytest.raises(FGCommunicationError, match='not found'):
+        t_con.list_props('/x')
+    with pytest.raises(FGCommunicationError, match=r'Unknown Telnet response: \?\?\?'):
+        t_con.list_props('/y')
+    # The rest of the listing was skipped
+    assert t_con.get_prop('/b') == 2
+    t_con.sock.close()
+
+
+def test_telnet_large_reads(mocker):
+    sent = setup_pipelined_mock(mocker, b"a = '1' (int)\r\n/> ", 100)
+    recv_mock = socket.socket.recv
+    t_con = TelnetConnection('localhost', 55554)
+    assert t_con.get_prop('/a') == 1
+    assert recv_mock.call_args.args == (t_con.telnet_read_size,)
+    assert sent == [b'get /a\r\n']
+    t_con.sock.close()
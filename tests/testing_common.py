@@ -1,6 +1,13 @@
 import os
+import random
 from pathlib import Path
 
+from flightgear_python.fg_codec import StructCodec, FIELD_CONST, FIELD_ENUM, FIELD_BYTES, FIELD_OPAQUE
+from flightgear_python.fdm_v24 import fdm_struct as fdm_struct_v24
+from flightgear_python.fdm_v25 import fdm_struct as fdm_struct_v25
+from flightgear_python.ctrls_v27 import ctrls_struct as ctrls_struct_v27
+from flightgear_python.gui_v8 import gui_struct as gui_struct_v8
+
 
 supported_fdm_versions = [
     None,  # Auto-version
@@ -30,3 +37,43 @@ def fill_xml_template(template_relative_path: str, **kwargs) -> str:
 
 def m_to_ft(val_m: float) -> float:
     return val_m * 3.28084
+
+
+all_net_structs = {
+    'fdm_v24': fdm_struct_v24,
+    'fdm_v25': fdm_struct_v25,
+    'ctrls_v27': ctrls_struct_v27,
+    'gui_v8': gui_struct_v8,
+}
+
+
+def random_bytes(length: int, rand: random.Random) -> bytes:
+    return bytes(rand.getrandbits(8) for _ in range(length))
+
+
+def random_element(field, rand: random.Random):
+    if field.kind == FIELD_ENUM:
+        return rand.choice(list(field.subcon.encmapping.keys()))
+    code = field.fmt[-1]
+    if code in 'fd':
+        return rand.uniform(-1000.0, 1000.0)
+    if code in 'iIlL':
+        return rand.randrange(0, 2**31)
+    raise NotImplementedError(f'No random generator for {field}')
+
+
+def random_packet(codec: StructCodec, seed: int) -> dict:
+    rand = random.Random(seed)
+    packet = {}
+    for field in codec.fields:
+        if field.kind == FIELD_CONST:
+            continue
+        elif field.kind == FIELD_BYTES:
+            packet[field.name] = random_bytes(field.size, rand)
+        elif field.kind == FIELD_OPAQUE:
+            packet[field.name] = field.subcon.parse(random_bytes(field.size, rand))
+        elif field.count is None:
+            packet[field.name] = random_element(field, rand)
+        else:
+            packet[field.name] = [random_element(field, rand) for _ in range(field.count)]
+    return packet